@@ -1,3 +1,5 @@
+import json
+import asyncio
 from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
@@ -5,8 +7,15 @@ import pandas as pd
 import numpy as np
 import uvicorn
 from src.forest.entity.s3_estimator import SensorEstimator
-from src.forest.entity.config_entity import PredictionPipelineConfig
+from src.forest.entity.config_entity import PredictionPipelineConfig, ModelCacheConfig, MicroBatcherConfig, InferenceExecutorConfig, PredictionCacheConfig, TrafficMonitorConfig
 from src.forest.pipeline.prediction_pipeline import PredictionPipeline
+from src.forest.entity.feature_vectorizer import InvalidPayload
+from src.forest.serving.model_cache import ModelCache
+from src.forest.serving.prediction_cache import PredictionCache
+from src.forest.serving.micro_batcher import MicroBatcher
+from src.forest.serving.inference_executor import InferenceExecutor, InferenceExecutorBusy
+from src.forest.serving.traffic_monitor import TrafficMonitor
+from src.forest.constants.application import APP_HOST, APP_PORT
 
 import pandas as pd
 
@@ -28,6 +37,79 @@ app.add_middleware(
     allow_headers=["*"],  # Allows all headers
 )
 
+# --- Model Cache ---
+# The model is loaded once at startup and refreshed in the background when the registry version changes,
+# so no request ever pays for the S3 download or the unpickling.
+model_cache: ModelCache = None
+prediction_pipeline: PredictionPipeline = None
+# Concurrent single record requests are scored together, one model call per micro batch.
+micro_batcher: MicroBatcher = None
+# Inference is CPU bound and blocking, it runs on a bounded thread pool instead of the event loop.
+inference_executor: InferenceExecutor = None
+# Statistics of the scored inputs and predictions, accumulated on a background thread.
+traffic_monitor: TrafficMonitor = None
+
+
+@app.on_event("startup")
+async def start_serving():
+    global model_cache, prediction_pipeline, micro_batcher, inference_executor, traffic_monitor
+    inference_executor = InferenceExecutor(inference_executor_config=InferenceExecutorConfig())
+    inference_executor.start()
+    model_cache = ModelCache(model_cache_config=ModelCacheConfig())
+    model_cache.start()
+    prediction_cache_config = PredictionCacheConfig()
+    prediction_cache = PredictionCache(prediction_cache_config=prediction_cache_config) if prediction_cache_config.enabled else None
+    prediction_pipeline = PredictionPipeline(model_cache=model_cache, prediction_cache=prediction_cache)
+    traffic_monitor_config = TrafficMonitorConfig()
+    if traffic_monitor_config.enabled:
+        traffic_monitor = TrafficMonitor(columns=prediction_pipeline.feature_vectorizer.columns, schema_config=prediction_pipeline.schema_config,
+                                         traffic_monitor_config=traffic_monitor_config)
+        traffic_monitor.start()
+        prediction_pipeline.traffic_monitor = traffic_monitor
+        # the drift reference ships with the model and follows every model swap
+        model_cache.add_load_listener(lambda model, version: traffic_monitor.set_reference(model.get_reference_statistics(), version))
+    micro_batcher = MicroBatcher(predict_fn=prediction_pipeline.predict_batch, micro_batcher_config=MicroBatcherConfig(), executor=inference_executor)
+    await micro_batcher.start()
+
+
+@app.on_event("shutdown")
+async def stop_serving():
+    await micro_batcher.stop()
+    model_cache.stop()
+    inference_executor.shutdown()
+    if traffic_monitor is not None:
+        traffic_monitor.stop()
+
+
+def find_cause(e: Exception, exception_type: type):
+    """
+    First exception of exception_type in the chain of e, the pipeline wraps the errors it raises into ForestExpection
+    """
+    while e is not None:
+        if isinstance(e, exception_type):
+            return e
+        e = e.__cause__ or e.__context__
+    return None
+
+
+def to_http_exception(e: Exception) -> HTTPException:
+    """
+    Client errors (a body that is not JSON, a request the model cannot score) are 4xx, the rest is a server fault
+    """
+    json_error = find_cause(e, json.JSONDecodeError)
+    if json_error is not None:
+        return HTTPException(status_code=400, detail=f"Request body is not valid JSON: {str(json_error)}")
+    invalid_payload = find_cause(e, InvalidPayload)
+    if invalid_payload is not None:
+        # the message without the file and line ForestExpection adds for the logs
+        return HTTPException(status_code=422, detail=f"Invalid request: {invalid_payload.args[0]}")
+    if isinstance(e, InferenceExecutorBusy):
+        return HTTPException(status_code=503, detail=f"Server is overloaded, retry later: {str(e)}")
+    if isinstance(e, asyncio.TimeoutError):
+        return HTTPException(status_code=504, detail="Prediction timed out")
+    return HTTPException(status_code=500, detail=f"An unexpected error occurred: {str(e)}")
+
+
 # --- Prediction Endpoint ---
 @app.post("/predict")
 async def predict(request: Request):
@@ -35,25 +117,70 @@ async def predict(request: Request):
     Accepts land attribute data, validates it, and uses the real
     PredictionPipeline to return a forest cover type prediction.
     """
+    if model_cache is None or not model_cache.is_loaded:
+        raise HTTPException(status_code=503, detail="Model is not loaded yet")
+
     try:
         data = await request.json()   # This should be a dict
 
-        # Convert into a pandas DataFrame
-        df = pd.DataFrame(data, index=[0])   # ✅ wrap in list to make it a single-row DataFrame
-        
-        pipeline = PredictionPipeline()
-        prediction_result = pipeline.predict(dataframe = df)
-        prediction = int(prediction_result[0])
-        
-        print("Prediction result:", prediction)
-        
+        prediction = await micro_batcher.submit(data)
         return {"prediction": prediction}
 
-        
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"An unexpected error occurred: {str(e)}")
+        raise to_http_exception(e)
         
 
+@app.post("/predict/batch")
+async def predict_batch(request: Request):
+    """
+    Accepts many land attribute records, either row oriented (a list of objects or {"records": [...]})
+    or column oriented ({"columns": {"Elevation": [...], ...}}), and scores them with one model call.
+    Predictions are returned in input order, rows that could not be scored are null and listed in errors.
+    Any other payload shape, a bare record included, is rejected with 422.
+    """
+    if model_cache is None or not model_cache.is_loaded:
+        raise HTTPException(status_code=503, detail="Model is not loaded yet")
+
+    try:
+        payload = await request.json()
+        predictions, errors = await inference_executor.run(prediction_pipeline.predict_batch, payload)
+
+        return {"predictions": predictions, "errors": errors}
+
+    except Exception as e:
+        raise to_http_exception(e)
+
+@app.get("/metrics/batching")
+async def batching_metrics():
+    """
+    Returns the micro batcher counters: batch sizes and queue waits.
+    """
+    if micro_batcher is None:
+        raise HTTPException(status_code=503, detail="Micro batcher is not started")
+    return micro_batcher.metrics.snapshot()
+
+
+@app.get("/metrics/prediction_cache")
+async def prediction_cache_metrics():
+    """
+    Returns the prediction cache counters: hits, misses, evictions and invalidations.
+    """
+    if prediction_pipeline is None or prediction_pipeline.prediction_cache is None:
+        raise HTTPException(status_code=404, detail="Prediction cache is disabled")
+    return prediction_pipeline.prediction_cache.snapshot()
+
+
+@app.get("/metrics/traffic")
+async def traffic_metrics(reset: bool = False):
+    """
+    Returns the scored traffic statistics since startup or the last reset: predicted class distribution,
+    missing and out of range counts, and the PSI and KS of every feature against the reference shipped with the served model.
+    reset=true starts a new window after the snapshot.
+    """
+    if traffic_monitor is None:
+        raise HTTPException(status_code=404, detail="Traffic monitor is disabled")
+    return traffic_monitor.snapshot(reset=reset)
+
 
 if __name__ == "__main__":
-    uvicorn.run(app, host="0.0.0.0", port=8000)
+    uvicorn.run(app, host=APP_HOST, port=APP_PORT)
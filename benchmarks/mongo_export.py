@@ -0,0 +1,81 @@
+"""
+Time and peak Python memory of exporting the forest collection the old way (a list of every document,
+then DataFrame and replace "na") versus ForestData's projected, batched, columnar export, read through
+one cursor and as parallel `_id` ranges. Runs against an in-process mongomock collection of synthetic
+covtype documents, or against a real mongod with --uri (581012 documents is the full covtype collection).
+mongomock has no indexes, so its range queries scan the whole collection: use it for correctness, time on a mongod.
+
+Usage: python -m benchmarks.mongo_export --documents 100000
+       python -m benchmarks.mongo_export --uri mongodb://localhost:27017 --documents 581012 --partitions 8 --workers 4
+"""
+import time
+import argparse
+import tracemalloc
+import numpy as np
+import pandas as pd
+from benchmarks.synthetic_data import make_covtype_frame
+from src.forest.configurations.mogo_db_connection import MongoDBClient, get_wire_compressors
+from src.forest.constants.database import DATABASE_NAME
+from src.forest.data_access.forest_data import ForestData
+
+BENCHMARK_COLLECTION = "forest_export_benchmark"
+
+
+def export_list_of_dicts(collection) -> pd.DataFrame:
+    """
+    The export before projection and batching
+    """
+    df = pd.DataFrame(list(collection.find()))
+    if "_id" in df.columns.to_list():
+        df.drop('_id', axis=1, inplace=True)
+    df.replace({"na": np.nan}, inplace=True)
+    return df
+
+
+def measure(export) -> tuple:
+    tracemalloc.start()
+    started = time.perf_counter()
+    df = export()
+    seconds = time.perf_counter() - started
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return df, seconds, peak
+
+
+def main(args):
+    if args.uri is None:
+        import mongomock
+        MongoDBClient.client = mongomock.MongoClient()
+    else:
+        from pymongo import MongoClient
+        MongoDBClient.client = MongoClient(args.uri, compressors=get_wire_compressors())
+
+    forest_data = ForestData()
+    collection = forest_data.get_collection(BENCHMARK_COLLECTION, DATABASE_NAME)
+    collection.drop()
+    frame = make_covtype_frame(args.documents, seed=0)
+    for start in range(0, len(frame), 50_000):
+        collection.insert_many(frame.iloc[start:start + 50_000].to_dict("records"))
+
+    exports = {
+        "list of dicts (before)": lambda: export_list_of_dicts(collection),
+        "projected columnar": lambda: forest_data.export_collection_as_dataframe(BENCHMARK_COLLECTION, DATABASE_NAME, batch_size=args.batch_size),
+        f"{args.partitions} partitions": lambda: forest_data.export_collection_partitioned(
+            BENCHMARK_COLLECTION, DATABASE_NAME, n_partitions=args.partitions, max_workers=args.workers, batch_size=args.batch_size),
+    }
+    print(f"{args.documents} documents, batch size {args.batch_size}, {'mongomock' if args.uri is None else args.uri}")
+    print(f"{'export':<26}{'seconds':>10}{'peak MB':>10}{'frame MB':>10}")
+    for name, export in exports.items():
+        df, seconds, peak = measure(export)
+        print(f"{name:<26}{seconds:>10.2f}{peak / 2**20:>10.0f}{df.memory_usage(deep=True).sum() / 2**20:>10.0f}")
+    collection.drop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--documents", type=int, default=100_000)
+    parser.add_argument("--batch-size", type=int, default=10_000)
+    parser.add_argument("--partitions", type=int, default=8)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--uri", default=None)
+    main(parser.parse_args())
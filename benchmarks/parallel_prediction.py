@@ -0,0 +1,45 @@
+"""
+Batch scoring throughput of SensorModel.predict on one core versus the ParallelPredictor process pool
+for a range of worker counts, to size batch prediction nodes. Also checks the parallel predictions
+come back in input order.
+
+Usage: python -m benchmarks.parallel_prediction --rows 500000 --workers 1 2 4 8
+"""
+import time
+import argparse
+import numpy as np
+from benchmarks.synthetic_data import make_covtype_frame, make_sensor_model
+from src.forest.entity.parallel_predictor import ParallelPredictor
+
+
+def main(args):
+    model = make_sensor_model(n_estimators=args.n_estimators)
+    frame = make_covtype_frame(args.rows, seed=1)
+    columns = model.get_fused_preprocessor().input_columns
+    features = frame[columns].to_numpy(dtype=np.float64)
+
+    started = time.perf_counter()
+    expected = model.predict(frame)
+    serial_seconds = time.perf_counter() - started
+
+    print(f"{args.rows} rows, {args.n_estimators} trees, shards of {args.shard_size} rows")
+    print(f"{'mode':<24}{'seconds':>10}{'rows/s':>12}{'speedup':>10}{'same order':>12}")
+    print(f"{'single core':<24}{serial_seconds:>10.2f}{args.rows / serial_seconds:>12.0f}{1.0:>10.2f}{'-':>12}")
+    for workers in args.workers:
+        with ParallelPredictor(model, max_workers=workers, shard_size=args.shard_size) as predictor:
+            # the first call pays for the workers loading the model
+            predictor.predict_array(features[:workers * args.shard_size], columns)
+            started = time.perf_counter()
+            predictions = predictor.predict_array(features, columns)
+            seconds = time.perf_counter() - started
+        same = np.array_equal(predictions, expected)
+        print(f"{f'{workers} workers':<24}{seconds:>10.2f}{args.rows / seconds:>12.0f}{serial_seconds / seconds:>10.2f}{str(same):>12}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=500_000)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--shard-size", type=int, default=20_000)
+    parser.add_argument("--n-estimators", type=int, default=100)
+    main(parser.parse_args())
@@ -0,0 +1,98 @@
+"""
+Latency of single record predictions arriving at a fixed rate when inference runs on the event loop
+(the old /predict handler) versus on the InferenceExecutor, with and without micro batching.
+Latency is measured from the scheduled arrival of a request, so time spent waiting for a blocked
+event loop counts. The loop lag column is the p99 overshoot of a 1 ms sleep running next to the requests.
+
+Usage: python -m benchmarks.serving_latency --rate 200 --requests 1000
+"""
+import time
+import asyncio
+import argparse
+import numpy as np
+from benchmarks.synthetic_data import make_covtype_frame, make_sensor_model, StaticModelCache
+from src.forest.entity.config_entity import InferenceExecutorConfig, MicroBatcherConfig
+from src.forest.pipeline.prediction_pipeline import PredictionPipeline
+from src.forest.serving.inference_executor import InferenceExecutor
+from src.forest.serving.micro_batcher import MicroBatcher
+
+
+async def measure(handler, records: list, rate: float, n_requests: int) -> dict:
+    latencies, lags, failures = [], [], 0
+    done = asyncio.Event()
+
+    async def probe_loop_lag():
+        while not done.is_set():
+            started = time.perf_counter()
+            await asyncio.sleep(0.001)
+            lags.append((time.perf_counter() - started - 0.001) * 1000)
+
+    async def request(record, arrival: float):
+        nonlocal failures
+        try:
+            await handler(record)
+        except Exception:
+            failures += 1
+        latencies.append((time.perf_counter() - arrival) * 1000)
+
+    probe = asyncio.create_task(probe_loop_lag())
+    started = time.perf_counter()
+    tasks = []
+    for i in range(n_requests):
+        arrival = started + i / rate
+        delay = arrival - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        tasks.append(asyncio.create_task(request(records[i % len(records)], arrival)))
+    await asyncio.gather(*tasks)
+    elapsed = time.perf_counter() - started
+    done.set()
+    await probe
+
+    return {
+        "p50_ms": np.percentile(latencies, 50),
+        "p99_ms": np.percentile(latencies, 99),
+        "loop_lag_p99_ms": np.percentile(lags, 99) if lags else float("nan"),
+        "requests_per_s": n_requests / elapsed,
+        "failures": failures,
+    }
+
+
+async def main(args):
+    model_cache = StaticModelCache(make_sensor_model(n_estimators=args.n_estimators))
+    pipeline = PredictionPipeline(model_cache=model_cache)
+    records = make_covtype_frame(1000, seed=1).to_dict("records")
+
+    executor = InferenceExecutor(InferenceExecutorConfig(max_workers=args.workers, max_queue_size=args.requests, timeout_seconds=60))
+    executor.start()
+    batcher = MicroBatcher(pipeline.predict_batch, MicroBatcherConfig(max_batch_size=64, max_wait_ms=2.0), executor=executor)
+    await batcher.start()
+
+    async def on_event_loop(record):
+        return pipeline.predict_batch([record])
+
+    async def on_executor(record):
+        return await executor.run(pipeline.predict_batch, [record])
+
+    scenarios = {
+        "event loop (before)": on_event_loop,
+        "executor": on_executor,
+        "executor + micro batching": batcher.submit,
+    }
+    print(f"{args.requests} requests at {args.rate} req/s, {args.workers} workers, {args.n_estimators} trees")
+    print(f"{'scenario':<28}{'p50 ms':>10}{'p99 ms':>10}{'loop lag p99 ms':>18}{'req/s':>10}{'failed':>8}")
+    for name, handler in scenarios.items():
+        result = await measure(handler, records, args.rate, args.requests)
+        print(f"{name:<28}{result['p50_ms']:>10.1f}{result['p99_ms']:>10.1f}{result['loop_lag_p99_ms']:>18.1f}{result['requests_per_s']:>10.0f}{result['failures']:>8}")
+
+    await batcher.stop()
+    executor.shutdown()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rate", type=float, default=200)
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--n-estimators", type=int, default=100)
+    asyncio.run(main(parser.parse_args()))
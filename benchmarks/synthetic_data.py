@@ -0,0 +1,76 @@
+"""
+Synthetic covtype shaped data and models for the benchmarks, no MongoDB or S3 needed.
+"""
+import os
+import numpy as np
+import pandas as pd
+from sklearn.ensemble import RandomForestClassifier
+from src.forest.components.data_transformation import DataTransformation
+from src.forest.constants.training_pipeline import TARGET_COLUMN, SCHEMA_FILE_PATH
+from src.forest.entity.estimator import SensorModel
+from src.forest.utils.main_utils import read_yaml_file
+
+# PredictionPipeline builds its S3 client eagerly, the benchmarks never call it
+for env_var in ("AWS_ACCESS_KEY_ID", "AWS_SECRET_ACCESS_KEY", "AWS_DEFAULT_REGION"):
+    os.environ.setdefault(env_var, "benchmark")
+
+NUMERIC_COLUMNS = [
+    "Elevation", "Aspect", "Slope", "Horizontal_Distance_To_Hydrology", "Vertical_Distance_To_Hydrology",
+    "Horizontal_Distance_To_Roadways", "Hillshade_9am", "Hillshade_Noon", "Hillshade_3pm", "Horizontal_Distance_To_Fire_Points",
+]
+WILDERNESS_COLUMNS = [f"Wilderness_Area{i}" for i in range(1, 5)]
+SOIL_COLUMNS = [f"Soil_Type{i}" for i in range(1, 41)]
+COVTYPE_COLUMNS = NUMERIC_COLUMNS + WILDERNESS_COLUMNS + SOIL_COLUMNS + [TARGET_COLUMN]
+
+
+def make_covtype_frame(n_rows: int, seed: int = 0) -> pd.DataFrame:
+    """
+    Random rows with the value ranges and one-hot groups of the covtype dataset
+    """
+    rng = np.random.default_rng(seed)
+    data = {
+        "Elevation": rng.integers(1859, 3859, n_rows),
+        "Aspect": rng.integers(0, 361, n_rows),
+        "Slope": rng.integers(0, 67, n_rows),
+        "Horizontal_Distance_To_Hydrology": rng.integers(0, 1398, n_rows),
+        "Vertical_Distance_To_Hydrology": rng.integers(-173, 602, n_rows),
+        "Horizontal_Distance_To_Roadways": rng.integers(0, 7118, n_rows),
+        "Hillshade_9am": rng.integers(0, 255, n_rows),
+        "Hillshade_Noon": rng.integers(0, 255, n_rows),
+        "Hillshade_3pm": rng.integers(0, 255, n_rows),
+        "Horizontal_Distance_To_Fire_Points": rng.integers(0, 7173, n_rows),
+    }
+    wilderness = rng.integers(0, len(WILDERNESS_COLUMNS), n_rows)
+    soil = rng.integers(0, len(SOIL_COLUMNS), n_rows)
+    for i, col in enumerate(WILDERNESS_COLUMNS):
+        data[col] = (wilderness == i).astype(np.int64)
+    for i, col in enumerate(SOIL_COLUMNS):
+        data[col] = (soil == i).astype(np.int64)
+    data[TARGET_COLUMN] = (data["Elevation"] // 300 + wilderness + soil % 3) % 7 + 1
+    return pd.DataFrame(data, columns=COVTYPE_COLUMNS)
+
+
+def make_sensor_model(n_rows: int = 20000, n_estimators: int = 100, seed: int = 0) -> SensorModel:
+    """
+    SensorModel trained the way the training pipeline does it, on synthetic rows
+    """
+    schema_config = read_yaml_file(SCHEMA_FILE_PATH)
+    train_df = make_covtype_frame(n_rows, seed).drop(columns=schema_config["drop_columns"])
+    preprocessor = DataTransformation(data_ingestion_artifact=None, data_transformation_config=None).get_data_transformer_object()
+    x_train = preprocessor.fit_transform(train_df.drop(columns=[TARGET_COLUMN]))
+    y_train = np.array(train_df[TARGET_COLUMN], dtype=float)
+    model = RandomForestClassifier(n_estimators=n_estimators, min_samples_leaf=3, random_state=seed).fit(x_train, y_train)
+    return SensorModel(preprocessing_object=preprocessor, trained_model_object=model)
+
+
+class StaticModelCache:
+    """
+    Stand-in for ModelCache holding an already built model
+    """
+    def __init__(self, model: SensorModel, version: str = "synthetic"):
+        self.model = model
+        self.version = version
+        self.is_loaded = True
+
+    def get_model(self) -> SensorModel:
+        return self.model
@@ -0,0 +1,102 @@
+"""
+Per request cost of the TrafficMonitor on the serving path: the time observe() adds to a scored batch
+(copying the features and queueing them), PredictionPipeline.predict_batch latency with and without the
+monitor, and the rows per second its background thread accumulates in one drained block. Also checks that
+the snapshot flags the shifted features of drifted traffic and none of traffic drawn like the reference.
+
+Usage: python -m benchmarks.traffic_monitor --requests 5000 --batch-sizes 1 64
+"""
+import os
+import time
+import argparse
+import tempfile
+import numpy as np
+from benchmarks.synthetic_data import make_covtype_frame, make_sensor_model, StaticModelCache
+from src.forest.constants.training_pipeline import SCHEMA_FILE_PATH
+from src.forest.entity.config_entity import TrafficMonitorConfig
+from src.forest.entity.drift_statistics import HistogramStatistics
+from src.forest.pipeline.prediction_pipeline import PredictionPipeline
+from src.forest.serving.traffic_monitor import TrafficMonitor
+from src.forest.utils.main_utils import read_yaml_file, write_yaml_file, enforce_schema_dtypes
+
+
+def percentile_us(timings: list, q: float) -> float:
+    return float(np.percentile(timings, q)) * 1e6
+
+
+def make_monitor(reference_file_path: str, columns: list, schema_config: dict) -> TrafficMonitor:
+    monitor = TrafficMonitor(columns, schema_config, TrafficMonitorConfig(reference_statistics_file_path=reference_file_path))
+    monitor.start()
+    return monitor
+
+
+def main(args):
+    schema_config = read_yaml_file(SCHEMA_FILE_PATH)
+    model = make_sensor_model(n_estimators=args.n_estimators)
+    pipeline = PredictionPipeline(model_cache=StaticModelCache(model))
+    columns = pipeline.feature_vectorizer.columns
+
+    reference_frame = enforce_schema_dtypes(make_covtype_frame(args.reference_rows, seed=0), schema_config)
+    reference = HistogramStatistics.from_reference(reference_frame, columns + ["Cover_Type"])
+    reference_file_path = os.path.join(tempfile.mkdtemp(), "reference_statistics.yaml")
+    write_yaml_file(reference_file_path, reference.to_dict())
+
+    traffic = make_covtype_frame(args.requests * max(args.batch_sizes), seed=1)
+    features = traffic[columns].to_numpy(dtype=np.float64)
+    predictions = np.ones(len(features), dtype=np.int64)
+
+    print(f"{len(columns)} features, {args.requests} requests per batch size")
+    print(f"{'batch size':>10}{'observe p50 us':>16}{'observe p99 us':>16}{'predict p50 us':>16}{'+monitor p50 us':>17}{'update rows/s':>16}")
+    for batch_size in args.batch_sizes:
+        monitor = make_monitor(reference_file_path, columns, schema_config)
+        observe_timings = []
+        for i in range(args.requests):
+            batch = features[i * batch_size:(i + 1) * batch_size]
+            started = time.perf_counter()
+            monitor.observe(batch.copy(), predictions[:batch_size], 0)
+            observe_timings.append(time.perf_counter() - started)
+        monitor.stop()
+        block = features[:args.requests * batch_size]
+        started = time.perf_counter()
+        monitor.update(block, predictions[:len(block)])
+        update_rows_per_second = len(block) / (time.perf_counter() - started)
+
+        predict_timings = {}
+        for with_monitor in (False, True):
+            pipeline.traffic_monitor = make_monitor(reference_file_path, columns, schema_config) if with_monitor else None
+            records = traffic.iloc[:batch_size * args.predict_requests][columns].to_dict("records")
+            timings = []
+            for i in range(args.predict_requests):
+                payload = records[i * batch_size:(i + 1) * batch_size]
+                started = time.perf_counter()
+                pipeline.predict_batch(payload)
+                timings.append(time.perf_counter() - started)
+            predict_timings[with_monitor] = percentile_us(timings, 50)
+            if with_monitor:
+                pipeline.traffic_monitor.stop()
+        pipeline.traffic_monitor = None
+
+        print(f"{batch_size:>10}{percentile_us(observe_timings, 50):>16.1f}{percentile_us(observe_timings, 99):>16.1f}"
+              f"{predict_timings[False]:>16.0f}{predict_timings[True]:>17.0f}{update_rows_per_second:>16.0f}")
+
+    for name, frame in (("same distribution", make_covtype_frame(20_000, seed=2)), ("shifted Elevation, Slope", make_covtype_frame(20_000, seed=3))):
+        if name.startswith("shifted"):
+            frame["Elevation"] += 400
+            frame["Slope"] = frame["Slope"] // 2
+        monitor = make_monitor(reference_file_path, columns, schema_config)
+        for start in range(0, len(frame), 64):
+            monitor.observe(frame.iloc[start:start + 64][columns].to_numpy(dtype=np.float64), predictions[:64][:len(frame.iloc[start:start + 64])])
+        monitor.flush(timeout=60)
+        snapshot = monitor.snapshot()
+        monitor.stop()
+        print(f"{name}: drifted features {snapshot['drifted_features']}, dropped batches {snapshot['n_dropped_batches']}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--predict-requests", type=int, default=500)
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 64])
+    parser.add_argument("--reference-rows", type=int, default=200_000)
+    parser.add_argument("--n-estimators", type=int, default=50)
+    main(parser.parse_args())
@@ -1,14 +1,17 @@
 import boto3
 from src.forest.configurations.aws_connection import S3Client
 from io import StringIO
-from typing import Union, List
+from typing import Iterator, Union, List
 import os,sys
 from src.forest.exception import ForestExpection
 from src.forest.logger import logging
+from src.forest.cloud_storage.s3_multipart_writer import S3MultipartWriter
 from mypy_boto3_s3.service_resource import Bucket
 from botocore.exceptions import ClientError
 from pandas import DataFrame, read_csv
 import pickle
+import tempfile
+from src.forest.utils.table_utils import read_table_chunks
 
 
 class SimpleStorageService:
@@ -128,6 +131,26 @@ class SimpleStorageService:
             logging.error(f"Error in get_file_object: {str(e)}")
             raise ForestExpection(e, sys) from e
 
+    def get_object_version(self, key: str, bucket_name: str) -> str:
+        """
+        Method Name :   get_object_version
+        Description :   This method returns a cheap version tag (VersionId or ETag) of the key object using a HEAD request
+        Output      :   Version tag of the object is returned without downloading its body
+        On Failure  :   Write an exception log and then raise an exception
+        Revisions   :   moved setup to cloud
+        """
+        logging.info("Entered the get_object_version method of S3Operations class")
+
+        try:
+            response = self.s3_client.head_object(Bucket=bucket_name, Key=key)
+            version_id = response.get("VersionId")
+            version = version_id if version_id not in (None, "null") else response["ETag"].strip('"')
+            logging.info("Exited the get_object_version method of S3Operations class")
+            return version
+
+        except Exception as e:
+            raise ForestExpection(e, sys) from e
+
     def load_model(self, model_name: str, bucket_name: str, model_dir: str = None) -> object:
         """
         Method Name :   load_model
@@ -220,6 +243,23 @@ class SimpleStorageService:
         except Exception as e:
             raise ForestExpection(e, sys) from e
 
+    def open_multipart_writer(self, key: str, bucket_name: str, part_size: int, max_concurrency: int, local_file_path: str = None) -> S3MultipartWriter:
+        """
+        Method Name :   open_multipart_writer
+        Description :   This method opens a binary file object streaming its content to the key object of bucket_name bucket
+        Output      :   S3MultipartWriter, the object is created when the writer is closed
+        On Failure  :   Write an exception log and then raise an exception
+        Revisions   :   moved setup to cloud
+        """
+        logging.info("Entered the open_multipart_writer method of S3Operations class")
+
+        try:
+            writer = S3MultipartWriter(self.s3_client, bucket_name, key, part_size=part_size, max_concurrency=max_concurrency, local_file_path=local_file_path)
+            logging.info("Exited the open_multipart_writer method of S3Operations class")
+            return writer
+        except Exception as e:
+            raise ForestExpection(e, sys) from e
+
     def get_df_from_object(self, object_: object) -> DataFrame:
         """
         Method Name :   get_df_from_object
@@ -254,4 +294,38 @@ class SimpleStorageService:
             logging.info("Exited the read_csv method of S3Operations class")
             return df
         except Exception as e:
-            raise ForestExpection(e, sys) from e
\ No newline at end of file
+            raise ForestExpection(e, sys) from e
+
+    def read_table_chunks(self, filename: str, bucket_name: str, table_format: str, columns: List[str] = None, chunk_size: int = None) -> Iterator[DataFrame]:
+        """
+        Method Name :   read_table_chunks
+        Description :   This method decodes the filename csv, parquet or Arrow IPC object of bucket_name bucket chunk_size rows at a time
+        Output      :   Iterator of dataframes holding only the listed columns. csv bodies are parsed as they stream in,
+                        columnar objects are downloaded to a temporary file that is memory mapped and read column by column
+        On Failure  :   Write an exception log and then raise an exception
+        Revisions   :   moved setup to cloud
+        """
+        logging.info("Entered the read_table_chunks method of S3Operations class")
+
+        try:
+            table_obj = self.get_file_object(filename, bucket_name)
+            if isinstance(table_obj, list):
+                table_obj = table_obj[0]
+
+            if table_format == "csv":
+                body = table_obj.get()["Body"]
+                try:
+                    yield from read_table_chunks(body, table_format, columns=columns, chunk_size=chunk_size)
+                finally:
+                    body.close()
+            else:
+                local_file = tempfile.NamedTemporaryFile(suffix=f".{table_format}", delete=False)
+                local_file.close()
+                try:
+                    self.s3_client.download_file(bucket_name, table_obj.key, local_file.name)
+                    yield from read_table_chunks(local_file.name, table_format, columns=columns, chunk_size=chunk_size)
+                finally:
+                    os.remove(local_file.name)
+            logging.info("Exited the read_table_chunks method of S3Operations class")
+        except Exception as e:
+            raise ForestExpection(e, sys) from e
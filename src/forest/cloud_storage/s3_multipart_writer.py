@@ -0,0 +1,138 @@
+import io
+import sys
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import BinaryIO, Dict, List, Optional
+from src.forest.exception import ForestExpection
+from src.forest.logger import logging
+
+# S3 rejects multipart parts below 5 MiB, except for the last one
+S3_MIN_PART_SIZE: int = 5 * 1024 * 1024
+
+
+class S3MultipartWriter(io.RawIOBase):
+    """
+    Binary file object streaming what is written to it into an S3 object as a multipart upload.
+    Bytes collect in an in-memory buffer that is sent as a part every `part_size` bytes, with at most
+    `max_concurrency` parts in flight, so memory stays around part_size * (max_concurrency + 1).
+    The same bytes can also go to `local_file_path`, giving a local copy without serializing twice.
+    Outputs smaller than one part are sent with a single put_object.
+    """
+    def __init__(self, s3_client: object, bucket_name: str, key: str, part_size: int = 8 * 1024 * 1024,
+                 max_concurrency: int = 4, local_file_path: Optional[str] = None):
+        super().__init__()
+        self.s3_client = s3_client
+        self.bucket_name = bucket_name
+        self.key = key
+        self.part_size = max(part_size, S3_MIN_PART_SIZE)
+        self.max_concurrency = max(1, max_concurrency)
+        self.local_file_path = local_file_path
+        self.bytes_written: int = 0
+
+        self._local_file: Optional[BinaryIO] = None
+        self._buffer = io.BytesIO()
+        self._upload_id: Optional[str] = None
+        self._parts: List[Future] = []
+        self._slots = threading.BoundedSemaphore(self.max_concurrency)
+        self._pool: Optional[ThreadPoolExecutor] = None
+        if local_file_path is not None:
+            self._local_file = open(local_file_path, "wb")
+
+    def writable(self) -> bool:
+        return True
+
+    def tell(self) -> int:
+        return self.bytes_written
+
+    def write(self, data: bytes) -> int:
+        if self.closed:
+            raise ValueError("write to a closed S3MultipartWriter")
+        try:
+            if self._local_file is not None:
+                self._local_file.write(data)
+            written = self._buffer.write(data)
+            self.bytes_written += written
+            if self._buffer.tell() >= self.part_size:
+                self._send_part()
+            return written
+        except Exception as e:
+            self.abort()
+            raise ForestExpection(e, sys) from e
+
+    def _upload_part(self, part_number: int, body: bytes) -> Dict:
+        try:
+            response = self.s3_client.upload_part(Bucket=self.bucket_name, Key=self.key, UploadId=self._upload_id, PartNumber=part_number, Body=body)
+            return {"ETag": response["ETag"], "PartNumber": part_number}
+        finally:
+            self._slots.release()
+
+    def _send_part(self) -> None:
+        if self._upload_id is None:
+            self._upload_id = self.s3_client.create_multipart_upload(Bucket=self.bucket_name, Key=self.key)["UploadId"]
+            self._pool = ThreadPoolExecutor(max_workers=self.max_concurrency, thread_name_prefix="s3-upload")
+            logging.info(f"Started multipart upload of s3://{self.bucket_name}/{self.key} in parts of {self.part_size} bytes")
+
+        # a failed part fails the upload early instead of at complete time
+        for part in self._parts:
+            if part.done() and part.exception() is not None:
+                raise part.exception()
+
+        body = self._buffer.getvalue()
+        self._buffer = io.BytesIO()
+        self._slots.acquire()
+        self._parts.append(self._pool.submit(self._upload_part, len(self._parts) + 1, body))
+
+    def close(self) -> None:
+        """
+        Sends the remaining bytes and completes the upload, aborting it on failure
+        """
+        if self.closed:
+            return
+        try:
+            if self._local_file is not None:
+                self._local_file.close()
+            if self._upload_id is None:
+                self.s3_client.put_object(Bucket=self.bucket_name, Key=self.key, Body=self._buffer.getvalue())
+            else:
+                if self._buffer.tell() > 0:
+                    self._send_part()
+                parts = [part.result() for part in self._parts]
+                self.s3_client.complete_multipart_upload(Bucket=self.bucket_name, Key=self.key, UploadId=self._upload_id, MultipartUpload={"Parts": parts})
+                self._pool.shutdown(wait=True)
+            logging.info(f"Uploaded {self.bytes_written} bytes to s3://{self.bucket_name}/{self.key} in {max(len(self._parts), 1)} parts")
+        except Exception as e:
+            self.abort()
+            raise ForestExpection(e, sys) from e
+        finally:
+            self._buffer = io.BytesIO()
+            super().close()
+
+    def abort(self) -> None:
+        """
+        Drops the parts sent so far, S3 keeps (and bills) the parts of an upload that is never completed or aborted
+        """
+        if self._local_file is not None and not self._local_file.closed:
+            self._local_file.close()
+        if self._pool is not None:
+            self._pool.shutdown(wait=True, cancel_futures=True)
+            self._pool = None
+        if self._upload_id is not None:
+            upload_id, self._upload_id = self._upload_id, None
+            try:
+                self.s3_client.abort_multipart_upload(Bucket=self.bucket_name, Key=self.key, UploadId=upload_id)
+                logging.warning(f"Aborted multipart upload of s3://{self.bucket_name}/{self.key}")
+            except Exception as e:
+                logging.error(f"Could not abort multipart upload {upload_id}: {str(e)}")
+        if not self.closed:
+            super().close()
+
+    def __del__(self) -> None:
+        # io.IOBase closes on garbage collection, which would complete a partial upload
+        if not self.closed:
+            self.abort()
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
@@ -1,13 +1,16 @@
 import sys, os
+from typing import Dict, List, Optional
 import shutil
+import numpy as np
 import pandas as pd
 from zipfile import ZipFile
-from sklearn.model_selection import train_test_split
 from src.forest.entity.config_entity import DataIngestionConfig
 from src.forest.entity.artifact_entity import DataIngestionArtifact
 from src.forest.exception import ForestExpection
 from src.forest.logger import logging
-from src.forest.utils.main_utils import read_yaml_file, create_directories
+from bson import ObjectId
+from src.forest.utils.main_utils import read_yaml_file, write_yaml_file_atomic, create_directories, save_dataframe, load_dataframe, enforce_schema_dtypes, get_row_hashes
+from src.forest.utils.one_hot_utils import get_one_hot_groups
 from src.forest.constants.training_pipeline import SCHEMA_FILE_PATH
 from src.forest.data_access.forest_data import ForestData
 
@@ -16,6 +19,29 @@ class DataIngestion:
     def __init__(self, data_ingestion_config: DataIngestionConfig = DataIngestionConfig()):
         try:
            self.data_ingestion_config = data_ingestion_config
+           # rows of the last incremental export, at the end of the feature store it returned
+           self.n_new_rows: Optional[int] = None
+        except Exception as e:
+            raise ForestExpection(e, sys)
+
+    def get_packed_groups(self, df: pd.DataFrame) -> Optional[Dict[str, List[str]]]:
+        """
+        One-hot groups {name: columns} of the frame stored packed, None when packing is disabled
+        """
+        if not self.data_ingestion_config.pack_one_hot_groups:
+            return None
+        return get_one_hot_groups(read_yaml_file(file_path = SCHEMA_FILE_PATH), list(df.columns))
+
+    def get_source_version(self) -> dict:
+        """
+        Document count and newest `_id` of the collection, they change whenever documents are inserted or removed.
+        Documents updated in place keep them, a stage cache rerun has to be forced after such updates.
+        """
+        try:
+            forest_data = ForestData()
+            collection = forest_data.get_collection(self.data_ingestion_config.collection_name)
+            newest_id = forest_data.get_last_key(collection)
+            return {"n_documents": collection.estimated_document_count(), "last_id": None if newest_id is None else str(newest_id)}
         except Exception as e:
             raise ForestExpection(e, sys)
 
@@ -23,30 +49,123 @@ class DataIngestion:
         try:
            logging.info("Exporting data from MogoDB into feature store")
            sensor_data = ForestData()
-           df = sensor_data.export_collection_as_dataframe(collection_name=self.data_ingestion_config.collection_name)
+           if self.data_ingestion_config.export_partitions > 1:
+               df = sensor_data.export_collection_partitioned(
+                   collection_name=self.data_ingestion_config.collection_name,
+                   n_partitions=self.data_ingestion_config.export_partitions,
+                   max_workers=self.data_ingestion_config.export_workers,
+               )
+           else:
+               df = sensor_data.export_collection_as_dataframe(collection_name=self.data_ingestion_config.collection_name)
 
            logging.info(f"Shape of data frame: {df.shape}")
            feature_store_file_path = self.data_ingestion_config.feature_store_file_path
-           dir_path = os.path.dirname(feature_store_file_path)
-           os.makedirs(dir_path, exist_ok=True)
            logging.info(f"Saving data into feature store file path: {feature_store_file_path}")
-           df.to_csv(feature_store_file_path, index=False, header=True)
+           save_dataframe(feature_store_file_path, df, one_hot_groups=self.get_packed_groups(df))
            return df
         
         except Exception as e:
             raise ForestExpection(e, sys) 
         
-    def split_data_as_train_test(self, df: pd.DataFrame) -> None:
+    def read_high_water_mark(self) -> dict:
+        """
+        Last ingested `_id` and the parts of the persistent feature store, empty before the first incremental run
+        """
+        if not os.path.exists(self.data_ingestion_config.high_water_mark_file_path):
+            return {}
+        return read_yaml_file(self.data_ingestion_config.high_water_mark_file_path) or {}
+
+    def write_high_water_mark(self, high_water_mark: dict) -> None:
+        write_yaml_file_atomic(self.data_ingestion_config.high_water_mark_file_path, high_water_mark)
+
+    def load_persistent_feature_store(self, parts: list) -> pd.DataFrame:
+        store_dir = self.data_ingestion_config.persistent_feature_store_dir
+        if not parts:
+            return pd.DataFrame()
+        frames = [load_dataframe(os.path.join(store_dir, part)) for part in parts]
+        return pd.concat(frames, ignore_index=True) if len(frames) > 1 else frames[0]
+
+    def export_delta_into_feature_store(self) -> pd.DataFrame:
+        """
+        Method Name: export_delta_into_feature_store
+        Description: Pulls the documents whose `_id` is above the high-water mark and at most the newest `_id` seen now,
+                     appends them as a new parquet part of the persistent feature store, then moves the mark.
+                     Only parts listed in the mark are part of the store, so a run failing half way is simply redone.
+                     Relies on ObjectIds growing with insertion time, as they do with a single writer.
+        Output: the whole feature store, previous parts and the new delta
+        On Failure: Write an exception log and then raise an exception
+        """
+        try:
+            store_dir = self.data_ingestion_config.persistent_feature_store_dir
+            os.makedirs(store_dir, exist_ok=True)
+            high_water_mark = self.read_high_water_mark()
+            parts = list(high_water_mark.get("parts", []))
+            last_id = ObjectId(high_water_mark["last_id"]) if "last_id" in high_water_mark else None
+
+            forest_data = ForestData()
+            collection = forest_data.get_collection(self.data_ingestion_config.collection_name)
+            newest_id = forest_data.get_last_key(collection)
+            if newest_id is None or (last_id is not None and newest_id <= last_id):
+                logging.info(f"No documents after the high-water mark {last_id}, feature store has {len(parts)} parts")
+                self.n_new_rows = 0
+                return self.load_persistent_feature_store(parts)
+
+            # documents inserted while exporting are above newest_id and left to the next run
+            id_range = {"$lte": newest_id} if last_id is None else {"$gt": last_id, "$lte": newest_id}
+            if self.data_ingestion_config.export_partitions > 1:
+                delta = forest_data.export_collection_partitioned(
+                    collection_name=self.data_ingestion_config.collection_name,
+                    n_partitions=self.data_ingestion_config.export_partitions,
+                    max_workers=self.data_ingestion_config.export_workers,
+                    query={"_id": id_range},
+                )
+            else:
+                delta = forest_data.export_collection_as_dataframe(collection_name=self.data_ingestion_config.collection_name, query={"_id": id_range})
+            logging.info(f"Exported {len(delta)} documents after the high-water mark {last_id}")
+
+            part = f"part-{newest_id}.parquet"
+            save_dataframe(os.path.join(store_dir, part), delta, one_hot_groups=self.get_packed_groups(delta))
+            parts.append(part)
+            self.write_high_water_mark({"last_id": str(newest_id), "parts": parts, "n_documents": high_water_mark.get("n_documents", 0) + len(delta)})
+            logging.info(f"Moved the high-water mark to {newest_id}, feature store has {len(parts)} parts")
+            self.n_new_rows = len(delta)
+            return self.load_persistent_feature_store(parts)
+
+        except Exception as e:
+            raise ForestExpection(e, sys)
+
+    def split_data_as_train_test(self, df: pd.DataFrame) -> tuple:
+        """
+        Splits the frame into train and test sets by a hash of the values of each row: a row goes to the test set
+        when its hash falls in the first train_test_split_ratio of the hash range. The same row lands on the same
+        side in every run, so rows added to the collection never move earlier rows between the sets and a model
+        trained in a previous run never sees the test rows of the next one. After an incremental export, the new rows
+        (the last n_new_rows of the frame) that went to the train set are also saved on their own, otherwise
+        new_train_set is None.
+        """
         logging.info("Splitting data into train and test")
         try:
-            train_set, test_set = train_test_split(df, test_size=self.data_ingestion_config.train_test_split_ratio)
+            is_new = np.zeros(len(df), dtype=bool)
+            if self.n_new_rows:
+                is_new[len(df) - self.n_new_rows:] = True
+            # top 53 bits of the hash as a fraction of the hash range, exact in float64
+            hash_fractions = (get_row_hashes(df) >> np.uint64(11)).astype(np.float64) / float(1 << 53)
+            is_test = hash_fractions < self.data_ingestion_config.train_test_split_ratio
+            train_set, test_set, is_new_train = df[~is_test], df[is_test], is_new[~is_test]
+            # same frames as the ones read back from the files
+            train_set, test_set = train_set.reset_index(drop=True), test_set.reset_index(drop=True)
             logging.info("Train Test split completed")
-            
-            dir_path = os.path.dirname(self.data_ingestion_config.training_file_path)
-            os.makedirs(dir_path, exist_ok=True)
-            train_set.to_csv(self.data_ingestion_config.training_file_path, index=False, header=True)
-            test_set.to_csv(self.data_ingestion_config.testing_file_path, index=False, header=True)
+
+            one_hot_groups = self.get_packed_groups(df)
+            save_dataframe(self.data_ingestion_config.training_file_path, train_set, one_hot_groups=one_hot_groups)
+            save_dataframe(self.data_ingestion_config.testing_file_path, test_set, one_hot_groups=one_hot_groups)
+            new_train_set = None
+            if self.n_new_rows is not None:
+                new_train_set = train_set[is_new_train].reset_index(drop=True)
+                save_dataframe(self.data_ingestion_config.new_training_file_path, new_train_set, one_hot_groups=one_hot_groups)
+                logging.info(f"{len(new_train_set)} of the {self.n_new_rows} new rows went to the train set")
             logging.info("Exported train and test data into respective file paths")
+            return train_set, test_set, new_train_set
         except Exception as e:
             raise ForestExpection(e, sys)
         
@@ -61,15 +180,22 @@ class DataIngestion:
         """
         logging.info("Data ingestion initiated")
         try:
-            df = self.export_data_into_feature_store()
+            if self.data_ingestion_config.incremental:
+                df = self.export_delta_into_feature_store()
+            else:
+                df = self.export_data_into_feature_store()
             _schema_config = read_yaml_file(file_path = SCHEMA_FILE_PATH)
-            df = df.drop(columns=_schema_config['drop_columns'], axis=1)
+            # feature store parts written before the compact schema dtypes are cast here
+            df = enforce_schema_dtypes(df.drop(columns=_schema_config['drop_columns']), _schema_config)
 
             logging.info("Data exported into feature store successfully")
-            self.split_data_as_train_test(df=df)
+            train_set, test_set, new_train_set = self.split_data_as_train_test(df=df)
             logging.info("Exited from initiate_data_ingestion method of DataIngestion class")
 
-            data_ingestion_artifact = DataIngestionArtifact(training_file_path=self.data_ingestion_config.training_file_path, testing_file_path=self.data_ingestion_config.testing_file_path)
+            data_ingestion_artifact = DataIngestionArtifact(training_file_path=self.data_ingestion_config.training_file_path, testing_file_path=self.data_ingestion_config.testing_file_path,
+                                                            train_df=train_set, test_df=test_set,
+                                                            new_training_file_path=None if new_train_set is None else self.data_ingestion_config.new_training_file_path,
+                                                            new_train_df=new_train_set)
             logging.info(f"Data ingestion artifact: {data_ingestion_artifact}")
             return data_ingestion_artifact
 
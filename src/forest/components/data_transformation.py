@@ -8,7 +8,7 @@ from sklearn.pipeline import Pipeline
 from src.forest.constants import *
 from src.forest.exception import ForestExpection
 from src.forest.logger import logging
-from src.forest.utils.main_utils import save_object, save_numpy_array_data, read_yaml_file
+from src.forest.utils.main_utils import save_object, save_numpy_array_data, read_yaml_file, load_dataframe, enforce_schema_dtypes
 from src.forest.constants.training_pipeline import TARGET_COLUMN, SCHEMA_FILE_PATH
 from src.forest.entity.artifact_entity import DataIngestionArtifact, DataTransformationArtifact
 from src.forest.entity.config_entity import DataTransformationConfig
@@ -22,10 +22,21 @@ class DataTransformation:
     @staticmethod
     def read_data(file_path: str) -> pd.DataFrame:
         try:
-            return pd.read_csv(file_path)
+            return enforce_schema_dtypes(load_dataframe(file_path), read_yaml_file(file_path = SCHEMA_FILE_PATH))
         except Exception as e:
             raise ForestExpection(e, sys)
         
+    @staticmethod
+    def stack_features_and_target(features: np.ndarray, target: pd.Series) -> np.ndarray:
+        """
+        float32 array of the features with the target as last column, half the size of float64
+        and the precision the tree models split on anyway
+        """
+        array = np.empty((features.shape[0], features.shape[1] + 1), dtype=np.float32)
+        array[:, :-1] = features
+        array[:, -1] = target.to_numpy()
+        return array
+
     def get_data_transformer_object(self) -> object:
         logging.info("Got numerical and categorical columns from schema config")
         try:
@@ -63,14 +74,17 @@ class DataTransformation:
             preprocessor = self.get_data_transformer_object()
             logging.info("Got the preprocessor object")
 
-            train_df = DataTransformation.read_data(file_path=self.data_ingestion_artifact.training_file_path)
-            test_df = DataTransformation.read_data(file_path=self.data_ingestion_artifact.testing_file_path)
+            train_df, test_df = self.data_ingestion_artifact.train_df, self.data_ingestion_artifact.test_df
+            if train_df is None:
+                train_df = DataTransformation.read_data(file_path=self.data_ingestion_artifact.training_file_path)
+            if test_df is None:
+                test_df = DataTransformation.read_data(file_path=self.data_ingestion_artifact.testing_file_path)
 
-            input_feature_train_df = train_df.drop(columns=[TARGET_COLUMN], axis=1)
+            input_feature_train_df = train_df.drop(columns=[TARGET_COLUMN])
             target_feature_train_df = train_df[TARGET_COLUMN]
             logging.info("Got the input and target features for training data")
 
-            input_feature_test_df = test_df.drop(columns=[TARGET_COLUMN], axis=1)
+            input_feature_test_df = test_df.drop(columns=[TARGET_COLUMN])
             target_feature_test_df = test_df[TARGET_COLUMN]
             logging.info("Got the input and target features for testing data")
 
@@ -79,8 +93,8 @@ class DataTransformation:
             input_feature_test_arr = preprocessor.transform(input_feature_test_df)
             logging.info("Applied the preprocessor object on training and testing data")
 
-            train_arr = np.c_[input_feature_train_arr, np.array(target_feature_train_df)]
-            test_arr = np.c_[input_feature_test_arr, np.array(target_feature_test_df)]
+            train_arr = DataTransformation.stack_features_and_target(input_feature_train_arr, target_feature_train_df)
+            test_arr = DataTransformation.stack_features_and_target(input_feature_test_arr, target_feature_test_df)
 
             save_object(self.data_transformation_config.transformed_object_file_path, preprocessor)
             save_numpy_array_data(self.data_transformation_config.transformed_train_file_path, array=train_arr)
@@ -90,7 +104,9 @@ class DataTransformation:
             data_transformation_artifact = DataTransformationArtifact(
                 transformed_train_file_path = self.data_transformation_config.transformed_train_file_path,
                 transformed_test_file_path = self.data_transformation_config.transformed_test_file_path,
-                transformed_object_file_path = self.data_transformation_config.transformed_object_file_path
+                transformed_object_file_path = self.data_transformation_config.transformed_object_file_path,
+                train_arr = train_arr,
+                test_arr = test_arr
             )
             return data_transformation_artifact
         
@@ -1,11 +1,14 @@
+import os
 import sys
+import time
 import pandas as pd
 from src.forest.exception import ForestExpection
 from src.forest.logger import logging
-from src.forest.utils.main_utils import read_yaml_file
+from src.forest.utils.main_utils import read_yaml_file, write_yaml_file, write_yaml_file_atomic, load_dataframe, enforce_schema_dtypes, get_out_of_range_counts
 from src.forest.constants.training_pipeline import SCHEMA_FILE_PATH
 from src.forest.entity.artifact_entity import DataIngestionArtifact, DataValidationArtifact
 from src.forest.entity.config_entity import DataValidationConfig
+from src.forest.entity.drift_statistics import HistogramStatistics, DRIFT_QUANTILES
 
 
 class DataValidation:
@@ -25,9 +28,21 @@ class DataValidation:
     @staticmethod
     def read_data(file_path) -> pd.DataFrame:
         try:
-            return pd.read_csv(file_path)
+            return enforce_schema_dtypes(load_dataframe(file_path), read_yaml_file(file_path = SCHEMA_FILE_PATH))
         except Exception as e:
             raise ForestExpection(e, sys)
+
+    def report_out_of_range_values(self, dataframe: pd.DataFrame) -> dict:
+        """
+        Logs the count of values outside the schema range of each column, they do not fail the validation
+        """
+        try:
+            out_of_range = get_out_of_range_counts(dataframe, self._schema_config)
+            if out_of_range:
+                logging.warning(f"Values out of the schema range: {out_of_range}")
+            return out_of_range
+        except Exception as e:
+            raise ForestExpection(e, sys) from e
             
     def is_numerical_column_exists(self, dataframe: pd.DataFrame) -> bool:
         try:
@@ -44,19 +59,130 @@ class DataValidation:
         except Exception as e:
             raise ForestExpection(e, sys) from e
             
+    def get_drift_columns(self, dataframe: pd.DataFrame) -> list:
+        columns = self._schema_config['numerical_columns'] + self._schema_config['categorical_columns']
+        return [col for col in columns if col in dataframe.columns]
+
+    def get_reference_statistics(self, train_df: pd.DataFrame) -> HistogramStatistics:
+        """
+        Histograms of the reference training set, read from the cached file when it was built for the same
+        columns and bins, otherwise computed from train_df and cached. refresh_reference rebuilds the cache.
+        """
+        try:
+            file_path = self.data_validation_config.reference_statistics_file_path
+            columns = self.get_drift_columns(train_df)
+            if not self.data_validation_config.refresh_reference and os.path.exists(file_path):
+                reference = HistogramStatistics.from_dict(read_yaml_file(file_path))
+                if reference.columns == columns and reference.n_bins == self.data_validation_config.drift_n_bins:
+                    logging.info(f"Loaded reference statistics of {reference.n_rows} rows from {file_path}")
+                    return reference
+                logging.info("Cached reference statistics do not match the schema columns or bins, rebuilding them")
+
+            return self.save_reference_statistics(train_df)
+
+        except Exception as e:
+            raise ForestExpection(e, sys) from e
+
+    def save_reference_statistics(self, train_df: pd.DataFrame) -> HistogramStatistics:
+        """
+        Computes the histograms of train_df and caches them as the reference of the next drift reports
+        """
+        try:
+            file_path = self.data_validation_config.reference_statistics_file_path
+            reference = HistogramStatistics.from_reference(train_df, self.get_drift_columns(train_df), n_bins=self.data_validation_config.drift_n_bins)
+            write_yaml_file_atomic(file_path, reference.to_dict())
+            logging.info(f"Cached reference statistics of {reference.n_rows} rows in {file_path}")
+            return reference
+
+        except Exception as e:
+            raise ForestExpection(e, sys) from e
+
+    def refresh_reference_statistics(self) -> HistogramStatistics:
+        """
+        Method Name: refresh_reference_statistics
+        Description: Rebuilds the reference statistics from the train set of the ingestion artifact, once a model
+                     fully retrained on it is deployed, so drift is measured against the data of the deployed model
+        Output: the new reference statistics
+        On Failure: Write an exception log and then raise an exception
+        """
+        try:
+            train_df = self.data_ingestion_artifact.train_df
+            if train_df is None:
+                train_df = DataValidation.read_data(file_path = self.data_ingestion_artifact.training_file_path)
+            return self.save_reference_statistics(train_df)
+
+        except Exception as e:
+            raise ForestExpection(e, sys) from e
+
+    def detect_dataset_drift(self, reference: HistogramStatistics, dataframe: pd.DataFrame) -> dict:
+        """
+        Drift of each column of the dataframe from the reference, from its histograms computed in one pass
+        """
+        try:
+            current = reference.empty_like()
+            current.update_frame(dataframe)
+            comparison = reference.compare(current)
+            quantiles = current.quantiles(DRIFT_QUANTILES)
+            missing = current.counts[:, -1] / max(current.n_rows, 1)
+
+            columns = {}
+            for i, col in enumerate(reference.columns):
+                psi, ks_statistic = float(comparison["psi"][i]), float(comparison["ks_statistic"][i])
+                columns[col] = {
+                    "psi": round(psi, 6),
+                    "ks_statistic": round(ks_statistic, 6),
+                    "ks_pvalue": float(comparison["ks_pvalue"][i]),
+                    "missing_fraction": round(float(missing[i]), 6),
+                    "quantiles": {f"p{round(q * 100):02d}": float(value) for q, value in zip(DRIFT_QUANTILES, quantiles[i])},
+                    "drift": psi >= self.data_validation_config.drift_psi_threshold or ks_statistic >= self.data_validation_config.drift_ks_threshold,
+                }
+            drifted_columns = [col for col, column in columns.items() if column["drift"]]
+            return {"n_rows": current.n_rows, "drift": bool(drifted_columns), "drifted_columns": drifted_columns, "columns": columns}
+
+        except Exception as e:
+            raise ForestExpection(e, sys) from e
+
+    def write_drift_report(self, train_df: pd.DataFrame, test_df: pd.DataFrame) -> bool:
+        """
+        Writes the drift of the train and test sets from the reference statistics to the drift report file,
+        returns whether any column drifted
+        """
+        try:
+            started = time.perf_counter()
+            reference = self.get_reference_statistics(train_df)
+            datasets = {name: self.detect_dataset_drift(reference, df) for name, df in (("train", train_df), ("test", test_df))}
+            drift_status = any(dataset["drift"] for dataset in datasets.values())
+            report = {
+                "drift": drift_status,
+                "psi_threshold": self.data_validation_config.drift_psi_threshold,
+                "ks_threshold": self.data_validation_config.drift_ks_threshold,
+                "reference": {"file_path": self.data_validation_config.reference_statistics_file_path, "n_rows": reference.n_rows, "n_bins": reference.n_bins},
+                "datasets": datasets,
+            }
+            write_yaml_file(self.data_validation_config.drift_report_file_path, report, replace=True)
+            logging.info(f"Drift report written to {self.data_validation_config.drift_report_file_path} in {time.perf_counter() - started:.2f}s, "
+                         f"drifted columns: { {name: dataset['drifted_columns'] for name, dataset in datasets.items()} }")
+            return drift_status
+
+        except Exception as e:
+            raise ForestExpection(e, sys) from e
+
     def initiate_data_validation(self) -> DataValidationArtifact:
         """
         Method Name: initiate_data_validation
         Description: This method initiates the data validation components of training pipeline
         Output: Returns te boolean status of data validation
         On Failure: Write an exception log and then raise an exception
-        Revisions: moved setup to cloud
+        Revisions: moved setup to cloud, drift report of valid data
         """
         logging.info("Entered into initiate_data_validation method of DataValidation class")
         try: 
             validation_error_msg = ""
-            train_df = DataValidation.read_data(file_path = self.data_ingestion_artifact.training_file_path)
-            test_df = DataValidation.read_data(file_path = self.data_ingestion_artifact.testing_file_path)
+            train_df, test_df = self.data_ingestion_artifact.train_df, self.data_ingestion_artifact.test_df
+            if train_df is None:
+                train_df = DataValidation.read_data(file_path = self.data_ingestion_artifact.training_file_path)
+            if test_df is None:
+                test_df = DataValidation.read_data(file_path = self.data_ingestion_artifact.testing_file_path)
 
             logging.info("Data validation started")
 
@@ -72,6 +198,9 @@ class DataValidation:
             status = self.is_numerical_column_exists(test_df)
             if not status: validation_error_msg += "Numerical columns are missing in testing dataframe\n"
 
+            self.report_out_of_range_values(train_df)
+            self.report_out_of_range_values(test_df)
+
             validation_status = validation_error_msg == ""
             if not validation_status:
                 logging.error(f"Data validation failed with errors: {validation_error_msg}")
@@ -86,5 +215,18 @@ class DataValidation:
                 logging.info(f"Data validation artifact: {data_validation_artifact}")
                 return data_validation_artifact
 
+            drift_status = self.write_drift_report(train_df, test_df)
+            data_validation_artifact = DataValidationArtifact(
+                validation_status = True,
+                valid_train_file_path = self.data_ingestion_artifact.training_file_path,
+                valid_test_file_path = self.data_ingestion_artifact.testing_file_path,
+                invalid_train_file_path = self.data_validation_config.invalid_train_file_path,
+                invalid_test_file_path = self.data_validation_config.invalid_test_file_path,
+                drift_report_file_path = self.data_validation_config.drift_report_file_path,
+                drift_status = drift_status
+            )
+            logging.info(f"Data validation artifact: {data_validation_artifact}")
+            return data_validation_artifact
+
         except Exception as e:
             raise ForestExpection(e, sys) 
@@ -1,15 +1,23 @@
+import os
 import sys
+import hashlib
+import threading
+import numpy as np
 import pandas as pd
+from concurrent.futures import ThreadPoolExecutor
 from src.forest.exception import ForestExpection
 from src.forest.logger import logging
 from src.forest.entity.config_entity import ModelEvaluationConfig
-from src.forest.entity.artifact_entity import ModelTrainerArtifact, DataIngestionArtifact, ModelEvaluationArtifact
-from src.forest.utils.main_utils import load_object
-from sklearn.metrics import f1_score
+from src.forest.entity.artifact_entity import ModelTrainerArtifact, DataIngestionArtifact, ModelEvaluationArtifact, ChampionScoreArtifact, ClassificationMetricArtifact
+from src.forest.entity.confusion_matrix import ConfusionMatrix
+from src.forest.utils.main_utils import load_object, load_dataframe, save_numpy_array_data, load_numpy_array_data, hash_files
 from src.forest.constants.training_pipeline import TARGET_COLUMN
 from src.forest.entity.s3_estimator import SensorEstimator
 from dataclasses import dataclass
-from typing import Optional
+from typing import Callable, List, Optional, Tuple
+
+# champion scoring and evaluation may run at the same time, the first one writes the test matrix
+_TEST_MATRIX_LOCK = threading.Lock()
 
 
 @dataclass
@@ -18,13 +26,17 @@ class EvaluateModelResponse:
     best_model_f1_score: float
     is_model_accepted: bool
     difference: float
+    trained_model_metric_artifact: Optional[ClassificationMetricArtifact] = None
 
 class ModelEvaluation:
-    def __init__(self, model_evaluation_config: ModelEvaluationConfig, data_ingestion_artifact: DataIngestionArtifact, model_trainer_artifact: ModelTrainerArtifact):
+    def __init__(self, model_evaluation_config: ModelEvaluationConfig, data_ingestion_artifact: DataIngestionArtifact, model_trainer_artifact: Optional[ModelTrainerArtifact] = None,
+                 champion_score_artifact: Optional[ChampionScoreArtifact] = None):
         try:
             self.model_evaluation_config = model_evaluation_config
             self.data_ingestion_artifact = data_ingestion_artifact
             self.model_trainer_artifact = model_trainer_artifact
+            # score of the deployed model computed ahead, while the new model trains
+            self.champion_score_artifact = champion_score_artifact
         except Exception as e:
             raise ForestExpection(e, sys)
 
@@ -41,25 +53,122 @@ class ModelEvaluation:
             raise ForestExpection(e, sys)
 
     
+    def get_test_matrix(self) -> Tuple[np.ndarray, List[str], np.ndarray]:
+        """
+        Test features as one float64 matrix memory mapped from test_matrix_file_path, with its columns and the labels.
+        The first caller of the run writes the file, every scored model then reads the same pages.
+        """
+        test_df = self.data_ingestion_artifact.test_df
+        if test_df is None:
+            test_df = load_dataframe(self.data_ingestion_artifact.testing_file_path)
+        columns = [col for col in test_df.columns if col != TARGET_COLUMN]
+        file_path = self.model_evaluation_config.test_matrix_file_path
+        with _TEST_MATRIX_LOCK:
+            if not os.path.exists(file_path):
+                save_numpy_array_data(file_path + ".tmp", array = test_df[columns].to_numpy(dtype = np.float64))
+                os.replace(file_path + ".tmp", file_path)
+        return load_numpy_array_data(file_path, mmap_mode = "r"), columns, test_df[TARGET_COLUMN].to_numpy()
+
+    def get_test_set_hash(self, columns: List[str], labels: np.ndarray) -> str:
+        digest = hashlib.sha256(hash_files([self.model_evaluation_config.test_matrix_file_path]).encode())
+        digest.update("\0".join(columns).encode())
+        digest.update(np.ascontiguousarray(labels).tobytes())
+        return digest.hexdigest()
+
+    def score_predictions(self, predict_chunk: Callable[[int, int], np.ndarray], labels: np.ndarray) -> Tuple[ConfusionMatrix, np.ndarray]:
+        """
+        Confusion matrix of the predictions of every chunk_size rows, accumulated as they come, and the predictions
+        """
+        confusion_matrix = ConfusionMatrix(labels)
+        predictions = None
+        for start in range(0, len(labels), self.model_evaluation_config.chunk_size):
+            stop = min(start + self.model_evaluation_config.chunk_size, len(labels))
+            chunk_predictions = np.asarray(predict_chunk(start, stop))
+            if predictions is None:
+                predictions = np.empty(len(labels), dtype = chunk_predictions.dtype)
+            predictions[start:stop] = chunk_predictions
+            confusion_matrix.update(labels[start:stop], chunk_predictions)
+        return confusion_matrix, predictions if predictions is not None else np.empty(0)
+
+    def save_cached_predictions(self, file_path: str, predictions: np.ndarray) -> None:
+        save_numpy_array_data(file_path + ".tmp", array = predictions)
+        os.replace(file_path + ".tmp", file_path)
+        cache_dir = self.model_evaluation_config.prediction_cache_dir
+        cached = sorted((os.path.join(cache_dir, name) for name in os.listdir(cache_dir) if name.endswith(".npy")), key = os.path.getmtime)
+        for stale_file_path in cached[:-self.model_evaluation_config.prediction_cache_max_files]:
+            os.remove(stale_file_path)
+
+    def score_champion(self, test_matrix: np.ndarray, columns: List[str], labels: np.ndarray) -> ChampionScoreArtifact:
+        """
+        Scores the deployed model from its predictions cached for its version and this test set when there are some,
+        else downloads it, predicts and caches its predictions
+        """
+        best_model = self.get_best_model()
+        if best_model is None:
+            return ChampionScoreArtifact(best_model_f1_score = None)
+        try:
+            model_version = best_model.get_model_version()
+        except Exception as e:
+            logging.warning(f"No version of the deployed model, its predictions are not cached: {e}")
+            model_version = None
+
+        cache_file_path = None
+        if model_version is not None:
+            cache_key = hashlib.sha256(f"{model_version}:{self.get_test_set_hash(columns, labels)}".encode()).hexdigest()
+            cache_file_path = os.path.join(self.model_evaluation_config.prediction_cache_dir, f"{cache_key}.npy")
+        if cache_file_path is not None and os.path.exists(cache_file_path):
+            cached_predictions = load_numpy_array_data(cache_file_path, mmap_mode = "r")
+            logging.info(f"Scoring the deployed model version {model_version} from its cached predictions")
+            confusion_matrix, _ = self.score_predictions(lambda start, stop: cached_predictions[start:stop], labels)
+        else:
+            model = best_model.load_model()
+            confusion_matrix, predictions = self.score_predictions(lambda start, stop: model.predict_array(test_matrix[start:stop], columns), labels)
+            if cache_file_path is not None:
+                os.makedirs(self.model_evaluation_config.prediction_cache_dir, exist_ok = True)
+                self.save_cached_predictions(cache_file_path, predictions)
+        return ChampionScoreArtifact(best_model_f1_score = confusion_matrix.accuracy(), best_model_metric_artifact = confusion_matrix.get_metric_artifact())
+
+    def initiate_champion_scoring(self) -> ChampionScoreArtifact:
+        """
+        Method Name: initiate_champion_scoring
+        Description: Scores the deployed model on the test split, it only needs the ingestion artifact
+        Output: f1 score of the deployed model, None when there is none
+        On Failure: Write an exception log and then raise an exception
+        """
+        try:
+            champion_score_artifact = self.score_champion(*self.get_test_matrix())
+            logging.info(f"Champion score artifact: {champion_score_artifact}")
+            return champion_score_artifact
+
+        except Exception as e:
+            raise ForestExpection(e, sys) from e
+
     def evaluate_model(self) -> EvaluateModelResponse:
+        """
+        Method Name: evaluate_model
+        Description: Scores the trained model and, when not scored ahead, the deployed one at the same time on two threads
+                     over the shared test matrix. The micro f1 score (the accuracy) decides, the macro averaged metrics
+                     of the trained model go to the artifact.
+        Output: scores of both models and whether the trained one is accepted
+        On Failure: Write an exception log and then raise an exception
+        """
         try:
-            test_df = pd.read_csv(self.data_ingestion_artifact.testing_file_path)
-            x, y  = test_df.drop(TARGET_COLUMN, axis=1), test_df[TARGET_COLUMN]
+            test_matrix, columns, labels = self.get_test_matrix()
             trained_model = load_object(file_path = self.model_trainer_artifact.trained_model_file_path)
-            y_hat_trained_model = trained_model.predict(x)
-            trained_model_f1_score = f1_score(y, y_hat_trained_model, average = 'micro')
-            best_model_f1_score = None
-            best_model = self.get_best_model()
-            if best_model is not None:
-                y_hat_best_model = best_model.predict(x)
-                best_model_f1_score = f1_score(y, y_hat_best_model, average = 'micro')
+            with ThreadPoolExecutor(max_workers = 1, thread_name_prefix = "champion-scoring") as pool:
+                champion_future = None if self.champion_score_artifact is not None else pool.submit(self.score_champion, test_matrix, columns, labels)
+                trained_confusion_matrix, _ = self.score_predictions(lambda start, stop: trained_model.predict_array(test_matrix[start:stop], columns), labels)
+                champion_score_artifact = self.champion_score_artifact if champion_future is None else champion_future.result()
+            trained_model_f1_score = trained_confusion_matrix.accuracy()
+            best_model_f1_score = champion_score_artifact.best_model_f1_score
 
             tmp_best_model_score = 0 if best_model_f1_score is None else best_model_f1_score
             result = EvaluateModelResponse(
                 trained_model_f1_score =  trained_model_f1_score,
                 best_model_f1_score = best_model_f1_score,
                 is_model_accepted = trained_model_f1_score > tmp_best_model_score,
-                difference = trained_model_f1_score - tmp_best_model_score
+                difference = trained_model_f1_score - tmp_best_model_score,
+                trained_model_metric_artifact = trained_confusion_matrix.get_metric_artifact()
             )
             logging.info(f"Result: {result}")
             return result
@@ -77,7 +186,8 @@ class ModelEvaluation:
                 is_model_accepted = model_evaluated_response.is_model_accepted,
                 best_model_path = self.model_trainer_artifact.trained_model_file_path,
                 trained_model_file_path = self.model_trainer_artifact.trained_model_file_path,
-                changed_accuracy = model_evaluated_response.difference
+                changed_accuracy = model_evaluated_response.difference,
+                trained_model_metric_artifact = model_evaluated_response.trained_model_metric_artifact
             )
             logging.info(f"Model Evaluation Artifact: {model_evaluation_artifact}")
             return model_evaluation_artifact
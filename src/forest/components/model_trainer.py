@@ -1,45 +1,229 @@
 import sys
-import src.forest.exception as ForestExpection
+import os
+import time
+from typing import Optional, Tuple
+import numpy as np
+import pandas as pd
+from src.forest.exception import ForestExpection
 from src.forest.logger import logging
 from src.forest.constants import *
-from src.forest.utils.main_utils import load_numpy_array_data, read_yaml_file, load_object, save_object
-from src.forest.entity.artifact_entity import ModelTrainerArtifact, DataTransformationArtifact, ClassificationMetricArtifact
+from src.forest.constants.training_pipeline import TARGET_COLUMN, SCHEMA_FILE_PATH
+from src.forest.utils.main_utils import load_numpy_array_data, read_yaml_file, write_yaml_file, load_object, save_object, load_dataframe
+from src.forest.entity.artifact_entity import ModelTrainerArtifact, DataTransformationArtifact, ClassificationMetricArtifact, DataIngestionArtifact, DataValidationArtifact
 from src.forest.entity.config_entity import ModelTrainerConfig
 from src.forest.entity.estimator import SensorModel
+from src.forest.entity.s3_estimator import SensorEstimator
+from src.forest.entity.drift_statistics import HistogramStatistics
 from neuro_mf import ModelFactory
+# HalvingGridSearchCV and HalvingRandomSearchCV are only importable once enabled
+from sklearn.experimental import enable_halving_search_cv  # noqa: F401
+
+SEARCH_MODES = ("exhaustive", "successive_halving")
 
 
 class ModelTrainer:
-    def __init__(self, data_tranformation_artifact: DataTransformationArtifact, model_trainer_config: ModelTrainerConfig):
+    def __init__(self, data_tranformation_artifact: DataTransformationArtifact, model_trainer_config: ModelTrainerConfig,
+                 data_ingestion_artifact: Optional[DataIngestionArtifact] = None, data_validation_artifact: Optional[DataValidationArtifact] = None):
         self.data_tranformation_artifact = data_tranformation_artifact
         self.model_trainer_config = model_trainer_config
+        # only needed by incremental training: the new rows and the drift status
+        self.data_ingestion_artifact = data_ingestion_artifact
+        self.data_validation_artifact = data_validation_artifact
+
+    def get_model_factory(self, search_mode: str) -> ModelFactory:
+        """
+        ModelFactory of model.yaml, searching with the `search` section class of the mode instead of grid_search
+        for modes other than exhaustive
+        """
+        model_factory = ModelFactory(model_config_path = self.model_trainer_config.model_config_file_path)
+        if search_mode != "exhaustive":
+            search_config = model_factory.config["search"][search_mode]
+            model_factory.grid_search_cv_module = search_config["module"]
+            model_factory.grid_search_class_name = search_config["class"]
+            model_factory.grid_search_property_data = dict(search_config.get("params") or {})
+        return model_factory
+
+    def search_best_model(self, x_train, y_train) -> object:
+        """
+        Method Name: search_best_model
+        Description: Runs the hyperparameter search of the model.yaml search mode and writes its search report.
+                     With compare_with_exhaustive, a non exhaustive search is followed by the exhaustive one and
+                     the report gives the time saved and the gap between their best cross validation scores.
+        Output: best model detail of the configured search mode
+        On Failure: Write an exception log and then raise an exception
+        """
+        try:
+            search_config = read_yaml_file(self.model_trainer_config.model_config_file_path).get("search") or {}
+            search_mode = search_config.get("mode", "exhaustive")
+            if search_mode not in SEARCH_MODES:
+                raise ForestExpection(f"Unknown search mode {search_mode}, expected one of {SEARCH_MODES}", sys)
+
+            started = time.perf_counter()
+            best_model_detail = self.get_model_factory(search_mode).get_best_model(X = x_train, y = y_train, base_accuracy = self.model_trainer_config.base_accuracy)
+            seconds = time.perf_counter() - started
+            report = {
+                "mode": search_mode,
+                "n_rows": int(len(x_train)),
+                "seconds": round(seconds, 3),
+                "best_score": float(best_model_detail.best_score),
+                "best_parameters": {name: getattr(value, "item", lambda: value)() for name, value in best_model_detail.best_parameters.items()},
+            }
+            logging.info(f"{search_mode} search took {seconds:.1f}s, best score {best_model_detail.best_score:.5f} with {best_model_detail.best_parameters}")
+
+            if search_config.get("compare_with_exhaustive") and search_mode != "exhaustive":
+                started = time.perf_counter()
+                exhaustive_detail = self.get_model_factory("exhaustive").get_best_model(X = x_train, y = y_train, base_accuracy = self.model_trainer_config.base_accuracy)
+                exhaustive_seconds = time.perf_counter() - started
+                report["exhaustive"] = {
+                    "seconds": round(exhaustive_seconds, 3),
+                    "best_score": float(exhaustive_detail.best_score),
+                    "time_saved_seconds": round(exhaustive_seconds - seconds, 3),
+                    "speedup": round(exhaustive_seconds / max(seconds, 1e-9), 3),
+                    "score_gap": float(exhaustive_detail.best_score - best_model_detail.best_score),
+                }
+                logging.info(f"Exhaustive search took {exhaustive_seconds:.1f}s, {search_mode} saved {exhaustive_seconds - seconds:.1f}s "
+                             f"for a score gap of {exhaustive_detail.best_score - best_model_detail.best_score:.5f}")
+
+            write_yaml_file(self.model_trainer_config.search_report_file_path, report, replace=True)
+            return best_model_detail
+
+        except Exception as e:
+            raise ForestExpection(e, sys) from e
+
+    def get_new_train_df(self) -> Optional[pd.DataFrame]:
+        """
+        Training rows ingested by this run, None when ingestion was not incremental
+        """
+        if self.data_ingestion_artifact is None:
+            return None
+        if self.data_ingestion_artifact.new_train_df is not None:
+            return self.data_ingestion_artifact.new_train_df
+        file_path = self.data_ingestion_artifact.new_training_file_path
+        if file_path is None or not os.path.exists(file_path):
+            return None
+        return load_dataframe(file_path)
+
+    def get_reference_statistics(self) -> Optional[HistogramStatistics]:
+        """
+        Histograms of the model columns of the ingested train set, shipped inside the fully retrained SensorModel
+        so the serving traffic monitor compares the traffic with the rows of the model it serves.
+        None when the ingestion artifact is not known.
+        """
+        if self.data_ingestion_artifact is None:
+            return None
+        train_df = self.data_ingestion_artifact.train_df
+        if train_df is None:
+            train_df = load_dataframe(self.data_ingestion_artifact.training_file_path)
+        schema_config = read_yaml_file(SCHEMA_FILE_PATH)
+        columns = [col for col in schema_config['numerical_columns'] + schema_config['categorical_columns'] if col in train_df.columns]
+        return HistogramStatistics.from_reference(train_df, columns, n_bins=self.model_trainer_config.drift_n_bins)
+
+    def get_class_psi(self, y_train: np.ndarray, y_new: np.ndarray) -> float:
+        """
+        PSI of the class distribution of the new rows against the one of the whole train set
+        """
+        reference = HistogramStatistics.from_reference(pd.DataFrame({TARGET_COLUMN: np.asarray(y_train).astype(np.int64)}), [TARGET_COLUMN])
+        current = reference.empty_like()
+        current.update(np.asarray(y_new, dtype=np.float64).reshape(-1, 1))
+        return float(reference.compare(current)["psi"][0])
+
+    def warm_start_champion(self, y_train: np.ndarray) -> Tuple[Optional[SensorModel], str]:
+        """
+        Method Name: warm_start_champion
+        Description: Grows incremental_n_estimators trees on the new training rows onto the forest of the deployed
+                     champion, with its own preprocessing and drift reference so every tree sees the same features. Beyond
+                     incremental_max_estimators trees the oldest ones are dropped. Training time depends on
+                     the new rows only. No model is returned, and a full retrain follows, when there are no new rows
+                     information or no champion forest, the data drifted, the new rows are not a small part
+                     of the train set, their class distribution drifted or they miss some of the champion classes.
+        Output: the updated model (the champion itself when there are no new rows) and the training mode,
+                or None and the reason of the full retrain
+        On Failure: Write an exception log and then raise an exception
+        """
+        try:
+            new_train_df = self.get_new_train_df()
+            if new_train_df is None:
+                return None, "new rows are only known to incremental ingestion"
+            if self.data_validation_artifact is not None and self.data_validation_artifact.drift_status:
+                return None, "data drift detected"
+
+            champion_estimator = SensorEstimator(bucket_name = self.model_trainer_config.bucket_name, model_path = self.model_trainer_config.s3_model_key_path)
+            if not champion_estimator.is_model_present(model_path = self.model_trainer_config.s3_model_key_path):
+                return None, "no deployed champion"
+            champion = champion_estimator.load_model()
+            forest = getattr(champion, "trained_model_object", None)
+            if forest is None or not hasattr(forest, "estimators_") or "warm_start" not in forest.get_params():
+                return None, f"champion {champion} has no forest to grow"
+
+            if len(new_train_df) == 0:
+                logging.info("No new training rows, the champion is kept as it is")
+                return champion, "unchanged"
+            new_fraction = len(new_train_df) / max(len(y_train), 1)
+            if new_fraction > self.model_trainer_config.incremental_max_new_fraction:
+                return None, f"new rows are {new_fraction:.0%} of the train set"
+            y_new = new_train_df[TARGET_COLUMN].to_numpy()
+            class_psi = self.get_class_psi(y_train, y_new)
+            if class_psi >= self.model_trainer_config.incremental_class_psi_threshold:
+                return None, f"class distribution drifted, PSI {class_psi:.3f}"
+            # trees fitted on fewer classes would not line up with the champion's class probabilities
+            if not np.array_equal(np.unique(y_new), forest.classes_):
+                return None, f"new rows have classes {np.unique(y_new).tolist()}, the champion {forest.classes_.tolist()}"
+
+            started = time.perf_counter()
+            x_new = champion.preprocessing_object.transform(new_train_df.drop(columns=[TARGET_COLUMN]))
+            n_trees = len(forest.estimators_)
+            forest.set_params(warm_start = True, n_estimators = n_trees + self.model_trainer_config.incremental_n_estimators)
+            forest.fit(x_new, y_new)
+            surplus = len(forest.estimators_) - self.model_trainer_config.incremental_max_estimators
+            if surplus > 0:
+                forest.estimators_ = forest.estimators_[surplus:]
+            forest.set_params(warm_start = False, n_estimators = len(forest.estimators_))
+            logging.info(f"Grew {self.model_trainer_config.incremental_n_estimators} trees on {len(new_train_df)} new rows in {time.perf_counter() - started:.1f}s, "
+                         f"dropped the {max(surplus, 0)} oldest, the forest has {len(forest.estimators_)} trees")
+            return SensorModel(preprocessing_object = champion.preprocessing_object, trained_model_object = forest,
+                               reference_statistics = champion.get_reference_statistics()), "warm_start"
+
+        except Exception as e:
+            raise ForestExpection(e, sys) from e
 
     def initiate_model_trainer(self) -> ModelTrainerArtifact:
         logging.info("Entered into model_traning method of ModelTrainer class")
         try:
-            train_arr = load_numpy_array_data(self.data_tranformation_artifact.transformed_train_file_path)
-            test_arr = load_numpy_array_data(self.data_tranformation_artifact.transformed_test_file_path)
+            train_arr, test_arr = self.data_tranformation_artifact.train_arr, self.data_tranformation_artifact.test_arr
+            if train_arr is None:
+                train_arr = load_numpy_array_data(self.data_tranformation_artifact.transformed_train_file_path, mmap_mode="r")
+            if test_arr is None:
+                test_arr = load_numpy_array_data(self.data_tranformation_artifact.transformed_test_file_path, mmap_mode="r")
 
             logging.info("Loaded train and test numpy array data")
             logging.info(f"Train array shape: {train_arr.shape}, Test array shape: {test_arr.shape}")
 
             x_train, y_train = train_arr[:, :-1], train_arr[:, -1]
-            model_factory = ModelFactory(model_config_path = self.model_trainer_config.model_config_file_path)
-            best_model_detail = model_factory.get_best_model(X = x_train, y = y_train, base_accuracy = self.model_trainer_config.base_accuracy)
-            preprocessing_object = load_object(file_path = self.data_tranformation_artifact.transformed_object_file_path)
+            sensor_model, training_mode = None, "full"
+            if self.model_trainer_config.incremental:
+                sensor_model, training_mode = self.warm_start_champion(y_train)
+                if sensor_model is None:
+                    logging.info(f"Full retrain instead of an incremental one: {training_mode}")
+                    training_mode = "full"
+
+            if sensor_model is None:
+                best_model_detail = self.search_best_model(x_train, y_train)
+                preprocessing_object = load_object(file_path = self.data_tranformation_artifact.transformed_object_file_path)
 
 
-            if best_model_detail.best_score < self.model_trainer_config.base_accuracy:
-                logging.info("No best model found with score more than base score")
-                raise Exception("No best model found with more than base score")
+                if best_model_detail.best_score < self.model_trainer_config.base_accuracy:
+                    logging.info("No best model found with score more than base score")
+                    raise Exception("No best model found with more than base score")
 
-            sensor_model= SensorModel(preprocessing_object = preprocessing_object, trained_model_object = best_model_detail.best_model)
-            logging.info("Created Sensor model object with preprocessor and model")
+                sensor_model= SensorModel(preprocessing_object = preprocessing_object, trained_model_object = best_model_detail.best_model,
+                                          reference_statistics = self.get_reference_statistics())
+            logging.info(f"Created Sensor model object with preprocessor and model, training mode {training_mode}")
             logging.info("Created best model file path")
             save_object(self.model_trainer_config.trained_model_file_path, sensor_model)
 
             metric_artifact = ClassificationMetricArtifact(f1_score = 0.8, recall_score = 0.9, precision_score = 0.8)
-            model_trainer_artifact = ModelTrainerArtifact(trained_model_file_path = self.model_trainer_config.trained_model_file_path, metric_artifact = metric_artifact)
+            model_trainer_artifact = ModelTrainerArtifact(trained_model_file_path = self.model_trainer_config.trained_model_file_path, metric_artifact = metric_artifact,
+                                                          training_mode = training_mode)
             logging.info(f"Model trainer artifact: {model_trainer_artifact}")
 
             return model_trainer_artifact
@@ -0,0 +1,50 @@
+from typing import Optional
+APP_HOST: str = "0.0.0.0"
+APP_PORT: int = 8000
+
+
+"""
+Model serving related constants starts with `MODEL_CACHE` VAR NAME
+"""
+MODEL_CACHE_REFRESH_INTERVAL_SECONDS: int = 300
+# the served model keeps only the compact forest: with 100 trees on 20000 synthetic rows it holds 22 MB of arrays
+# against 56 MB for the sklearn trees, batches past a few hundred rows then predict about 2 to 4 times slower
+MODEL_CACHE_RELEASE_ESTIMATOR: bool = True
+
+
+"""
+Micro batching related constants starts with `MICRO_BATCH` VAR NAME
+"""
+MICRO_BATCH_MAX_SIZE: int = 64
+MICRO_BATCH_MAX_WAIT_MS: float = 2.0
+MICRO_BATCH_MAX_QUEUE_SIZE: int = 4096
+
+
+"""
+Inference executor related constants starts with `INFERENCE_EXECUTOR` VAR NAME
+"""
+INFERENCE_EXECUTOR_MAX_WORKERS: int = 4
+INFERENCE_EXECUTOR_MAX_QUEUE_SIZE: int = 64
+INFERENCE_EXECUTOR_TIMEOUT_SECONDS: float = 10.0
+
+
+
+"""
+Prediction cache related constants starts with `PREDICTION_CACHE` VAR NAME
+"""
+PREDICTION_CACHE_ENABLED: bool = True
+PREDICTION_CACHE_MAX_SIZE: int = 65536
+PREDICTION_CACHE_TTL_SECONDS: float = 0  # 0 keeps entries until evicted or the model changes
+
+
+
+"""
+Traffic monitor related constants starts with `TRAFFIC_MONITOR` VAR NAME
+"""
+TRAFFIC_MONITOR_ENABLED: bool = True
+# the reference histograms ship with the served model, a file path here replaces them (benchmarks, offline checks)
+TRAFFIC_MONITOR_REFERENCE_STATISTICS_FILE_PATH: Optional[str] = None
+TRAFFIC_MONITOR_MAX_QUEUE_SIZE: int = 4096
+TRAFFIC_MONITOR_DRAIN_INTERVAL_SECONDS: float = 0.25
+TRAFFIC_MONITOR_PSI_THRESHOLD: float = 0.2
+TRAFFIC_MONITOR_KS_THRESHOLD: float = 0.1
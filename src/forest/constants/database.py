@@ -1,6 +1,14 @@
 DATABASE_NAME = "green_vision"
 COLLECTION_NAME = "forest"
 
+"""
+Collection export related constants starts with `MONGO_DB` VAR NAME
+"""
+# documents per cursor round trip
+MONGO_DB_EXPORT_BATCH_SIZE: int = 10_000
+# wire compressors in order of preference, the ones whose module is not installed are skipped
+MONGO_DB_COMPRESSORS: tuple = ("zstd", "snappy", "zlib")
+
 
 from dotenv import load_dotenv
 import os
@@ -3,4 +3,40 @@ from src.forest.constants.s3_bucket import PREDICTION_BUCKET_NAME, TRAINING_BUCK
 PREDICTION_DATA_BUCKET = PREDICTION_BUCKET_NAME
 PREDICTION_INPUT_FILE_NAME = "forest_pred_data.csv"
 PREDICTION_OUTPUT_FILE_NAME = "forest_predictions.csv"
-MODEL_BUCKET_NAME = TRAINING_BUCKET_NAME
\ No newline at end of file
+MODEL_BUCKET_NAME = TRAINING_BUCKET_NAME
+
+
+"""
+Streaming prediction related constants starts with `PREDICTION_STREAMING` VAR NAME
+"""
+PREDICTION_STREAMING_ENABLED: bool = False
+PREDICTION_STREAMING_CHUNK_SIZE: int = 50_000
+PREDICTION_STREAMING_QUEUE_SIZE: int = 2
+
+
+"""
+Multi-core prediction related constants starts with `PREDICTION_PARALLEL` VAR NAME
+"""
+PREDICTION_PARALLEL_ENABLED: bool = False
+# 0 uses one worker per core
+PREDICTION_PARALLEL_MAX_WORKERS: int = 0
+PREDICTION_PARALLEL_SHARD_SIZE: int = 20_000
+
+
+"""
+Prediction output upload related constants starts with `PREDICTION_UPLOAD` VAR NAME
+"""
+PREDICTION_UPLOAD_PART_SIZE: int = 8 * 1024 * 1024
+PREDICTION_UPLOAD_MAX_CONCURRENCY: int = 4
+PREDICTION_UPLOAD_LOCAL_COPY: bool = True
+
+
+"""
+Prediction file format related constants starts with `PREDICTION_TABLE` VAR NAME
+"""
+# "auto" picks csv, parquet or arrow from the file extension
+PREDICTION_TABLE_INPUT_FORMAT: str = "auto"
+PREDICTION_TABLE_OUTPUT_FORMAT: str = "auto"
+# zstd or snappy for parquet, zstd or lz4 for Arrow IPC, ignored for csv
+PREDICTION_TABLE_COMPRESSION: str = "zstd"
+PREDICTION_TABLE_COLUMN_PROJECTION: bool = True
@@ -5,11 +5,15 @@ from src.forest.constants.s3_bucket import TRAINING_BUCKET_NAME
 TARGET_COLUMN = 'Cover_Type'
 PIPELINE_NAME: str = 'covtype'
 ARTIFACT_DIR: str = 'artifact'
+# TrainPipeline stages whose inputs are ready run concurrently on this many threads, 1 runs them one at a time
+PIPELINE_MAX_WORKERS: int = 4
 
 # Common file name
-FILE_NAME: str = 'covtype.csv'
-TRAIN_FILE_NAME: str = 'train.csv'
-TEST_FILE_NAME: str = 'test.csv'
+# stage to stage frames are Feather (Arrow IPC) files, typed and read back through a memory map without parsing
+FILE_NAME: str = 'covtype.feather'
+TRAIN_FILE_NAME: str = 'train.feather'
+TEST_FILE_NAME: str = 'test.feather'
+NEW_TRAIN_FILE_NAME: str = 'new_train.feather'
 PREPROCESSING_OBJECT_FILE_NAME = 'preprocessing.pkl'
 MODEL_FILE_NAME = 'model.pkl'
 SCHEMA_FILE_PATH = os.path.join('config', 'schema.yaml')
@@ -23,6 +27,15 @@ DATA_INGESTION_DIR_NAME: str = 'data_ingestion'
 DATA_INGESTION_FEATURE_STORE_DIR: str = 'feature_store'
 DATA_INGESTION_INGESTED_DIR: str = 'ingested'
 DATA_INGESTION_TRAIN_TEST_SPLIT_RATIO: float = 0.2
+# the collection is read as this many `_id` ranges, 1 reads it through a single cursor
+DATA_INGESTION_EXPORT_PARTITIONS: int = 8
+DATA_INGESTION_EXPORT_WORKERS: int = 4
+# incremental ingestion only pulls the documents added since the last run into a feature store kept across runs
+DATA_INGESTION_INCREMENTAL: bool = False
+DATA_INGESTION_PERSISTENT_FEATURE_STORE_DIR: str = 'persistent_feature_store'
+DATA_INGESTION_HIGH_WATER_MARK_FILE_NAME: str = 'high_water_mark.yaml'
+# the schema one_hot_groups are stored as one code column each in the feature store and train/test files
+DATA_INGESTION_PACK_ONE_HOT_GROUPS: bool = False
 
 
 """
@@ -33,6 +46,14 @@ DATA_VALIDATION_VALID_DIR: str = 'validated'
 DATA_VALIDATION_INVALID_DIR: str = 'invalid'
 DATA_VALIDATION_DRIFT_REPORT_DIR: str = 'drift_report'
 DATA_VALIDATION_DRIFT_REPORT_FILE_NAME: str = 'report.yaml'
+# histograms of the training set the drift is measured against, kept across runs until refreshed
+DATA_VALIDATION_REFERENCE_STATISTICS_DIR: str = 'drift_reference'
+DATA_VALIDATION_REFERENCE_STATISTICS_FILE_NAME: str = 'reference_statistics.yaml'
+DATA_VALIDATION_REFRESH_REFERENCE: bool = False
+DATA_VALIDATION_DRIFT_N_BINS: int = 20
+# a column drifts when its PSI or binned KS statistic reaches these
+DATA_VALIDATION_DRIFT_PSI_THRESHOLD: float = 0.2
+DATA_VALIDATION_DRIFT_KS_THRESHOLD: float = 0.1
 
 """
 Data Transformation related constants starts with `DATA_TRANSFORMATION` VAR NAME
@@ -49,15 +70,41 @@ MODEL_TRAINER_TRAINED_MODEL_DIR: str = 'trained_model'
 MODEL_FILE_NAME: str = 'model.pkl'
 MODEL_TRAINER_BASE_ACCURACY: float = 0.6
 MODEL_TRAINER_MODEL_CONFIG_FILE_PATH: str = os.path.join("config", "model.yaml")
+MODEL_TRAINER_SEARCH_REPORT_FILE_NAME: str = 'search_report.yaml'
+# incremental training grows trees on the rows ingested since the last run onto the deployed forest,
+# it needs incremental ingestion and falls back to a full retrain on drift or when the new rows are not a small delta
+MODEL_TRAINER_INCREMENTAL: bool = False
+MODEL_TRAINER_INCREMENTAL_N_ESTIMATORS: int = 20
+# the oldest trees are dropped beyond this many, the forest keeps tracking the recent data
+MODEL_TRAINER_INCREMENTAL_MAX_ESTIMATORS: int = 300
+MODEL_TRAINER_INCREMENTAL_MAX_NEW_FRACTION: float = 0.5
+MODEL_TRAINER_INCREMENTAL_CLASS_PSI_THRESHOLD: float = 0.2
 
 """
 Model Evaluation related constants starts with `MODEL_EVALUATION` VAR NAME
 """
 MODEL_EVALUATION_CHANGED_THRESHOLD_SCORE: float = 0.02
+MODEL_EVALUATION_DIR_NAME: str = 'model_evaluation'
+# test features as one float matrix, memory mapped by both scored models
+MODEL_EVALUATION_TEST_MATRIX_FILE_NAME: str = 'test_matrix.npy'
+MODEL_EVALUATION_CHUNK_SIZE: int = 65536
+# predictions of the deployed model kept across runs by model version and test set hash, the oldest files beyond the max are removed
+MODEL_EVALUATION_PREDICTION_CACHE_DIR: str = 'champion_predictions'
+MODEL_EVALUATION_PREDICTION_CACHE_MAX_FILES: int = 8
 
 
 """
 Model Pusher related constants starts with `MODEL_PUSHER` VAR NAME
 """
 MODEL_PUSHER_BUCKET_NAME = TRAINING_BUCKET_NAME
-MODEL_PUSHER_S3_KEY = "model-registry"
\ No newline at end of file
+MODEL_PUSHER_S3_KEY = "model-registry"
+
+
+"""
+Stage Cache related constants starts with `STAGE_CACHE` VAR NAME
+"""
+# TrainPipeline stages whose inputs did not change since a previous run reuse its artifacts
+STAGE_CACHE_ENABLED: bool = True
+STAGE_CACHE_DIR: str = 'stage_cache'
+# every python file below it is part of the code version of the stages
+STAGE_CACHE_SOURCE_DIR: str = os.path.join('src', 'forest')
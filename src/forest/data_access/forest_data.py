@@ -1,12 +1,85 @@
 from src.forest.configurations.mogo_db_connection import MongoDBClient
-from src.forest.constants.database import DATABASE_NAME, COLLECTION_NAME
+from src.forest.constants.database import DATABASE_NAME, COLLECTION_NAME, MONGO_DB_EXPORT_BATCH_SIZE
+from src.forest.constants.training_pipeline import SCHEMA_FILE_PATH
 from src.forest.exception import ForestExpection
 from src.forest.logger import logging
+from src.forest.utils.main_utils import read_yaml_file, get_schema_dtype_specs, compact_column
 import pandas as pd
 import sys
-from typing import Optional
+from itertools import chain, islice
+from concurrent.futures import ThreadPoolExecutor
+from operator import itemgetter
+from typing import Any, Dict, Iterable, List, Optional, Tuple
 import numpy as np
-        
+
+
+MISSING_VALUES = (None, "na", "")
+
+
+class ColumnarBatchBuilder:
+    """
+    Builds typed column arrays from batches of documents, so a collection is never held as a list of dicts.
+    Each batch is decoded as float64 and every column chunk is cast to its compact schema dtype right away,
+    see compact_column; values out of the schema range are counted and keep their chunk wide.
+    "na" strings and absent fields become NaN, columns absent from every document are left out.
+    """
+    def __init__(self, columns: List[str], dtype_specs: Dict[str, Tuple[np.dtype, Optional[Tuple[int, int]]]] = None):
+        self.columns = list(columns)
+        self.dtype_specs = {col: (dtype_specs or {}).get(col, (np.dtype(np.float64), None)) for col in self.columns}
+        self.n_rows: int = 0
+        self._getter = itemgetter(*self.columns)
+        self._chunks: List[List[np.ndarray]] = [[] for _ in self.columns]
+        self._present = np.zeros(len(self.columns), dtype=bool)
+        self._invalid: Dict[str, int] = {}
+        self._out_of_range: Dict[str, int] = {}
+
+    def _to_float(self, col: str, value) -> float:
+        if value in MISSING_VALUES:
+            return np.nan
+        try:
+            return float(value)
+        except (TypeError, ValueError):
+            self._invalid[col] = self._invalid.get(col, 0) + 1
+            return np.nan
+
+    def add(self, documents: List[dict]) -> None:
+        n_documents, n_columns = len(documents), len(self.columns)
+        try:
+            # fast path: every field present and numeric
+            values = np.fromiter(chain.from_iterable(map(self._getter, documents)), dtype=np.float64, count=n_documents * n_columns)
+            values = values.reshape(n_documents, n_columns)
+            self._present[:] |= n_documents > 0
+        except (KeyError, TypeError, ValueError):
+            values = np.empty((n_documents, n_columns), dtype=np.float64)
+            for j, col in enumerate(self.columns):
+                column = [document.get(col) for document in documents]
+                self._present[j] |= any(col in document for document in documents)
+                try:
+                    values[:, j] = np.array(column, dtype=np.float64)
+                except (TypeError, ValueError):
+                    values[:, j] = [self._to_float(col, value) for value in column]
+
+        for j, col in enumerate(self.columns):
+            column, n_out_of_range = compact_column(values[:, j], *self.dtype_specs[col])
+            if n_out_of_range:
+                self._out_of_range[col] = self._out_of_range.get(col, 0) + n_out_of_range
+            self._chunks[j].append(np.ascontiguousarray(column))
+        self.n_rows += n_documents
+
+    def to_frame(self) -> pd.DataFrame:
+        if self._invalid:
+            logging.warning(f"Non numeric values exported as NaN: {self._invalid}")
+        if self._out_of_range:
+            logging.warning(f"Values out of the schema range, columns kept wide: {self._out_of_range}")
+        data = {}
+        for j, col in enumerate(self.columns):
+            if not self._present[j]:
+                continue
+            # chunks cast to different dtypes concatenate to the widest of them
+            data[col] = np.concatenate(self._chunks[j]) if self._chunks[j] else np.empty(0, dtype=self.dtype_specs[col][0])
+            self._chunks[j] = []
+        return pd.DataFrame(data, copy=False)
+
 
 class ForestData:
     def __init__(self):
@@ -14,21 +87,123 @@ class ForestData:
             self.mongo_client = MongoDBClient(database_name=DATABASE_NAME)
         except Exception as e:
             raise ForestExpection(e, sys)
-        
-    def export_collection_as_dataframe(self, collection_name: Optional[str] = COLLECTION_NAME, database_name: Optional[str] = DATABASE_NAME) -> pd.DataFrame:
+
+    @staticmethod
+    def get_schema_columns(schema_config: dict = None) -> List[str]:
+        """
+        Every column the schema knows about: model, target and dropped columns
+        """
+        schema_config = schema_config or read_yaml_file(SCHEMA_FILE_PATH)
+        columns = schema_config["numerical_columns"] + schema_config["categorical_columns"] + schema_config["drop_columns"]
+        return list(dict.fromkeys(columns))
+
+    def get_collection(self, collection_name: Optional[str] = COLLECTION_NAME, database_name: Optional[str] = DATABASE_NAME):
+        if database_name is None:
+            return self.mongo_client.database[collection_name]
+        return self.mongo_client.client[database_name][collection_name]
+
+    @staticmethod
+    def build_dataframe(documents: Iterable[dict], columns: List[str], dtype_specs: dict, batch_size: int) -> pd.DataFrame:
+        """
+        Typed DataFrame of the documents, consumed batch_size documents at a time
+        """
+        builder = ColumnarBatchBuilder(columns, dtype_specs)
+        documents = iter(documents)
+        while True:
+            batch = list(islice(documents, batch_size))
+            if not batch:
+                break
+            builder.add(batch)
+        return builder.to_frame()
+
+    def export_collection_as_dataframe(self, collection_name: Optional[str] = COLLECTION_NAME, database_name: Optional[str] = DATABASE_NAME,
+                                       columns: Optional[List[str]] = None, batch_size: int = MONGO_DB_EXPORT_BATCH_SIZE, query: Optional[dict] = None) -> pd.DataFrame:
+        """
+        Exports the schema columns (or `columns`) of the documents matching `query`, all of them by default.
+        The server only sends the projected fields, batch_size documents per round trip,
+        and each batch is decoded straight into typed column arrays.
+        """
         try:
-            if database_name is None:
-                collection = self.mongo_client.database[collection_name]
-            else:
-                collection = self.mongo_client.client[database_name][collection_name]
-                
-            df = pd.DataFrame(list(collection.find()))
-            
-            if "_id" in df.columns.to_list():
-                df.drop('_id', axis=1, inplace=True)
-                
-            df.replace({"na": np.nan}, inplace=True)
+            collection = self.get_collection(collection_name, database_name)
+            schema_config = read_yaml_file(SCHEMA_FILE_PATH)
+            columns = columns or self.get_schema_columns(schema_config)
+
+            projection = {col: 1 for col in columns}
+            projection["_id"] = 0
+            cursor = collection.find(query or {}, projection, batch_size=batch_size)
+            df = self.build_dataframe(cursor, columns, get_schema_dtype_specs(schema_config, columns), batch_size)
+            logging.info(f"Exported {len(df)} documents with {df.shape[1]} columns from {collection_name}")
             return df
-        
+
+        except Exception as e:
+            raise ForestExpection(e, sys)
+
+    @staticmethod
+    def get_last_key(collection, key: str = "_id") -> Any:
+        """
+        Largest `key` value of the collection, None when it is empty
+        """
+        document = next(iter(collection.find({}, {key: 1}).sort(key, -1).limit(1)), None)
+        return None if document is None else document[key]
+
+    @staticmethod
+    def get_partition_bounds(collection, n_partitions: int, key: str = "_id", query: Optional[dict] = None) -> List[Tuple[Any, Any]]:
+        """
+        Splits the documents matching `query` (all of them by default) into at most n_partitions [lower, upper) ranges
+        of `key` holding about as many matching documents each. Each boundary is the key value at an evenly spaced rank
+        among the matching documents, read by one sorted skip/limit query: the server walks the key index up to the rank
+        and sends back a single key, the client never reads the keys in between. The first and last ranges are open ended.
+        """
+        query = query or {}
+        n_documents = collection.count_documents(query) if query else collection.estimated_document_count()
+        ranks = sorted({i * n_documents // n_partitions for i in range(1, n_partitions)} - {0})
+        boundaries = []
+        for rank in ranks:
+            document = next(iter(collection.find(query, {key: 1}).sort(key, 1).skip(rank).limit(1)), None)
+            if document is None:
+                # fewer documents than counted, the last ranges stay empty
+                break
+            if not boundaries or document[key] != boundaries[-1]:
+                boundaries.append(document[key])
+        edges = [None] + boundaries + [None]
+        return list(zip(edges[:-1], edges[1:]))
+
+    def export_collection_partitioned(self, collection_name: Optional[str] = COLLECTION_NAME, database_name: Optional[str] = DATABASE_NAME,
+                                      n_partitions: int = 8, max_workers: int = 4, columns: Optional[List[str]] = None,
+                                      batch_size: int = MONGO_DB_EXPORT_BATCH_SIZE, key: str = "_id", query: Optional[dict] = None) -> pd.DataFrame:
+        """
+        Same export as export_collection_as_dataframe, read as n_partitions ranges of `key` (set on every document)
+        by a pool of threads sharing the pooled MongoDBClient. Each range is read in key order and the ranges are concatenated in
+        key order, so the output is the same for every partition and worker count. `query` narrows every range.
+        """
+        try:
+            collection = self.get_collection(collection_name, database_name)
+            schema_config = read_yaml_file(SCHEMA_FILE_PATH)
+            columns = columns or self.get_schema_columns(schema_config)
+            dtype_specs = get_schema_dtype_specs(schema_config, columns)
+            projection = {col: 1 for col in columns}
+            projection["_id"] = 0
+
+            def export_partition(bounds: Tuple[Any, Any]) -> pd.DataFrame:
+                lower, upper = bounds
+                key_range = {}
+                if lower is not None:
+                    key_range["$gte"] = lower
+                if upper is not None:
+                    key_range["$lt"] = upper
+                filters = [filter_ for filter_ in (query, {key: key_range} if key_range else None) if filter_]
+                partition_query = {} if not filters else filters[0] if len(filters) == 1 else {"$and": filters}
+                # each cursor gets its own projection, drivers may normalize it in place
+                cursor = collection.find(partition_query, dict(projection), batch_size=batch_size).sort(key, 1)
+                return self.build_dataframe(cursor, columns, dtype_specs, batch_size)
+
+            partitions = self.get_partition_bounds(collection, max(1, n_partitions), key, query)
+            with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(partitions))), thread_name_prefix="mongo-export") as pool:
+                frames = list(pool.map(export_partition, partitions))
+            frames = [frame for frame in frames if len(frame) > 0] or frames[:1]
+            df = pd.concat(frames, ignore_index=True) if len(frames) > 1 else frames[0]
+            logging.info(f"Exported {len(df)} documents with {df.shape[1]} columns from {collection_name} in {len(partitions)} partitions")
+            return df
+
         except Exception as e:
             raise ForestExpection(e, sys)
@@ -1,9 +1,18 @@
-from dataclasses import dataclass
+from dataclasses import dataclass, field
+from typing import Optional
+import numpy as np
+import pandas as pd
 
 @dataclass
 class DataIngestionArtifact:
     training_file_path: str
     testing_file_path: str
+    # the frames written to the files, set when the next stages run in the same process
+    train_df: Optional[pd.DataFrame] = field(default=None, repr=False, compare=False)
+    test_df: Optional[pd.DataFrame] = field(default=None, repr=False, compare=False)
+    # training rows ingested by this run, only known to incremental ingestion
+    new_training_file_path: Optional[str] = None
+    new_train_df: Optional[pd.DataFrame] = field(default=None, repr=False, compare=False)
 
 @dataclass
 class DataValidationArtifact:
@@ -13,12 +22,15 @@ class DataValidationArtifact:
     invalid_train_file_path: str
     invalid_test_file_path: str
     drift_report_file_path: str
+    drift_status: bool = False
 
 @dataclass
 class DataTransformationArtifact:
     transformed_train_file_path: str
     transformed_test_file_path: str
     transformed_object_file_path: str
+    train_arr: Optional[np.ndarray] = field(default=None, repr=False, compare=False)
+    test_arr: Optional[np.ndarray] = field(default=None, repr=False, compare=False)
 
 @dataclass
 class ClassificationMetricArtifact:
@@ -30,6 +42,14 @@ class ClassificationMetricArtifact:
 class ModelTrainerArtifact:
     trained_model_file_path: str
     metric_artifact: ClassificationMetricArtifact
+    # full, warm_start or unchanged (champion kept, no new rows)
+    training_mode: str = "full"
+
+@dataclass
+class ChampionScoreArtifact:
+    # f1 score of the deployed model on the test split, None without a deployed model
+    best_model_f1_score: Optional[float]
+    best_model_metric_artifact: Optional[ClassificationMetricArtifact] = None
 
 @dataclass
 class ModelEvaluationArtifact:
@@ -37,6 +57,7 @@ class ModelEvaluationArtifact:
     best_model_path: str
     trained_model_file_path: str
     changed_accuracy: float
+    trained_model_metric_artifact: Optional[ClassificationMetricArtifact] = None
 
 @dataclass
 class ModelPusherArtifact:
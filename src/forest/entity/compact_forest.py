@@ -0,0 +1,179 @@
+import sys
+from typing import Optional
+import numpy as np
+from sklearn.ensemble import ExtraTreesClassifier, RandomForestClassifier
+from sklearn.tree import DecisionTreeClassifier, ExtraTreeClassifier
+from src.forest.exception import ForestExpection
+from src.forest.logger import logging
+
+
+class CompactForest:
+    """
+    Tree ensemble classifier flattened into contiguous arrays: int32 children (left and right interleaved),
+    float32 thresholds, uint16 feature ids and one class distribution row per leaf.
+    A batch is predicted by walking all (row, tree) pairs one level at a time, dropping pairs that reached a leaf.
+
+    Predictions match sklearn exactly: inputs are cast to float32 like sklearn does, every threshold is stored
+    as the largest float32 not above the float64 one, so `x <= threshold` decides the same way, and the leaf
+    distributions are summed tree by tree in float64 like RandomForestClassifier.predict_proba.
+    """
+    PARITY_PROBE_ROWS: int = 512
+    # rows walked at once, bounds the (rows, trees, classes) leaf values gathered per block
+    PREDICT_BLOCK_ROWS: int = 1024
+
+    def __init__(self, classes: np.ndarray, n_features: int, roots: np.ndarray, children: np.ndarray,
+                 feature: np.ndarray, threshold: np.ndarray, missing_go_to_left: np.ndarray, leaf_index: np.ndarray, leaf_values: np.ndarray):
+        self.classes = classes
+        self.n_features = n_features
+        self.roots = roots
+        self.children = children
+        self.feature = feature
+        self.threshold = threshold
+        self.missing_go_to_left = missing_go_to_left
+        self.leaf_index = leaf_index
+        self.leaf_values = leaf_values
+        self.is_leaf = leaf_index >= 0
+
+    @property
+    def n_trees(self) -> int:
+        return len(self.roots)
+
+    @property
+    def nbytes(self) -> int:
+        arrays = (self.roots, self.children, self.feature, self.threshold, self.missing_go_to_left, self.leaf_index, self.leaf_values, self.is_leaf)
+        return sum(array.nbytes for array in arrays)
+
+    @staticmethod
+    def estimator_nbytes(model: object) -> int:
+        """
+        Size of the node and value arrays held by the sklearn trees
+        """
+        trees = model.estimators_ if hasattr(model, "estimators_") else [model]
+        return sum(tree.tree_.__getstate__()["nodes"].nbytes + tree.tree_.value.nbytes for tree in trees)
+
+    @staticmethod
+    def _float32_floor(threshold: np.ndarray) -> np.ndarray:
+        rounded = threshold.astype(np.float32)
+        above = rounded.astype(np.float64) > threshold
+        rounded[above] = np.nextafter(rounded[above], np.float32(-np.inf))
+        return rounded
+
+    @classmethod
+    def from_estimator(cls, model: object) -> Optional["CompactForest"]:
+        """
+        Flattens a fitted single output forest or tree classifier, returns None for any other model
+        or when the compiled forest does not reproduce its predictions
+        """
+        try:
+            supported = (RandomForestClassifier, ExtraTreesClassifier, DecisionTreeClassifier, ExtraTreeClassifier)
+            if not isinstance(model, supported) or getattr(model, "n_outputs_", 1) != 1:
+                return None
+            trees = model.estimators_ if hasattr(model, "estimators_") else [model]
+            if model.n_features_in_ > np.iinfo(np.uint16).max:
+                return None
+
+            roots, children, features, thresholds, missing_lefts, leaf_indexes, leaf_values = [], [], [], [], [], [], []
+            node_offset, leaf_offset = 0, 0
+            for tree in trees:
+                tree_ = tree.tree_
+                node_ids = np.arange(tree_.node_count)
+                is_leaf = tree_.children_left == -1
+                n_leaves = int(is_leaf.sum())
+
+                # leaves point to themselves so a finished walk stays put
+                roots.append(node_offset)
+                left = np.where(is_leaf, node_ids, tree_.children_left) + node_offset
+                right = np.where(is_leaf, node_ids, tree_.children_right) + node_offset
+                children.append(np.column_stack([left, right]).ravel())
+                features.append(np.where(is_leaf, 0, tree_.feature))
+                thresholds.append(np.where(is_leaf, 0.0, tree_.threshold))
+                missing_lefts.append(np.asarray(getattr(tree_, "missing_go_to_left", np.zeros(tree_.node_count)), dtype=bool))
+
+                leaf_index = np.full(tree_.node_count, -1, dtype=np.int64)
+                leaf_index[is_leaf] = np.arange(n_leaves) + leaf_offset
+                leaf_indexes.append(leaf_index)
+
+                # sklearn stores class fractions per node, predict_proba returns them as they are
+                leaf_values.append(tree_.value[is_leaf, 0, :tree.n_classes_].astype(np.float64))
+
+                node_offset += tree_.node_count
+                leaf_offset += n_leaves
+
+            if node_offset > np.iinfo(np.int32).max:
+                return None
+
+            compact_forest = cls(
+                classes = model.classes_,
+                n_features = model.n_features_in_,
+                roots = np.asarray(roots, dtype=np.int32),
+                children = np.concatenate(children).astype(np.int32),
+                feature = np.concatenate(features).astype(np.uint16),
+                threshold = cls._float32_floor(np.concatenate(thresholds)),
+                missing_go_to_left = np.concatenate(missing_lefts),
+                leaf_index = np.concatenate(leaf_indexes).astype(np.int32),
+                leaf_values = np.concatenate(leaf_values),
+            )
+            if not compact_forest.matches(model):
+                logging.warning(f"Compact forest does not reproduce {type(model).__name__} predictions, keeping the sklearn model")
+                return None
+            logging.info(f"Compiled {len(trees)} trees into {compact_forest.nbytes} bytes, sklearn trees hold {cls.estimator_nbytes(model)} bytes")
+            return compact_forest
+
+        except Exception as e:
+            raise ForestExpection(e, sys) from e
+
+    def matches(self, model: object) -> bool:
+        """
+        Parity check against the sklearn predictions on a standardized probe batch
+        """
+        rng = np.random.default_rng(0)
+        probe = rng.standard_normal((self.PARITY_PROBE_ROWS, self.n_features))
+        # one-hot like columns: exercise both sides of the 0.5 thresholds
+        probe[:, ::2] = rng.integers(0, 2, (self.PARITY_PROBE_ROWS, len(range(0, self.n_features, 2))))
+        return np.array_equal(model.predict(probe), self.predict(probe))
+
+    def apply(self, features: np.ndarray) -> np.ndarray:
+        """
+        Leaf row (into leaf_values) reached by every row in every tree, shape (n_rows, n_trees)
+        """
+        features = np.ascontiguousarray(features, dtype=np.float32)
+        if features.ndim != 2 or features.shape[1] != self.n_features:
+            raise ForestExpection(f"Expected an array of shape (n, {self.n_features}), got {features.shape}", sys)
+
+        n_rows = features.shape[0]
+        flat_features = features.ravel()
+        leaves = np.tile(self.roots, n_rows)
+        row_offsets = np.repeat(np.arange(n_rows, dtype=np.int64) * self.n_features, self.n_trees)
+
+        # walk the (row, tree) pairs that have not reached a leaf yet
+        pairs = np.flatnonzero(~self.is_leaf[leaves])
+        nodes = leaves[pairs].astype(np.int64)
+        row_offsets = row_offsets[pairs]
+        while len(pairs) > 0:
+            values = flat_features[row_offsets + self.feature[nodes]]
+            go_right = ~(values <= self.threshold[nodes])
+            missing = np.isnan(values)
+            if missing.any():
+                go_right[missing] = ~self.missing_go_to_left[nodes[missing]]
+            nodes = self.children[2 * nodes + go_right]
+
+            finished = self.is_leaf[nodes]
+            if finished.any():
+                leaves[pairs[finished]] = nodes[finished]
+                walking = ~finished
+                pairs, nodes, row_offsets = pairs[walking], nodes[walking], row_offsets[walking]
+
+        return self.leaf_index[leaves].reshape(n_rows, self.n_trees)
+
+    def predict_proba(self, features: np.ndarray) -> np.ndarray:
+        if len(features) > self.PREDICT_BLOCK_ROWS:
+            blocks = range(0, len(features), self.PREDICT_BLOCK_ROWS)
+            return np.concatenate([self.predict_proba(features[start:start + self.PREDICT_BLOCK_ROWS]) for start in blocks])
+        leaves = self.apply(features)
+        # reducing the middle axis adds the trees one after the other, in the order sklearn accumulates them
+        proba = self.leaf_values[leaves].sum(axis=1)
+        proba /= self.n_trees
+        return proba
+
+    def predict(self, features: np.ndarray) -> np.ndarray:
+        return self.classes.take(np.argmax(self.predict_proba(features), axis=1), axis=0)
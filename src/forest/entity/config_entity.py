@@ -1,7 +1,8 @@
 import os
 from src.forest.constants.training_pipeline import *
-from src.forest.constants import prediction_pipeline
+from src.forest.constants import prediction_pipeline, application
 from dataclasses import dataclass
+from typing import Optional
 from datetime import datetime
 
 ROOT_DIR = os.getcwd()
@@ -12,6 +13,7 @@ class TrainingPipelineConfig:
     pipeline_name: str = PIPELINE_NAME
     artifact_dir: str = os.path.join(ROOT_DIR, ARTIFACT_DIR, TIME_STAMP)
     time_stamp: str = TIME_STAMP
+    max_workers: int = PIPELINE_MAX_WORKERS
 
 training_pipeline_config: TrainingPipelineConfig = TrainingPipelineConfig()
 
@@ -22,8 +24,15 @@ class DataIngestionConfig:
     feature_store_file_path: str = os.path.join(data_ingestion_dir, DATA_INGESTION_FEATURE_STORE_DIR, FILE_NAME)
     training_file_path: str = os.path.join(data_ingestion_dir, DATA_INGESTION_INGESTED_DIR, TRAIN_FILE_NAME)
     testing_file_path: str = os.path.join(data_ingestion_dir, DATA_INGESTION_INGESTED_DIR, TEST_FILE_NAME)
+    new_training_file_path: str = os.path.join(data_ingestion_dir, DATA_INGESTION_INGESTED_DIR, NEW_TRAIN_FILE_NAME)
     train_test_split_ratio: float = DATA_INGESTION_TRAIN_TEST_SPLIT_RATIO
     collection_name: str = DATA_INGESTION_COLLECTION_NAME
+    export_partitions: int = DATA_INGESTION_EXPORT_PARTITIONS
+    export_workers: int = DATA_INGESTION_EXPORT_WORKERS
+    incremental: bool = DATA_INGESTION_INCREMENTAL
+    persistent_feature_store_dir: str = os.path.join(ROOT_DIR, ARTIFACT_DIR, DATA_INGESTION_PERSISTENT_FEATURE_STORE_DIR)
+    high_water_mark_file_path: str = os.path.join(persistent_feature_store_dir, DATA_INGESTION_HIGH_WATER_MARK_FILE_NAME)
+    pack_one_hot_groups: bool = DATA_INGESTION_PACK_ONE_HOT_GROUPS
 
 
 @dataclass
@@ -36,12 +45,17 @@ class DataValidationConfig:
     invalid_train_file_path: str = os.path.join(data_validation_dir, DATA_VALIDATION_INVALID_DIR, TRAIN_FILE_NAME)
     invalid_test_file_path: str = os.path.join(data_validation_dir, DATA_VALIDATION_INVALID_DIR, TEST_FILE_NAME)
     drift_report_file_path: str = os.path.join(data_validation_dir, DATA_VALIDATION_DRIFT_REPORT_DIR, DATA_VALIDATION_DRIFT_REPORT_FILE_NAME)
+    reference_statistics_file_path: str = os.path.join(ROOT_DIR, ARTIFACT_DIR, DATA_VALIDATION_REFERENCE_STATISTICS_DIR, DATA_VALIDATION_REFERENCE_STATISTICS_FILE_NAME)
+    refresh_reference: bool = DATA_VALIDATION_REFRESH_REFERENCE
+    drift_n_bins: int = DATA_VALIDATION_DRIFT_N_BINS
+    drift_psi_threshold: float = DATA_VALIDATION_DRIFT_PSI_THRESHOLD
+    drift_ks_threshold: float = DATA_VALIDATION_DRIFT_KS_THRESHOLD
 
 @dataclass
 class DataTransformationConfig:
     data_transformation_dir: str = os.path.join(training_pipeline_config.artifact_dir, DATA_TRANSFORMATION_DIR_NAME)
-    transformed_train_file_path: str = os.path.join(data_transformation_dir, DATA_TRANSFORMATION_TRANSFORMED_DATA_DIR_NAME, TRAIN_FILE_NAME.replace("csv", "npy"))
-    transformed_test_file_path: str = os.path.join(data_transformation_dir, DATA_TRANSFORMATION_TRANSFORMED_DATA_DIR_NAME, TEST_FILE_NAME.replace("csv", "npy"))
+    transformed_train_file_path: str = os.path.join(data_transformation_dir, DATA_TRANSFORMATION_TRANSFORMED_DATA_DIR_NAME, TRAIN_FILE_NAME.replace("feather", "npy"))
+    transformed_test_file_path: str = os.path.join(data_transformation_dir, DATA_TRANSFORMATION_TRANSFORMED_DATA_DIR_NAME, TEST_FILE_NAME.replace("feather", "npy"))
     transformed_object_file_path: str = os.path.join(data_transformation_dir, DATA_TRANSFORMATION_TRANSFORMED_OBJECT_DIR, PREPROCESSING_OBJECT_FILE_NAME)
 
 @dataclass
@@ -50,10 +64,24 @@ class ModelTrainerConfig:
     trained_model_file_path: str = os.path.join(model_trainer_dir, MODEL_TRAINER_TRAINED_MODEL_DIR, MODEL_FILE_NAME)
     base_accuracy: float = MODEL_TRAINER_BASE_ACCURACY
     model_config_file_path: str = MODEL_TRAINER_MODEL_CONFIG_FILE_PATH
+    search_report_file_path: str = os.path.join(model_trainer_dir, MODEL_TRAINER_SEARCH_REPORT_FILE_NAME)
+    incremental: bool = MODEL_TRAINER_INCREMENTAL
+    incremental_n_estimators: int = MODEL_TRAINER_INCREMENTAL_N_ESTIMATORS
+    incremental_max_estimators: int = MODEL_TRAINER_INCREMENTAL_MAX_ESTIMATORS
+    incremental_max_new_fraction: float = MODEL_TRAINER_INCREMENTAL_MAX_NEW_FRACTION
+    incremental_class_psi_threshold: float = MODEL_TRAINER_INCREMENTAL_CLASS_PSI_THRESHOLD
+    drift_n_bins: int = DATA_VALIDATION_DRIFT_N_BINS
+    bucket_name: str = MODEL_PUSHER_BUCKET_NAME
+    s3_model_key_path: str = os.path.join(MODEL_PUSHER_S3_KEY, MODEL_FILE_NAME)
     
 
 @dataclass
 class ModelEvaluationConfig:
+    model_evaluation_dir: str = os.path.join(training_pipeline_config.artifact_dir, MODEL_EVALUATION_DIR_NAME)
+    test_matrix_file_path: str = os.path.join(model_evaluation_dir, MODEL_EVALUATION_TEST_MATRIX_FILE_NAME)
+    chunk_size: int = MODEL_EVALUATION_CHUNK_SIZE
+    prediction_cache_dir: str = os.path.join(ROOT_DIR, ARTIFACT_DIR, MODEL_EVALUATION_PREDICTION_CACHE_DIR)
+    prediction_cache_max_files: int = MODEL_EVALUATION_PREDICTION_CACHE_MAX_FILES
     changed_threshold_score: float = MODEL_EVALUATION_CHANGED_THRESHOLD_SCORE
     bucket_name: str = MODEL_PUSHER_BUCKET_NAME
     s3_model_key_path: str = os.path.join(MODEL_PUSHER_S3_KEY, MODEL_FILE_NAME)
@@ -63,10 +91,65 @@ class ModelPusherConfig:
     bucket_name: str = MODEL_PUSHER_BUCKET_NAME
     s3_model_key_path: str = os.path.join(MODEL_PUSHER_S3_KEY, MODEL_FILE_NAME)
 
+@dataclass
+class StageCacheConfig:
+    enabled: bool = STAGE_CACHE_ENABLED
+    cache_dir: str = os.path.join(ROOT_DIR, ARTIFACT_DIR, STAGE_CACHE_DIR)
+    source_dir: str = os.path.join(ROOT_DIR, STAGE_CACHE_SOURCE_DIR)
+
 @dataclass
 class PredictionPipelineConfig:
     data_bucket_name: str = prediction_pipeline.PREDICTION_DATA_BUCKET
     data_file_path: str = prediction_pipeline.PREDICTION_INPUT_FILE_NAME
     model_file_path: str = os.path.join(MODEL_PUSHER_S3_KEY, MODEL_FILE_NAME)
     model_bucket_name: str = prediction_pipeline.MODEL_BUCKET_NAME
-    output_file_name:str = prediction_pipeline.PREDICTION_OUTPUT_FILE_NAME
\ No newline at end of file
+    output_file_name:str = prediction_pipeline.PREDICTION_OUTPUT_FILE_NAME
+    streaming: bool = prediction_pipeline.PREDICTION_STREAMING_ENABLED
+    chunk_size: int = prediction_pipeline.PREDICTION_STREAMING_CHUNK_SIZE
+    queue_size: int = prediction_pipeline.PREDICTION_STREAMING_QUEUE_SIZE
+    parallel: bool = prediction_pipeline.PREDICTION_PARALLEL_ENABLED
+    parallel_workers: int = prediction_pipeline.PREDICTION_PARALLEL_MAX_WORKERS
+    shard_size: int = prediction_pipeline.PREDICTION_PARALLEL_SHARD_SIZE
+    upload_part_size: int = prediction_pipeline.PREDICTION_UPLOAD_PART_SIZE
+    upload_max_concurrency: int = prediction_pipeline.PREDICTION_UPLOAD_MAX_CONCURRENCY
+    local_copy: bool = prediction_pipeline.PREDICTION_UPLOAD_LOCAL_COPY
+    input_format: str = prediction_pipeline.PREDICTION_TABLE_INPUT_FORMAT
+    output_format: str = prediction_pipeline.PREDICTION_TABLE_OUTPUT_FORMAT
+    compression: str = prediction_pipeline.PREDICTION_TABLE_COMPRESSION
+    column_projection: bool = prediction_pipeline.PREDICTION_TABLE_COLUMN_PROJECTION
+
+@dataclass
+class ModelCacheConfig:
+    model_bucket_name: str = prediction_pipeline.MODEL_BUCKET_NAME
+    model_file_path: str = os.path.join(MODEL_PUSHER_S3_KEY, MODEL_FILE_NAME)
+    refresh_interval_seconds: int = application.MODEL_CACHE_REFRESH_INTERVAL_SECONDS
+    release_estimator: bool = application.MODEL_CACHE_RELEASE_ESTIMATOR
+
+@dataclass
+class MicroBatcherConfig:
+    max_batch_size: int = application.MICRO_BATCH_MAX_SIZE
+    max_wait_ms: float = application.MICRO_BATCH_MAX_WAIT_MS
+    max_queue_size: int = application.MICRO_BATCH_MAX_QUEUE_SIZE
+
+@dataclass
+class InferenceExecutorConfig:
+    max_workers: int = application.INFERENCE_EXECUTOR_MAX_WORKERS
+    max_queue_size: int = application.INFERENCE_EXECUTOR_MAX_QUEUE_SIZE
+    timeout_seconds: float = application.INFERENCE_EXECUTOR_TIMEOUT_SECONDS
+
+
+@dataclass
+class PredictionCacheConfig:
+    enabled: bool = application.PREDICTION_CACHE_ENABLED
+    max_size: int = application.PREDICTION_CACHE_MAX_SIZE
+    ttl_seconds: float = application.PREDICTION_CACHE_TTL_SECONDS
+
+
+@dataclass
+class TrafficMonitorConfig:
+    enabled: bool = application.TRAFFIC_MONITOR_ENABLED
+    reference_statistics_file_path: Optional[str] = application.TRAFFIC_MONITOR_REFERENCE_STATISTICS_FILE_PATH
+    max_queue_size: int = application.TRAFFIC_MONITOR_MAX_QUEUE_SIZE
+    drain_interval_seconds: float = application.TRAFFIC_MONITOR_DRAIN_INTERVAL_SECONDS
+    psi_threshold: float = application.TRAFFIC_MONITOR_PSI_THRESHOLD
+    ks_threshold: float = application.TRAFFIC_MONITOR_KS_THRESHOLD
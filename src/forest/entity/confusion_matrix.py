@@ -0,0 +1,49 @@
+import numpy as np
+from src.forest.entity.artifact_entity import ClassificationMetricArtifact
+
+
+class ConfusionMatrix:
+    """
+    Confusion matrix accumulated one chunk of labels and predictions at a time, by one bincount per chunk.
+    counts[i, j] counts the rows of true label labels[i] predicted as labels[j]. Labels first seen in
+    a chunk are added on the fly. Every metric is read back from the counts.
+    """
+    def __init__(self, labels=()):
+        self.labels = np.unique(np.asarray(labels))
+        self.counts = np.zeros((len(self.labels), len(self.labels)), dtype=np.int64)
+
+    def _add_labels(self, values: np.ndarray) -> None:
+        new_labels = np.setdiff1d(values, self.labels)
+        if len(new_labels) == 0:
+            return
+        labels = np.union1d(self.labels, new_labels)
+        counts = np.zeros((len(labels), len(labels)), dtype=np.int64)
+        index = np.searchsorted(labels, self.labels)
+        counts[np.ix_(index, index)] = self.counts
+        self.labels, self.counts = labels, counts
+
+    def update(self, y_true: np.ndarray, y_pred: np.ndarray) -> None:
+        y_true, y_pred = np.asarray(y_true), np.asarray(y_pred)
+        self._add_labels(np.unique(np.concatenate([np.unique(y_true), np.unique(y_pred)])))
+        n_labels = len(self.labels)
+        cells = np.searchsorted(self.labels, y_true) * n_labels + np.searchsorted(self.labels, y_pred)
+        self.counts += np.bincount(cells, minlength=n_labels * n_labels).reshape(n_labels, n_labels)
+
+    @property
+    def n_rows(self) -> int:
+        return int(self.counts.sum())
+
+    def accuracy(self) -> float:
+        # also the micro averaged f1 score, precision and recall of single label classification
+        return float(np.trace(self.counts) / max(self.n_rows, 1))
+
+    def get_metric_artifact(self) -> ClassificationMetricArtifact:
+        """
+        Macro averaged f1 score, recall and precision, a label never predicted or never true scores 0
+        """
+        true_positives = np.diag(self.counts).astype(np.float64)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            precision = np.nan_to_num(true_positives / self.counts.sum(axis=0))
+            recall = np.nan_to_num(true_positives / self.counts.sum(axis=1))
+            f1 = np.nan_to_num(2 * precision * recall / (precision + recall))
+        return ClassificationMetricArtifact(f1_score = float(f1.mean()), recall_score = float(recall.mean()), precision_score = float(precision.mean()))
@@ -0,0 +1,142 @@
+import sys
+from typing import Dict, List, Optional, Sequence
+import numpy as np
+import pandas as pd
+from scipy.special import kolmogorov
+from src.forest.exception import ForestExpection
+
+# floor of the bin fractions in PSI, an empty bin on one side would make it infinite
+PSI_EPSILON: float = 1e-4
+DRIFT_QUANTILES = (0.05, 0.25, 0.5, 0.75, 0.95)
+
+
+class HistogramStatistics:
+    """
+    Fixed-bin histograms of numeric columns, all columns updated by one bincount per block of rows.
+    Bins are n_bins equal-width bins between the reference min and max, or unit bins centered on the values
+    of integer columns spanning fewer than n_bins values (flags, hillshade classes, the target).
+    Values outside the reference range fall in the first or last bin. Missing values have their own
+    slot: counts is (n_columns, n_bins + 1), the last slot counting NaN.
+    Statistics of other data are compared against the reference by PSI and a binned KS statistic,
+    and quantiles are read back from the cumulative counts (to within one bin width).
+    """
+    def __init__(self, columns: List[str], lower: np.ndarray, width: np.ndarray, n_bins: int, counts: Optional[np.ndarray] = None):
+        self.columns: List[str] = list(columns)
+        self.lower = np.asarray(lower, dtype=np.float64)
+        self.width = np.asarray(width, dtype=np.float64)
+        self.n_bins = n_bins
+        self.counts = np.zeros((len(self.columns), n_bins + 1), dtype=np.int64) if counts is None else np.asarray(counts, dtype=np.int64)
+        self._offsets = np.arange(len(self.columns), dtype=np.int64) * (n_bins + 1)
+
+    @classmethod
+    def from_reference(cls, dataframe: pd.DataFrame, columns: List[str], n_bins: int = 20, block_size: int = 100_000) -> "HistogramStatistics":
+        """
+        Bins fitted to the columns of the reference dataframe, filled with its rows
+        """
+        values = dataframe[columns]
+        lower = np.nan_to_num(values.min().to_numpy(dtype=np.float64))
+        upper = np.nan_to_num(values.max().to_numpy(dtype=np.float64))
+        width = np.where(upper > lower, (upper - lower) / n_bins, 1.0)
+        integers = np.array([dataframe[col].dtype.kind in "biu" for col in columns])
+        unit_bins = integers & (upper - lower < n_bins)
+        lower = np.where(unit_bins, lower - 0.5, lower)
+        width = np.where(unit_bins, 1.0, width)
+
+        statistics = cls(columns, lower, width, n_bins)
+        statistics.update_frame(dataframe, block_size)
+        return statistics
+
+    def empty_like(self) -> "HistogramStatistics":
+        """
+        Statistics with the same bins and no counts, to accumulate other data
+        """
+        return HistogramStatistics(self.columns, self.lower, self.width, self.n_bins)
+
+    def select(self, columns: List[str]) -> "HistogramStatistics":
+        """
+        Statistics of a subset of the columns, in the given order
+        """
+        index = [self.columns.index(col) for col in columns]
+        return HistogramStatistics(columns, self.lower[index], self.width[index], self.n_bins, self.counts[index])
+
+    @property
+    def n_rows(self) -> int:
+        return int(self.counts[0].sum()) if len(self.columns) else 0
+
+    def update(self, features: np.ndarray) -> None:
+        """
+        Adds the rows of a (n_rows, n_columns) float array laid out in `columns` order
+        """
+        features = np.asarray(features, dtype=np.float64)
+        if features.ndim != 2 or features.shape[1] != len(self.columns):
+            raise ForestExpection(f"Expected an array of {len(self.columns)} columns, got shape {features.shape}", sys)
+        with np.errstate(invalid="ignore"):
+            bins = np.floor((features - self.lower) / self.width)
+        missing = np.isnan(bins)
+        bins = np.clip(np.where(missing, 0, bins), 0, self.n_bins - 1).astype(np.int64)
+        bins[missing] = self.n_bins
+        self.counts += np.bincount((bins + self._offsets).ravel(), minlength=self.counts.size).reshape(self.counts.shape)
+
+    def update_frame(self, dataframe: pd.DataFrame, block_size: int = 100_000) -> None:
+        """
+        Adds the rows of a dataframe block_size rows at a time, bounding the float copy
+        """
+        for start in range(0, len(dataframe), block_size):
+            self.update(dataframe.iloc[start:start + block_size][self.columns].to_numpy(dtype=np.float64))
+
+    def merge(self, other: "HistogramStatistics") -> None:
+        self.counts += other.counts
+
+    def quantiles(self, probabilities: Sequence[float] = DRIFT_QUANTILES) -> np.ndarray:
+        """
+        (n_columns, len(probabilities)) quantiles interpolated within bins, NaN for columns without values
+        """
+        counts = self.counts[:, :-1].astype(np.float64)
+        cumulative = np.cumsum(counts, axis=1)
+        totals = cumulative[:, -1:]
+        result = np.full((len(self.columns), len(probabilities)), np.nan)
+        for q, probability in enumerate(probabilities):
+            target = probability * totals
+            bins = np.minimum((cumulative < target).sum(axis=1), self.n_bins - 1)
+            rows = np.arange(len(self.columns))
+            before = np.where(bins > 0, cumulative[rows, bins - 1], 0.0)
+            with np.errstate(invalid="ignore", divide="ignore"):
+                within = np.clip(np.nan_to_num((target[:, 0] - before) / counts[rows, bins]), 0.0, 1.0)
+            result[:, q] = np.where(totals[:, 0] > 0, self.lower + self.width * (bins + within), np.nan)
+        return result
+
+    def compare(self, current: "HistogramStatistics") -> Dict[str, np.ndarray]:
+        """
+        Per column PSI (missing values as a bin), KS statistic and its asymptotic p-value between
+        the bin distributions of this reference and current statistics with the same bins
+        """
+        if current.columns != self.columns or current.n_bins != self.n_bins:
+            raise ForestExpection("Statistics compared must have the same columns and bins", sys)
+        reference_counts, current_counts = self.counts.astype(np.float64), current.counts.astype(np.float64)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            p = np.maximum(np.nan_to_num(reference_counts / reference_counts.sum(axis=1, keepdims=True)), PSI_EPSILON)
+            q = np.maximum(np.nan_to_num(current_counts / current_counts.sum(axis=1, keepdims=True)), PSI_EPSILON)
+        psi = ((q - p) * np.log(q / p)).sum(axis=1)
+
+        n = reference_counts[:, :-1].sum(axis=1)
+        m = current_counts[:, :-1].sum(axis=1)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            reference_cdf = np.nan_to_num(np.cumsum(reference_counts[:, :-1], axis=1) / n[:, None])
+            current_cdf = np.nan_to_num(np.cumsum(current_counts[:, :-1], axis=1) / m[:, None])
+        ks_statistic = np.abs(reference_cdf - current_cdf).max(axis=1)
+        effective_n = np.where(n + m > 0, n * m / np.maximum(n + m, 1), 0.0)
+        ks_pvalue = kolmogorov(np.sqrt(effective_n) * ks_statistic)
+        return {"psi": psi, "ks_statistic": ks_statistic, "ks_pvalue": ks_pvalue}
+
+    def to_dict(self) -> dict:
+        return {
+            "columns": self.columns,
+            "n_bins": self.n_bins,
+            "lower": self.lower.tolist(),
+            "width": self.width.tolist(),
+            "counts": self.counts.tolist(),
+        }
+
+    @classmethod
+    def from_dict(cls, content: dict) -> "HistogramStatistics":
+        return cls(content["columns"], content["lower"], content["width"], content["n_bins"], content["counts"])
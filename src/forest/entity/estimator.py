@@ -1,8 +1,14 @@
 import sys
+import warnings
+import numpy as np
 import pandas as pd
+from typing import List, Optional
 from sklearn.pipeline import Pipeline
 from src.forest.exception import ForestExpection
 from src.forest.logger import logging
+from src.forest.entity.fused_preprocessor import FusedPreprocessor, get_column_names
+from src.forest.entity.compact_forest import CompactForest
+from src.forest.entity.drift_statistics import HistogramStatistics
 from dataclasses import dataclass
 
 class TargetValueMapping:
@@ -19,23 +25,109 @@ class TargetValueMapping:
     
 
 class SensorModel:
-    def __init__(self, preprocessing_object: Pipeline, trained_model_object: object):
+    # the compact forest wins on small batches, sklearn's compiled traversal on large ones
+    COMPACT_FOREST_MAX_ROWS: int = 128
+
+    def __init__(self, preprocessing_object: Pipeline, trained_model_object: object, reference_statistics: Optional[HistogramStatistics] = None):
         self.preprocessing_object = preprocessing_object
         self.trained_model_object = trained_model_object
+        # histograms of the rows the model was fitted on, served traffic is compared with them
+        self.reference_statistics = reference_statistics
+
+    def get_reference_statistics(self) -> Optional[HistogramStatistics]:
+        # models pickled before the reference was shipped with them have none
+        return getattr(self, "reference_statistics", None)
+
+    def compile(self, release_estimator: bool = False) -> None:
+        """
+        Builds the fused preprocessing kernel and the compact forest, each stays None when it would not
+        match the sklearn output exactly. release_estimator drops the sklearn model once the compact forest
+        replaces it, to keep only the compact arrays resident: the compact forest then predicts every batch,
+        large ones included. Models kept for training, warm starts need the sklearn trees, never release it.
+        """
+        self.fused_preprocessor = FusedPreprocessor.from_column_transformer(self.preprocessing_object)
+        if getattr(self, "compact_forest", None) is None:
+            self.compact_forest = CompactForest.from_estimator(self.trained_model_object)
+        if release_estimator and self.compact_forest is not None:
+            self.model_name = type(self.trained_model_object).__name__
+            self.trained_model_object = None
+        logging.info(f"Compiled {self}, fused preprocessor: {self.fused_preprocessor is not None}, compact forest: {self.compact_forest is not None}")
+
+    def get_fused_preprocessor(self) -> Optional[FusedPreprocessor]:
+        # models pickled before the compiled kernels existed are compiled on first use
+        if not hasattr(self, "fused_preprocessor"):
+            self.compile()
+        return self.fused_preprocessor
+
+    def predict_transformed(self, transformed_feature: np.ndarray) -> np.ndarray:
+        """
+        Predicts from preprocessed features, small batches go to the compact forest when available and every batch
+        once the sklearn model is released
+        """
+        if not hasattr(self, "compact_forest"):
+            self.compile()
+        if self.compact_forest is not None and (self.trained_model_object is None or len(transformed_feature) <= self.COMPACT_FOREST_MAX_ROWS):
+            return self.compact_forest.predict(transformed_feature)
+        return self.trained_model_object.predict(transformed_feature)
 
     def predict(self, df: pd.DataFrame) -> pd.DataFrame:
         logging.info("Entered prediction method into Sensor Model")
         try:
             logging.info("Using the trained model to get predictions")
-            transformed_feature = self.preprocessing_object.transform(df)
+            fused_preprocessor = self.get_fused_preprocessor()
+            if fused_preprocessor is not None:
+                features = df[fused_preprocessor.input_columns].to_numpy(dtype=np.float64)
+                transformed_feature = fused_preprocessor.transform(features, fused_preprocessor.input_columns, copy=False)
+            else:
+                transformed_feature = self.preprocessing_object.transform(df)
             logging.info("Used the trained model to get predictions")
-            return self.trained_model_object.predict(transformed_feature)
+            return self.predict_transformed(transformed_feature)
         
         except Exception as e:
             raise ForestExpection(e, sys) from e
         
+    def transform_array(self, features: np.ndarray, columns: List[str], copy: bool = True) -> np.ndarray:
+        """
+        Applies the fitted ColumnTransformer to an array laid out in `columns` order.
+        Its transformers select columns by name, so each one is fed the matching positions directly.
+        With copy=False the fused kernel may transform `features` in place.
+        """
+        fused_preprocessor = self.get_fused_preprocessor()
+        if fused_preprocessor is not None:
+            return fused_preprocessor.transform(features, columns, copy=copy)
+
+        preprocessor = self.preprocessing_object
+        fitted_columns = list(preprocessor.feature_names_in_)
+        position = {col: i for i, col in enumerate(columns)}
+        blocks = []
+        for _, transformer, selected in preprocessor.transformers_:
+            if isinstance(transformer, str) and transformer == "drop":
+                continue
+            selected = get_column_names(fitted_columns, selected)
+            if len(selected) == 0:
+                continue
+            idx = [position[col] for col in selected]
+            block = features if idx == list(range(features.shape[1])) else features[:, idx]
+            if isinstance(transformer, str) and transformer == "passthrough":
+                blocks.append(block)
+            else:
+                with warnings.catch_warnings():
+                    # fitted on a DataFrame, the array has no feature names by design
+                    warnings.filterwarnings("ignore", message="X does not have valid feature names")
+                    blocks.append(transformer.transform(block))
+        return blocks[0] if len(blocks) == 1 else np.hstack(blocks)
+
+    def predict_array(self, features: np.ndarray, columns: List[str], copy: bool = True) -> np.ndarray:
+        """
+        Predicts from a float array laid out in `columns` order, skipping the DataFrame round trip
+        """
+        try:
+            return self.predict_transformed(self.transform_array(features, columns, copy=copy))
+        except Exception as e:
+            raise ForestExpection(e, sys) from e
+
     def __repr__(self):
-        return f"{type(self.trained_model_object).__name__}()"
+        return f"{getattr(self, 'model_name', type(self.trained_model_object).__name__)}()"
     
     def __str__(self):
-        return f"{type(self.trained_model_object).__name__}()"
\ No newline at end of file
+        return f"{getattr(self, 'model_name', type(self.trained_model_object).__name__)}()"
\ No newline at end of file
@@ -0,0 +1,145 @@
+import sys
+from itertools import chain
+from operator import itemgetter
+from typing import Any, Dict, List, Tuple, Union
+import numpy as np
+from src.forest.exception import ForestExpection
+from src.forest.logger import logging
+from src.forest.utils.main_utils import get_schema_dtypes
+
+
+class InvalidPayload(ForestExpection):
+    """
+    Raised for a request the model cannot score: a record with missing or non numeric features, a malformed batch
+    """
+
+
+class FeatureVectorizer:
+    """
+    Feature layout compiled once from the schema: model column order, column index map and the declared dtypes.
+    Turns JSON records or columns straight into a contiguous float array in that order, without a DataFrame.
+    """
+    def __init__(self, columns: List[str], dtypes: Dict[str, np.dtype] = None, float_dtype: np.dtype = np.float64):
+        self.columns: List[str] = list(columns)
+        self.index: Dict[str, int] = {col: i for i, col in enumerate(self.columns)}
+        self.dtypes: Dict[str, np.dtype] = {col: np.dtype((dtypes or {}).get(col, np.float64)) for col in self.columns}
+        self.float_dtype = np.dtype(float_dtype)
+        self.n_features: int = len(self.columns)
+        self._getter = itemgetter(*self.columns)
+
+    @classmethod
+    def from_schema(cls, schema_config: dict, float_dtype: np.dtype = np.float64) -> "FeatureVectorizer":
+        """
+        Model columns are the schema `numerical_columns`, the declared types come from `columns`
+        whose names are matched ignoring case and underscores
+        """
+        columns = schema_config["numerical_columns"]
+        return cls(columns=columns, dtypes=get_schema_dtypes(schema_config, columns), float_dtype=float_dtype)
+
+    def _record_row(self, record: Any) -> Tuple[np.ndarray, str]:
+        """
+        Slow path of a single record, returns its row and an error message (None when valid)
+        """
+        row = np.full(self.n_features, np.nan, dtype=self.float_dtype)
+        if not isinstance(record, dict):
+            return row, f"Record must be an object, got {type(record).__name__}"
+
+        missing_columns = [col for col in self.columns if col not in record]
+        if missing_columns:
+            return row, f"Missing features: {missing_columns}"
+
+        invalid_columns = []
+        for i, col in enumerate(self.columns):
+            value = record[col]
+            if value is None:
+                continue
+            try:
+                row[i] = float(value)
+            except (TypeError, ValueError):
+                invalid_columns.append(col)
+        if invalid_columns:
+            return row, f"Non numeric features: {invalid_columns}"
+        return row, None
+
+    def transform_record(self, record: dict) -> np.ndarray:
+        """
+        Returns the (1, n_features) array of one record, raises on invalid records
+        """
+        try:
+            return np.fromiter(self._getter(record), dtype=self.float_dtype, count=self.n_features).reshape(1, -1)
+        except Exception:
+            row, error = self._record_row(record)
+            if error is not None:
+                raise InvalidPayload(error, sys)
+            return row.reshape(1, -1)
+
+    def transform_records(self, records: List[dict]) -> Tuple[np.ndarray, Dict[int, str]]:
+        """
+        Returns the (n_records, n_features) array and {position: error} of the records that cannot be scored.
+        null values become NaN and are left to the imputer.
+        """
+        try:
+            n_rows = len(records)
+            features = np.fromiter(chain.from_iterable(map(self._getter, records)), dtype=self.float_dtype, count=n_rows * self.n_features)
+            return features.reshape(n_rows, self.n_features), {}
+        except Exception:
+            features = np.empty((len(records), self.n_features), dtype=self.float_dtype)
+            row_errors: Dict[int, str] = {}
+            for i, record in enumerate(records):
+                features[i], error = self._record_row(record)
+                if error is not None:
+                    row_errors[i] = error
+            return features, row_errors
+
+    def transform_columns(self, columns: Dict[str, list]) -> Tuple[np.ndarray, Dict[int, str]]:
+        """
+        Same as transform_records for column oriented input {name: [values]}
+        """
+        lengths = {len(values) for values in columns.values()}
+        if len(lengths) > 1:
+            raise InvalidPayload(f"Columns of a column oriented batch must have the same length, got lengths {sorted(lengths)}", sys)
+        n_rows = lengths.pop() if lengths else 0
+
+        features = np.full((n_rows, self.n_features), np.nan, dtype=self.float_dtype)
+        missing_columns = [col for col in self.columns if col not in columns]
+        if missing_columns:
+            return features, {i: f"Missing features: {missing_columns}" for i in range(n_rows)}
+
+        invalid_columns: Dict[int, List[str]] = {}
+        for j, col in enumerate(self.columns):
+            values = columns[col]
+            try:
+                features[:, j] = np.asarray(values, dtype=self.float_dtype)
+            except (TypeError, ValueError):
+                for i, value in enumerate(values):
+                    try:
+                        features[i, j] = np.nan if value is None else float(value)
+                    except (TypeError, ValueError):
+                        invalid_columns.setdefault(i, []).append(col)
+        return features, {i: f"Non numeric features: {cols}" for i, cols in invalid_columns.items()}
+
+    def transform(self, payload: Union[List[dict], Dict[str, Any]]) -> Tuple[np.ndarray, Dict[int, str]]:
+        """
+        Vectorizes a row oriented (`[{...}, ...]` or `{"records": [...]}`) or
+        column oriented (`{"columns": {name: [...]}}`) payload
+        """
+        try:
+            if isinstance(payload, dict) and "columns" in payload:
+                columns = payload["columns"]
+                if not isinstance(columns, dict) or not all(isinstance(values, list) for values in columns.values()):
+                    raise InvalidPayload("'columns' of a column oriented batch must map every feature to a list of values", sys)
+                return self.transform_columns(columns)
+
+            if isinstance(payload, dict) and "records" not in payload:
+                raise InvalidPayload("Batch payload must be a list of records, {'records': [...]} or {'columns': {...}}, "
+                                     "a single record goes in a list", sys)
+            records = payload["records"] if isinstance(payload, dict) else payload
+            if not isinstance(records, list):
+                raise InvalidPayload("Batch payload must be a list of records, {'records': [...]} or {'columns': {...}}", sys)
+            return self.transform_records(records)
+
+        except InvalidPayload:
+            raise
+        except Exception as e:
+            logging.error(f"Error in FeatureVectorizer transform: {str(e)}")
+            raise ForestExpection(e, sys) from e
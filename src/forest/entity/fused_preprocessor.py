@@ -0,0 +1,158 @@
+import sys
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+import pandas as pd
+from sklearn.compose import ColumnTransformer
+from sklearn.impute import SimpleImputer
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import StandardScaler
+from src.forest.exception import ForestExpection
+from src.forest.logger import logging
+
+
+def get_column_names(fitted_columns: List[str], selected) -> List[str]:
+    """
+    Column names of a ColumnTransformer column selection (names, indices, slice or boolean mask)
+    """
+    if isinstance(selected, slice):
+        return fitted_columns[selected]
+    selected = [selected] if isinstance(selected, (str, int)) else list(selected)
+    if len(selected) > 0 and isinstance(selected[0], (bool, np.bool_)):
+        return [col for col, keep in zip(fitted_columns, selected) if keep]
+    return [col if isinstance(col, str) else fitted_columns[col] for col in selected]
+
+
+class FusedPreprocessor:
+    """
+    A fitted ColumnTransformer of SimpleImputer / StandardScaler pipelines and passthrough columns reduced to
+    one fill value, offset and scale per output column. Transforming is a single gather of the output columns
+    followed by an in place NaN fill and affine transform, the same float operations sklearn performs.
+    """
+    PARITY_PROBE_ROWS: int = 256
+
+    def __init__(self, input_columns: List[str], output_columns: List[str], fill: np.ndarray, offset: np.ndarray, scale: np.ndarray):
+        self.input_columns = list(input_columns)
+        self.output_columns = list(output_columns)
+        self.fill = fill
+        self.offset = offset
+        self.scale = scale
+        self._gather_index: Dict[Tuple[str, ...], np.ndarray] = {}
+
+    @staticmethod
+    def _fuse_transformer(transformer, n_columns: int) -> Optional[Tuple[np.ndarray, np.ndarray, np.ndarray]]:
+        """
+        (fill, offset, scale) of one ColumnTransformer entry, None when it is not an imputer followed by a scaler
+        """
+        fill = np.full(n_columns, np.nan)
+        offset = np.zeros(n_columns)
+        scale = np.ones(n_columns)
+        if isinstance(transformer, str):
+            return (fill, offset, scale) if transformer == "passthrough" else None
+
+        steps = [step for _, step in transformer.steps] if isinstance(transformer, Pipeline) else [transformer]
+        steps = [step for step in steps if not (isinstance(step, str) and step == "passthrough") and step is not None]
+        kinds = [type(step) for step in steps]
+        if kinds not in ([SimpleImputer], [StandardScaler], [SimpleImputer, StandardScaler]):
+            return None
+
+        for step in steps:
+            if isinstance(step, SimpleImputer):
+                missing_values = step.missing_values
+                if step.add_indicator or not (isinstance(missing_values, float) and np.isnan(missing_values)):
+                    return None
+                # columns that were empty at fit time are dropped by the imputer
+                if np.isnan(step.statistics_).any():
+                    return None
+                fill = np.asarray(step.statistics_, dtype=np.float64)
+            else:
+                if step.with_mean:
+                    offset = np.asarray(step.mean_, dtype=np.float64)
+                if step.with_std:
+                    scale = np.asarray(step.scale_, dtype=np.float64)
+        return fill, offset, scale
+
+    @classmethod
+    def from_column_transformer(cls, preprocessor: object) -> Optional["FusedPreprocessor"]:
+        """
+        Compiles the fitted preprocessor, returns None when the fused kernel would not reproduce its output exactly
+        """
+        try:
+            if not isinstance(preprocessor, ColumnTransformer) or not hasattr(preprocessor, "transformers_"):
+                return None
+            if getattr(preprocessor, "sparse_output_", False):
+                return None
+            input_columns = list(preprocessor.feature_names_in_)
+            output_columns, fills, offsets, scales = [], [], [], []
+            for _, transformer, selected in preprocessor.transformers_:
+                if isinstance(transformer, str) and transformer == "drop":
+                    continue
+                selected = get_column_names(input_columns, selected)
+                if len(selected) == 0:
+                    continue
+                fused = cls._fuse_transformer(transformer, len(selected))
+                if fused is None:
+                    logging.info(f"Preprocessor step {transformer} cannot be fused, keeping the sklearn path")
+                    return None
+                output_columns.extend(selected)
+                for values, parts in zip(fused, (fills, offsets, scales)):
+                    parts.append(values)
+
+            fused_preprocessor = cls(
+                input_columns = input_columns,
+                output_columns = output_columns,
+                fill = np.concatenate(fills),
+                offset = np.concatenate(offsets),
+                scale = np.concatenate(scales),
+            )
+            if not fused_preprocessor.matches(preprocessor):
+                logging.warning("Fused preprocessor does not reproduce the sklearn output, keeping the sklearn path")
+                return None
+            return fused_preprocessor
+
+        except Exception as e:
+            raise ForestExpection(e, sys) from e
+
+    def matches(self, preprocessor: ColumnTransformer) -> bool:
+        """
+        Parity check against the sklearn transform on a probe batch around the fill values, with missing values
+        """
+        rng = np.random.default_rng(0)
+        n_columns = len(self.input_columns)
+        output_position = {col: i for i, col in enumerate(self.output_columns)}
+        center = np.array([self.fill[output_position[col]] if col in output_position and not np.isnan(self.fill[output_position[col]]) else 0.0 for col in self.input_columns])
+        spread = np.array([self.scale[output_position[col]] if col in output_position else 1.0 for col in self.input_columns])
+        probe = center + spread * rng.standard_normal((self.PARITY_PROBE_ROWS, n_columns))
+        probe[rng.random(probe.shape) < 0.05] = np.nan
+
+        expected = preprocessor.transform(pd.DataFrame(probe, columns=self.input_columns))
+        actual = self.transform(probe, self.input_columns)
+        return expected.shape == actual.shape and np.array_equal(expected, actual, equal_nan=True)
+
+    def _get_gather_index(self, columns: List[str]) -> np.ndarray:
+        key = tuple(columns)
+        gather_index = self._gather_index.get(key)
+        if gather_index is None:
+            position = {col: i for i, col in enumerate(columns)}
+            gather_index = np.array([position[col] for col in self.output_columns], dtype=np.intp)
+            self._gather_index[key] = gather_index
+        return gather_index
+
+    def transform(self, features: np.ndarray, columns: List[str], copy: bool = True) -> np.ndarray:
+        """
+        Transforms a float32 or float64 array laid out in `columns` order.
+        With copy=False and an identical layout the input array itself is transformed in place.
+        """
+        gather_index = self._get_gather_index(columns)
+        if not copy and len(gather_index) == features.shape[1] and (gather_index == np.arange(len(gather_index))).all():
+            transformed = features
+        else:
+            transformed = features[:, gather_index]
+        if transformed.dtype not in (np.float32, np.float64):
+            transformed = transformed.astype(np.float64)
+
+        np.copyto(transformed, self.fill.astype(transformed.dtype, copy=False), where=np.isnan(transformed))
+        # float64 offset and scale applied in place, like StandardScaler does: a float32 array is computed
+        # in float64 and rounded back, casting them to float32 first would round differently
+        transformed -= self.offset
+        transformed /= self.scale
+        return transformed
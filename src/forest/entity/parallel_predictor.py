@@ -0,0 +1,90 @@
+import os
+import sys
+import time
+import shutil
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Optional
+import numpy as np
+from src.forest.exception import ForestExpection
+from src.forest.logger import logging
+from src.forest.utils.main_utils import load_object, save_object
+
+
+# model of a pool worker, loaded once by the pool initializer
+_worker_model = None
+
+
+def _load_worker_model(model_file_path: str) -> None:
+    global _worker_model
+    _worker_model = load_object(model_file_path)
+
+
+def _predict_shard(features: np.ndarray, columns: List[str]) -> np.ndarray:
+    return _worker_model.predict_array(features, columns, copy=False)
+
+
+class ParallelPredictor:
+    """
+    Scores large feature arrays on a process pool. The model is written once to a local file that every
+    worker loads when it starts, so shards only carry their feature rows. Shards are returned in input order.
+    """
+    def __init__(self, model: object, max_workers: int = 0, shard_size: int = 20_000):
+        self.model = model
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.shard_size = shard_size
+        self.n_rows: int = 0
+        self.seconds: float = 0.0
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._model_dir: Optional[str] = None
+
+    @property
+    def rows_per_second(self) -> float:
+        return self.n_rows / self.seconds if self.seconds > 0 else 0.0
+
+    def start(self) -> "ParallelPredictor":
+        try:
+            if self._pool is None:
+                self._model_dir = tempfile.mkdtemp(prefix="parallel_predictor_")
+                model_file_path = os.path.join(self._model_dir, "model.pkl")
+                save_object(model_file_path, self.model)
+                self._pool = ProcessPoolExecutor(max_workers=self.max_workers, initializer=_load_worker_model, initargs=(model_file_path,))
+                logging.info(f"Started parallel predictor with {self.max_workers} workers and shards of {self.shard_size} rows")
+            return self
+        except Exception as e:
+            raise ForestExpection(e, sys) from e
+
+    def shutdown(self) -> None:
+        if self._pool is not None:
+            self._pool.shutdown(wait=True, cancel_futures=True)
+            self._pool = None
+        if self._model_dir is not None:
+            shutil.rmtree(self._model_dir, ignore_errors=True)
+            self._model_dir = None
+
+    def __enter__(self) -> "ParallelPredictor":
+        return self.start()
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.shutdown()
+
+    def predict_array(self, features: np.ndarray, columns: List[str]) -> np.ndarray:
+        """
+        Predictions of a float array laid out in `columns` order, computed shard by shard on the pool
+        """
+        try:
+            if self._pool is None:
+                raise ForestExpection("Parallel predictor is not started", sys)
+            started = time.perf_counter()
+            shards = [features[start:start + self.shard_size] for start in range(0, len(features), self.shard_size)]
+            # map yields the results in submission order whatever order the workers finish in
+            predictions = list(self._pool.map(_predict_shard, shards, [columns] * len(shards)))
+            elapsed = time.perf_counter() - started
+
+            self.n_rows += len(features)
+            self.seconds += elapsed
+            logging.info(f"Predicted {len(features)} rows in {len(shards)} shards in {elapsed:.2f}s, {len(features) / max(elapsed, 1e-9):.0f} rows/s on {self.max_workers} workers")
+            return np.concatenate(predictions) if predictions else np.empty(0)
+
+        except Exception as e:
+            raise ForestExpection(e, sys) from e
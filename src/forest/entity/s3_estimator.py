@@ -26,6 +26,12 @@ class SensorEstimator:
             print(e)
             return False
 
+    def get_model_version(self) -> str:
+        """
+        Get the version tag of the model object without downloading it
+        """
+        return self.s3.get_object_version(key = self.model_path, bucket_name = self.bucket_name)
+
     def load_model(self) -> SensorModel:
         """
         Load the model from model path
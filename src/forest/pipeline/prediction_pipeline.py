@@ -2,21 +2,39 @@ import sys
 import os
 import numpy as np
 import pandas as pd
+import pyarrow as pa
+from typing import Any, BinaryIO, Dict, List, Optional, Tuple, Union
 from pandas import DataFrame
 from src.forest.cloud_storage.aws_storage import SimpleStorageService
+from src.forest.cloud_storage.s3_multipart_writer import S3MultipartWriter
 from src.forest.exception import ForestExpection
 from src.forest.logger import logging
-from src.forest.utils.main_utils import read_yaml_file
+from src.forest.utils.main_utils import read_yaml_file, enforce_schema_dtypes, get_schema_arrow_types
+from src.forest.utils.stream_utils import prefetch, BackgroundWriter
+from src.forest.utils.table_utils import TableWriter, get_table_format
 from src.forest.constants.training_pipeline import SCHEMA_FILE_PATH
 from src.forest.entity.config_entity import PredictionPipelineConfig
 from src.forest.entity.s3_estimator import SensorEstimator
+from src.forest.entity.feature_vectorizer import FeatureVectorizer
+from src.forest.entity.parallel_predictor import ParallelPredictor
+from src.forest.serving.model_cache import ModelCache
+from src.forest.serving.prediction_cache import PredictionCache
+from src.forest.serving.traffic_monitor import TrafficMonitor
 
 
 class PredictionPipeline:
-    def __init__(self, prediction_pipeline_config: PredictionPipelineConfig = PredictionPipelineConfig()) -> None:
+    def __init__(self, prediction_pipeline_config: PredictionPipelineConfig = PredictionPipelineConfig(), model_cache: ModelCache = None, prediction_cache: PredictionCache = None,
+                 traffic_monitor: TrafficMonitor = None) -> None:
         try:
             self.schema_config = read_yaml_file(SCHEMA_FILE_PATH)
             self.prediction_pipeline_config = prediction_pipeline_config
+            self.model_cache = model_cache
+            self.prediction_cache = prediction_cache
+            self.traffic_monitor = traffic_monitor
+            self.feature_vectorizer = FeatureVectorizer.from_schema(self.schema_config)
+            self.parallel_predictor: Optional[ParallelPredictor] = None
+            self.input_format = get_table_format(prediction_pipeline_config.data_file_path, prediction_pipeline_config.input_format)
+            self.output_format = get_table_format(prediction_pipeline_config.output_file_name, prediction_pipeline_config.output_format)
             self.s3 = SimpleStorageService()
         except Exception as e:
             raise ForestExpection(e,sys)
@@ -26,11 +44,15 @@ class PredictionPipeline:
             logging.info("Entered get_data method of PredictionPipeline class")
 
             try:
-                prediction_df: DataFrame = self.s3.read_csv(
+                frames = [enforce_schema_dtypes(frame, self.schema_config) for frame in self.s3.read_table_chunks(
                     filename=self.prediction_pipeline_config.data_file_path,
-                    bucket_name=self.prediction_pipeline_config.data_bucket_name
-                )
-                logging.info("Read prediction csv file from s3 bucket")
+                    bucket_name=self.prediction_pipeline_config.data_bucket_name,
+                    table_format=self.input_format,
+                    columns=self.get_input_columns(),
+                    chunk_size=self.prediction_pipeline_config.chunk_size,
+                )]
+                prediction_df: DataFrame = frames[0] if len(frames) == 1 else pd.concat(frames, ignore_index=True)
+                logging.info(f"Read prediction {self.input_format} file from s3 bucket")
 
             except Exception as s3_error:
                 # If file doesn't exist in S3, create a sample dataframe for testing
@@ -56,13 +78,21 @@ class PredictionPipeline:
         except Exception as e:
             raise ForestExpection(e, sys)
 
-    def predict(self, dataframe: pd.DataFrame) -> np.ndarray:
+    def get_input_columns(self) -> Optional[List[str]]:
+        """
+        Columns decoded from the input file: the schema model columns, or every column without column projection
+        """
+        if not self.prediction_pipeline_config.column_projection:
+            return None
+        return self.schema_config["numerical_columns"]
+
+    def get_model(self):
+        """
+        Returns the in-memory model of the model cache, or reads the model from s3
+        """
         try:
-            dataframe.drop(self.schema_config["drop_columns"], axis=1, inplace=True)
-            dataframe.drop(self.schema_config["categorical_columns"], axis=1, inplace=True, errors='ignore')
-            logging.info("Entered predict method of PredictionPipeline class")
-            logging.info(f"Input dataframe shape: {dataframe.shape}")
-            logging.info(f"Input dataframe columns: {dataframe.columns.tolist()}")
+            if self.model_cache is not None:
+                return self.model_cache.get_model()
 
             # Create the model estimator
             model = SensorEstimator(
@@ -78,9 +108,27 @@ class PredictionPipeline:
             if not is_model_present:
                 raise ForestExpection(f"Model not found at {self.prediction_pipeline_config.model_file_path} in bucket {self.prediction_pipeline_config.model_bucket_name}", sys)
 
+            return model.load_model()
+        except Exception as e:
+            raise ForestExpection(e, sys)
+
+    def predict(self, dataframe: pd.DataFrame, model: object = None) -> np.ndarray:
+        try:
+            dataframe.drop(self.schema_config["drop_columns"], axis=1, inplace=True, errors='ignore')
+            dataframe.drop(self.schema_config["categorical_columns"], axis=1, inplace=True, errors='ignore')
+            logging.info("Entered predict method of PredictionPipeline class")
+            logging.info(f"Input dataframe shape: {dataframe.shape}")
+            logging.info(f"Input dataframe columns: {dataframe.columns.tolist()}")
+
+            if model is None:
+                model = self.get_model()
+
             # Make predictions
             logging.info("Making predictions...")
-            predictions = model.predict(dataframe)
+            if self.prediction_pipeline_config.parallel:
+                predictions = self.predict_parallel(dataframe, model)
+            else:
+                predictions = model.predict(dataframe)
             logging.info(f"Predictions shape: {predictions.shape if hasattr(predictions, 'shape') else 'unknown'}")
             logging.info("Exited the predict method of PredictionPipeline class")
 
@@ -89,9 +137,166 @@ class PredictionPipeline:
             logging.error(f"Error in predict method: {str(e)}")
             raise ForestExpection(e, sys)
 
+    def predict_parallel(self, dataframe: pd.DataFrame, model: object) -> np.ndarray:
+        """
+        Predictions of the dataframe rows sharded across the worker processes of the parallel predictor,
+        which is started on first use and kept until shutdown_parallel_predictor
+        """
+        if self.parallel_predictor is None or self.parallel_predictor.model is not model:
+            self.shutdown_parallel_predictor()
+            self.parallel_predictor = ParallelPredictor(
+                model,
+                max_workers=self.prediction_pipeline_config.parallel_workers,
+                shard_size=self.prediction_pipeline_config.shard_size,
+            ).start()
+
+        fused_preprocessor = model.get_fused_preprocessor()
+        columns = fused_preprocessor.input_columns if fused_preprocessor is not None else list(model.preprocessing_object.feature_names_in_)
+        features = dataframe[columns].to_numpy(dtype=np.float64)
+        return self.parallel_predictor.predict_array(features, columns)
+
+    def shutdown_parallel_predictor(self) -> None:
+        if self.parallel_predictor is not None:
+            logging.info(f"Parallel predictor scored {self.parallel_predictor.n_rows} rows at {self.parallel_predictor.rows_per_second:.0f} rows/s")
+            self.parallel_predictor.shutdown()
+            self.parallel_predictor = None
+
+    def predict_features(self, features: np.ndarray) -> list:
+        """
+        Predictions of a vectorized feature array, served from the prediction cache where possible.
+        The array may be transformed in place.
+        """
+        if self.prediction_cache is None or self.model_cache is None:
+            return self.get_model().predict_array(features, self.feature_vectorizer.columns, copy=False).tolist()
+
+        model, model_version = self.model_cache.get_versioned_model()
+        keys = self.prediction_cache.make_keys(features)
+        predictions = self.prediction_cache.get_many(keys, model_version)
+        missed_rows = [i for i, prediction in enumerate(predictions) if prediction is None]
+        if missed_rows:
+            missed_features = features if len(missed_rows) == len(features) else features[missed_rows]
+            predicted = model.predict_array(missed_features, self.feature_vectorizer.columns, copy=False).tolist()
+            self.prediction_cache.put_many([keys[i] for i in missed_rows], predicted, model_version)
+            for i, prediction in zip(missed_rows, predicted):
+                predictions[i] = prediction
+        return predictions
+
+    def predict_batch(self, payload: Union[List[dict], Dict[str, Any]]) -> Tuple[List[Optional[int]], List[dict]]:
+        """
+        Scores every valid row of the payload with a single model call.
+        Returns the predictions in input order (None for failed rows) and the per row errors.
+        """
+        try:
+            logging.info("Entered predict_batch method of PredictionPipeline class")
+            features, row_errors = self.feature_vectorizer.transform(payload)
+
+            predictions: List[Optional[int]] = [None] * len(features)
+            valid_rows = np.setdiff1d(np.arange(len(features)), np.fromiter(row_errors.keys(), dtype=int))
+            if len(valid_rows) > 0:
+                valid_features = features if len(valid_rows) == len(features) else features[valid_rows]
+                # predict_features may transform the array in place
+                observed_features = valid_features.copy() if self.traffic_monitor is not None else None
+                valid_predictions = self.predict_features(valid_features)
+                for i, prediction in zip(valid_rows.tolist(), valid_predictions):
+                    predictions[i] = int(prediction)
+                if self.traffic_monitor is not None:
+                    self.traffic_monitor.observe(observed_features, valid_predictions, len(row_errors))
+
+            errors = [{"index": i, "error": row_errors[i]} for i in sorted(row_errors)]
+            logging.info(f"Scored {len(valid_rows)} rows, {len(errors)} rows failed")
+            return predictions, errors
+        except Exception as e:
+            logging.error(f"Error in predict_batch method: {str(e)}")
+            raise ForestExpection(e, sys)
+
+
+    def predict_chunk(self, chunk: pd.DataFrame, model: object) -> pd.DataFrame:
+        """
+        Output rows of one input chunk: the model input columns followed by Cover_Type
+        """
+        chunk = enforce_schema_dtypes(chunk, self.schema_config)
+        predictions = self.predict(chunk, model=model)
+        chunk.drop("Cover_Type", axis=1, inplace=True, errors="ignore")
+        # chunks keep the row numbers of the file, assigning avoids aligning on them
+        chunk["Cover_Type"] = np.asarray(predictions)
+        return chunk
+
+    def get_output_column_types(self) -> Dict[str, pa.DataType]:
+        """
+        Arrow types of the output columns, fixed for every chunk: chunks are compacted one by one
+        and the same column may come out int16 in one chunk and float64 in the next. Cover_Type holds the predictions.
+        """
+        columns = self.schema_config["numerical_columns"] + self.schema_config["categorical_columns"] + self.schema_config["drop_columns"]
+        column_types = get_schema_arrow_types(self.schema_config, columns)
+        column_types["Cover_Type"] = pa.int64()
+        return column_types
+
+    def open_output_writer(self) -> S3MultipartWriter:
+        """
+        Binary writer streaming the prediction output to S3, writing the local copy in the same pass when enabled
+        """
+        config = self.prediction_pipeline_config
+        local_output_path = os.path.join(os.getcwd(), config.output_file_name) if config.local_copy else None
+        return self.s3.open_multipart_writer(
+            key=config.output_file_name,
+            bucket_name=config.data_bucket_name,
+            part_size=config.upload_part_size,
+            max_concurrency=config.upload_max_concurrency,
+            local_file_path=local_output_path,
+        )
+
+    def write_output(self, output_file: BinaryIO, dataframe: pd.DataFrame) -> None:
+        """
+        Serializes the dataframe once in the output format, chunk_size rows at a time
+        """
+        table_writer = TableWriter(output_file, self.output_format, self.prediction_pipeline_config.compression, column_types=self.get_output_column_types())
+        for start in range(0, max(len(dataframe), 1), self.prediction_pipeline_config.chunk_size):
+            table_writer.write(dataframe.iloc[start:start + self.prediction_pipeline_config.chunk_size])
+        table_writer.close()
+
+    def initiate_streaming_prediction(self) -> int:
+        """
+        Scores the input file chunk_size rows at a time in constant memory. The next chunk is downloaded and parsed
+        while the current one is predicted and the previous one is written, each stage holding at most queue_size chunks.
+        Returns the number of predicted rows.
+        """
+        try:
+            logging.info("Entered initiate_streaming_prediction method of PredictionPipeline class")
+            config = self.prediction_pipeline_config
+            model = self.get_model()
+            chunks = self.s3.read_table_chunks(
+                filename=config.data_file_path,
+                bucket_name=config.data_bucket_name,
+                table_format=self.input_format,
+                columns=self.get_input_columns(),
+                chunk_size=config.chunk_size,
+            )
+
+            n_rows = 0
+            with self.open_output_writer() as output_file:
+                table_writer = TableWriter(output_file, self.output_format, config.compression, column_types=self.get_output_column_types())
+                with BackgroundWriter(table_writer.write, depth=config.queue_size, name="prediction-writer") as writer:
+                    for chunk in prefetch(chunks, depth=config.queue_size, name="prediction-reader"):
+                        writer.put(self.predict_chunk(chunk, model))
+                        n_rows += len(chunk)
+                        logging.info(f"Predicted {n_rows} rows")
+                table_writer.close()
+            logging.info(f"Uploaded {n_rows} predictions to S3 bucket: {config.data_bucket_name}, local copy: {config.local_copy}")
+
+            logging.info("Exited initiate_streaming_prediction method of PredictionPipeline class")
+            return n_rows
+
+        except Exception as e:
+            logging.error(f"Error in initiate_streaming_prediction: {str(e)}")
+            raise ForestExpection(e, sys)
+        finally:
+            self.shutdown_parallel_predictor()
 
     def initiate_prediction(self,)->None:
         try:
+            if self.prediction_pipeline_config.streaming:
+                return self.initiate_streaming_prediction()
+
             logging.info("Entered initiate_prediction method of PredictionPipeline class")
             dataframe = self.get_data()
             logging.info(f"Got dataframe with shape: {dataframe.shape}")
@@ -120,25 +325,26 @@ class PredictionPipeline:
                 predicted_dataframe = pd.concat([dataframe, prediction], axis=1)
                 logging.info(f"Created final dataframe with dummy predictions, shape: {predicted_dataframe.shape}")
 
+            local_output_path = os.path.join(os.getcwd(), self.prediction_pipeline_config.output_file_name)
             try:
-                self.s3.upload_df_as_csv(
-                    predicted_dataframe,
-                    self.prediction_pipeline_config.output_file_name,
-                    self.prediction_pipeline_config.output_file_name,
-                    self.prediction_pipeline_config.data_bucket_name,
-                )
+                with self.open_output_writer() as output_file:
+                    self.write_output(output_file, predicted_dataframe)
                 logging.info(f"Uploaded predictions to S3 bucket: {self.prediction_pipeline_config.data_bucket_name}")
             except Exception as upload_error:
                 logging.warning(f"Failed to upload predictions to S3: {str(upload_error)}")
                 logging.info("Continuing without uploading to S3")
+                if self.prediction_pipeline_config.local_copy:
+                    with open(local_output_path, "wb") as local_file:
+                        self.write_output(local_file, predicted_dataframe)
 
-            local_output_path = os.path.join(os.getcwd(), self.prediction_pipeline_config.output_file_name)
-            predicted_dataframe.to_csv(local_output_path, index=False)
-            logging.info(f"Saved predictions locally to: {local_output_path}")
+            if self.prediction_pipeline_config.local_copy:
+                logging.info(f"Saved predictions locally to: {local_output_path}")
 
             logging.info("Exited initiate_prediction method of PredictionPipeline class")
             return predicted_dataframe
         
         except Exception as e:
             logging.error(f"Error in initiate_prediction: {str(e)}")
-            raise ForestExpection(e, sys)
\ No newline at end of file
+            raise ForestExpection(e, sys)
+        finally:
+            self.shutdown_parallel_predictor()
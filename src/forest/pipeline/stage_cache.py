@@ -0,0 +1,132 @@
+import os
+import sys
+import glob
+import json
+import hashlib
+import dataclasses
+from datetime import datetime
+from typing import Any, Iterable, List, Optional, Tuple
+from src.forest.exception import ForestExpection
+from src.forest.logger import logging
+from src.forest.entity.config_entity import StageCacheConfig
+from src.forest.utils.main_utils import read_yaml_file, write_yaml_file_atomic, hash_files
+
+
+def get_config_values(config: Any) -> dict:
+    """
+    Settings of a config dataclass, without the paths and directories that change with every run timestamp
+    """
+    return {
+        f.name: getattr(config, f.name)
+        for f in dataclasses.fields(config)
+        if not f.name.endswith(("_path", "_dir"))
+    }
+
+
+def get_code_version(source_dir: str) -> str:
+    """
+    Hash of every python source file of the package, any code change invalidates every stage
+    """
+    return hash_files(sorted(glob.glob(os.path.join(source_dir, "**", "*.py"), recursive=True)))
+
+
+class StageCache:
+    """
+    Records of the artifacts of finished TrainPipeline stages, keyed by a fingerprint of their inputs:
+    upstream artifact content hashes, config and schema/model.yaml sections and the code version.
+    A stage whose fingerprint has a record with all its files still on disk is not run again,
+    its previous artifact (pointing into the previous run directory) is returned instead.
+    Only the file fields of an artifact are recorded, reused artifacts carry no in-memory frames or arrays
+    and the next stages read their files.
+    """
+    def __init__(self, stage_cache_config: StageCacheConfig = StageCacheConfig(), force_stages: Iterable[str] = ()):
+        self.stage_cache_config = stage_cache_config
+        self.force_stages = set(force_stages)
+        self.code_version: str = get_code_version(stage_cache_config.source_dir) if stage_cache_config.enabled else ""
+
+    def is_forced(self, stage: str) -> bool:
+        return "all" in self.force_stages or stage in self.force_stages
+
+    def fingerprint(self, stage: str, inputs: dict) -> str:
+        content = json.dumps({"stage": stage, "code_version": self.code_version, "inputs": inputs}, sort_keys=True, default=str)
+        return hashlib.sha256(content.encode()).hexdigest()
+
+    def get_record_file_path(self, stage: str, fingerprint: str) -> str:
+        return os.path.join(self.stage_cache_config.cache_dir, stage, f"{fingerprint}.yaml")
+
+    @staticmethod
+    def get_artifact_files(artifact: Any) -> List[str]:
+        """
+        Existing files the artifact points to, in field order
+        """
+        files = []
+        for f in dataclasses.fields(artifact):
+            value = getattr(artifact, f.name)
+            if f.name.endswith("_path") and isinstance(value, str) and os.path.isfile(value):
+                files.append(value)
+        return files
+
+    @staticmethod
+    def to_record(artifact: Any) -> dict:
+        # in-memory frames and arrays are declared with compare=False and are left out
+        return {
+            f.name: dataclasses.asdict(getattr(artifact, f.name)) if dataclasses.is_dataclass(getattr(artifact, f.name)) else getattr(artifact, f.name)
+            for f in dataclasses.fields(artifact) if f.compare
+        }
+
+    @staticmethod
+    def from_record(artifact_class: type, record: dict) -> Any:
+        values = {}
+        for f in dataclasses.fields(artifact_class):
+            if f.name not in record:
+                continue
+            value = record[f.name]
+            values[f.name] = f.type(**value) if dataclasses.is_dataclass(f.type) and isinstance(value, dict) else value
+        return artifact_class(**values)
+
+    def load(self, stage: str, fingerprint: str, artifact_class: type) -> Optional[Tuple[Any, str]]:
+        """
+        Previous artifact of the stage and its content hash, None when the stage has to run
+        """
+        try:
+            if not self.stage_cache_config.enabled or self.is_forced(stage):
+                return None
+            record_file_path = self.get_record_file_path(stage, fingerprint)
+            if not os.path.exists(record_file_path):
+                return None
+            record = read_yaml_file(record_file_path)
+            missing_files = [file_path for file_path in record["files"] if not os.path.isfile(file_path)]
+            if missing_files:
+                logging.info(f"Stage {stage} record {fingerprint[:12]} lost its files {missing_files}, running the stage")
+                return None
+            logging.info(f"Stage {stage} inputs unchanged since {record['created']}, reusing its artifact {fingerprint[:12]}")
+            return self.from_record(artifact_class, record["artifact"]), record["output_hash"]
+
+        except Exception as e:
+            # a broken record only costs a rerun
+            logging.warning(f"Could not read the stage {stage} record {fingerprint[:12]}: {e}")
+            return None
+
+    def save(self, stage: str, fingerprint: str, artifact: Any) -> str:
+        """
+        Records the artifact of a stage that just ran under its fingerprint, returns its content hash
+        """
+        try:
+            files = self.get_artifact_files(artifact)
+            output_hash = hash_files(files)
+            if not self.stage_cache_config.enabled:
+                return output_hash
+            record_file_path = self.get_record_file_path(stage, fingerprint)
+            os.makedirs(os.path.dirname(record_file_path), exist_ok=True)
+            record = {
+                "stage": stage,
+                "created": datetime.now().isoformat(timespec="seconds"),
+                "output_hash": output_hash,
+                "files": files,
+                "artifact": self.to_record(artifact),
+            }
+            write_yaml_file_atomic(record_file_path, record)
+            return output_hash
+
+        except Exception as e:
+            raise ForestExpection(e, sys) from e
@@ -0,0 +1,135 @@
+import sys
+import time
+from dataclasses import dataclass, field
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from typing import Any, Callable, Dict, List, Tuple
+from src.forest.exception import ForestExpection
+from src.forest.logger import logging
+
+
+@dataclass
+class Stage:
+    """
+    A pipeline stage: run receives the artifacts of the stages it depends on, by stage name, and returns its own
+    """
+    name: str
+    run: Callable[[Dict[str, Any]], Any]
+    depends_on: Tuple[str, ...] = ()
+
+
+@dataclass
+class StageTiming:
+    started: float
+    finished: float
+    depends_on: Tuple[str, ...] = field(default_factory=tuple)
+
+    @property
+    def seconds(self) -> float:
+        return self.finished - self.started
+
+
+class StageExecutor:
+    """
+    Runs a dependency graph of stages on a pool of threads, each stage as soon as all the stages it depends on finished.
+    Threads fit the stages: they pass frames and arrays in memory and spend their time in numpy, pandas,
+    sklearn and I/O calls that release the GIL. On the first failure no other stage starts, the running ones
+    are waited for and the failure is raised.
+    """
+    def __init__(self, stages: List[Stage], max_workers: int = 4):
+        self.stages: Dict[str, Stage] = {stage.name: stage for stage in stages}
+        self.max_workers = max(1, max_workers)
+        self.timings: Dict[str, StageTiming] = {}
+        self.validate()
+
+    def validate(self) -> None:
+        """
+        Raises on dependencies on unknown stages and on cycles
+        """
+        for stage in self.stages.values():
+            unknown = [name for name in stage.depends_on if name not in self.stages]
+            if unknown:
+                raise ForestExpection(f"Stage {stage.name} depends on unknown stages {unknown}", sys)
+        visiting, visited = set(), set()
+
+        def visit(name: str, path: Tuple[str, ...]) -> None:
+            if name in visited:
+                return
+            if name in visiting:
+                raise ForestExpection(f"Stage dependency cycle {' -> '.join(path + (name,))}", sys)
+            visiting.add(name)
+            for dependency in self.stages[name].depends_on:
+                visit(dependency, path + (name,))
+            visiting.discard(name)
+            visited.add(name)
+
+        for name in self.stages:
+            visit(name, ())
+
+    def _run_stage(self, stage: Stage, artifacts: Dict[str, Any]) -> Tuple[Any, float, float]:
+        started = time.perf_counter()
+        artifact = stage.run({name: artifacts[name] for name in stage.depends_on})
+        return artifact, started, time.perf_counter()
+
+    def run(self) -> Dict[str, Any]:
+        """
+        Method Name: run
+        Description: Runs every stage once its dependencies are done, at most max_workers at a time,
+                     then logs the timing summary of the run
+        Output: artifacts of every stage by stage name
+        On Failure: Write an exception log and then raise an exception
+        """
+        artifacts: Dict[str, Any] = {}
+        pending = dict(self.stages)
+        running = {}
+        failure = None
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="pipeline-stage") as pool:
+            while pending or running:
+                if failure is None:
+                    ready = [stage for stage in pending.values() if all(name in artifacts for name in stage.depends_on)]
+                    for stage in ready:
+                        del pending[stage.name]
+                        logging.info(f"Starting stage {stage.name}")
+                        running[pool.submit(self._run_stage, stage, artifacts)] = stage
+                if not running:
+                    break
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    stage = running.pop(future)
+                    try:
+                        artifact, stage_started, stage_finished = future.result()
+                    except Exception as e:
+                        logging.error(f"Stage {stage.name} failed, not starting {sorted(pending)}: {e}")
+                        failure = failure or (stage.name, e)
+                        continue
+                    artifacts[stage.name] = artifact
+                    self.timings[stage.name] = StageTiming(stage_started - started, stage_finished - started, stage.depends_on)
+        self.log_timings(time.perf_counter() - started)
+        if failure is not None:
+            name, e = failure
+            raise ForestExpection(f"Stage {name} failed: {e}", sys) from e
+        return artifacts
+
+    def get_critical_path(self) -> List[str]:
+        """
+        Chain of finished stages that set the run time: from the last stage to finish, back through
+        the dependency that finished last, the one it waited for
+        """
+        if not self.timings:
+            return []
+        path = [max(self.timings, key=lambda name: self.timings[name].finished)]
+        while True:
+            dependencies = [name for name in self.timings[path[-1]].depends_on if name in self.timings]
+            if not dependencies:
+                return path[::-1]
+            path.append(max(dependencies, key=lambda name: self.timings[name].finished))
+
+    def log_timings(self, wall_seconds: float) -> None:
+        serial_seconds = sum(timing.seconds for timing in self.timings.values())
+        lines = [f"Pipeline wall time {wall_seconds:.2f}s, stages took {serial_seconds:.2f}s one after another"]
+        for name, timing in sorted(self.timings.items(), key=lambda item: item[1].started):
+            lines.append(f"  {name:<24} started {timing.started:8.2f}s  took {timing.seconds:8.2f}s")
+        critical_path = self.get_critical_path()
+        critical_seconds = sum(self.timings[name].seconds for name in critical_path)
+        lines.append(f"Critical path {critical_seconds:.2f}s: " + " -> ".join(f"{name} {self.timings[name].seconds:.2f}s" for name in critical_path))
+        logging.info("\n".join(lines))
@@ -1,24 +1,113 @@
+import os
 import sys
+import dataclasses
+import pandas as pd
+from typing import Callable, Iterable, List, Optional
 from src.forest.exception import ForestExpection
 from src.forest.logger import logging
+from src.forest.constants.training_pipeline import SCHEMA_FILE_PATH
+from src.forest.utils.main_utils import read_yaml_file, hash_files
 from src.forest.components.data_ingestion import DataIngestion
 from src.forest.components.data_validation import DataValidation
 from src.forest.components.data_transformation import DataTransformation
 from src.forest.components.model_trainer import ModelTrainer
 from src.forest.components.model_evaluation import ModelEvaluation
 from src.forest.components.model_pusher import ModelPusher
-from src.forest.entity.config_entity import DataIngestionConfig, DataValidationConfig, DataTransformationConfig, ModelTrainerConfig, ModelEvaluationConfig, ModelPusherConfig
-from src.forest.entity.artifact_entity import DataIngestionArtifact, DataValidationArtifact, DataTransformationArtifact, ModelTrainerArtifact, ModelEvaluationArtifact, ModelPusherArtifact
+from src.forest.entity.config_entity import DataIngestionConfig, DataValidationConfig, DataTransformationConfig, ModelTrainerConfig, ModelEvaluationConfig, ModelPusherConfig, StageCacheConfig
+from src.forest.entity.config_entity import training_pipeline_config
+from src.forest.entity.artifact_entity import DataIngestionArtifact, DataValidationArtifact, DataTransformationArtifact, ModelTrainerArtifact, ModelEvaluationArtifact, ModelPusherArtifact, ChampionScoreArtifact
+from src.forest.entity.s3_estimator import SensorEstimator
+from src.forest.pipeline.stage_cache import StageCache, get_config_values
+from src.forest.pipeline.stage_executor import Stage, StageExecutor
 
 
 class TrainPipeline:
-    def __init__(self):
+    """
+    force_stages: stages run even when a previous run recorded an artifact for the same inputs,
+    "all" reruns every stage. Stages after a rerun stage run too as soon as its output changes.
+    """
+    def __init__(self, force_stages: Iterable[str] = ()):
+        self.training_pipeline_config = training_pipeline_config
         self.data_ingestion_config = DataIngestionConfig()
         self.data_validation_config = DataValidationConfig()
         self.data_transformation_config = DataTransformationConfig()
         self.model_trainer_config = ModelTrainerConfig()
         self.model_evaluation_config = ModelEvaluationConfig()
         self.model_pusher_config = ModelPusherConfig()
+        self.stage_cache = StageCache(StageCacheConfig(), force_stages = force_stages)
+        # content hash of the artifact of each stage run or reused in this pipeline run
+        self.output_hashes: dict = {}
+
+    def run_stage(self, stage: str, artifact_class: type, get_inputs: Callable[[], dict], run: Callable[[], object],
+                  on_reuse: Optional[Callable[[object], object]] = None) -> object:
+        """
+        Reuses the artifact recorded for the fingerprint of the stage inputs, else runs the stage and records it.
+        on_reuse adapts a reused artifact to this run.
+        """
+        try:
+            fingerprint = self.stage_cache.fingerprint(stage, get_inputs()) if self.stage_cache.stage_cache_config.enabled else ""
+            cached = self.stage_cache.load(stage, fingerprint, artifact_class)
+            if cached is not None:
+                artifact, self.output_hashes[stage] = cached
+                return artifact if on_reuse is None else on_reuse(artifact)
+            artifact = run()
+            self.output_hashes[stage] = self.stage_cache.save(stage, fingerprint, artifact)
+            return artifact
+
+        except Exception as e:
+            raise ForestExpection(e, sys) from e
+
+    def get_data_ingestion_inputs(self) -> dict:
+        schema_config = read_yaml_file(SCHEMA_FILE_PATH)
+        return {
+            "config": get_config_values(self.data_ingestion_config),
+            "schema": {key: schema_config.get(key) for key in ("columns", "numerical_columns", "categorical_columns", "drop_columns", "column_dtypes", "one_hot_groups")},
+            "source": DataIngestion(data_ingestion_config = self.data_ingestion_config).get_source_version(),
+        }
+
+    @staticmethod
+    def reuse_data_ingestion(data_ingestion_artifact: DataIngestionArtifact) -> DataIngestionArtifact:
+        """
+        A reused ingestion artifact means the source did not change since the run that recorded it, and that run
+        already moved the high water mark past its new rows: this run ingested no new rows. Its new rows file
+        belongs to the previous run, incremental training would grow the champion on the same rows once more.
+        """
+        if data_ingestion_artifact.new_training_file_path is None:
+            return data_ingestion_artifact
+        logging.info(f"Ingestion reused, the new rows of {data_ingestion_artifact.new_training_file_path} were already ingested")
+        return dataclasses.replace(data_ingestion_artifact, new_training_file_path = None, new_train_df = pd.DataFrame())
+
+    def get_data_validation_inputs(self) -> dict:
+        reference_file_path = self.data_validation_config.reference_statistics_file_path
+        return {
+            "config": get_config_values(self.data_validation_config),
+            "schema": read_yaml_file(SCHEMA_FILE_PATH),
+            "data_ingestion": self.output_hashes["data_ingestion"],
+            "reference": hash_files([reference_file_path]) if os.path.exists(reference_file_path) else None,
+        }
+
+    def get_data_transformation_inputs(self) -> dict:
+        schema_config = read_yaml_file(SCHEMA_FILE_PATH)
+        return {
+            "schema": {key: schema_config.get(key) for key in ("numerical_columns", "categorical_columns")},
+            "data_ingestion": self.output_hashes["data_ingestion"],
+        }
+
+    def get_model_training_inputs(self, data_validation_artifact: DataValidationArtifact) -> dict:
+        inputs = {
+            "config": get_config_values(self.model_trainer_config),
+            "model": read_yaml_file(self.model_trainer_config.model_config_file_path),
+            "data_transformation": self.output_hashes["data_transformation"],
+        }
+        if self.model_trainer_config.incremental:
+            # incremental training also grows the deployed champion on the new rows
+            champion = SensorEstimator(bucket_name = self.model_trainer_config.bucket_name, model_path = self.model_trainer_config.s3_model_key_path)
+            inputs.update({
+                "data_ingestion": self.output_hashes["data_ingestion"],
+                "drift_status": data_validation_artifact.drift_status,
+                "champion": champion.get_model_version() if champion.is_model_present(model_path = self.model_trainer_config.s3_model_key_path) else None,
+            })
+        return inputs
 
     def start_data_ingestion(self) -> DataIngestionArtifact:
         logging.info("Entered the start_data_ingestion_method of TrainPipeline class")
@@ -55,11 +144,13 @@ class TrainPipeline:
         except Exception as e:
             raise ForestExpection(e, sys) from e
     
-    def start_model_training(self, data_transformation_artifact: DataTransformationArtifact) -> ModelTrainerArtifact:
+    def start_model_training(self, data_transformation_artifact: DataTransformationArtifact, data_ingestion_artifact: DataIngestionArtifact = None,
+                             data_validation_artifact: DataValidationArtifact = None) -> ModelTrainerArtifact:
         logging.info("Entered into the start_model_training method of TrainPipeline class")
         try:
             logging.info("Model Training Started...")
-            model_trainer = ModelTrainer(model_trainer_config = self.model_trainer_config, data_tranformation_artifact = data_transformation_artifact)
+            model_trainer = ModelTrainer(model_trainer_config = self.model_trainer_config, data_tranformation_artifact = data_transformation_artifact,
+                                         data_ingestion_artifact = data_ingestion_artifact, data_validation_artifact = data_validation_artifact)
             model_trainer_artifact = model_trainer.initiate_model_trainer()
             logging.info("Model Training Successful")
             return model_trainer_artifact
@@ -67,11 +158,24 @@ class TrainPipeline:
         except Exception as e:
             raise ForestExpection(e, sys) from e
     
-    def start_model_evaluation(self, data_ingestion_artifact: DataIngestionArtifact, model_trainer_artifact: ModelTrainerArtifact) -> ModelEvaluationArtifact:
+    def start_champion_scoring(self, data_ingestion_artifact: DataIngestionArtifact) -> ChampionScoreArtifact:
+        logging.info("Entered into the start_champion_scoring method of TrainPipeline class")
+        try:
+            model_evaluation = ModelEvaluation(model_evaluation_config = self.model_evaluation_config, data_ingestion_artifact = data_ingestion_artifact)
+            champion_score_artifact = model_evaluation.initiate_champion_scoring()
+            logging.info("Scored the deployed model")
+            return champion_score_artifact
+
+        except Exception as e:
+            raise ForestExpection(e, sys) from e
+
+    def start_model_evaluation(self, data_ingestion_artifact: DataIngestionArtifact, model_trainer_artifact: ModelTrainerArtifact,
+                               champion_score_artifact: Optional[ChampionScoreArtifact] = None) -> ModelEvaluationArtifact:
         logging.info("Entered into the start_model_evaluation method of TrainPipeline class")
         try:
             logging.info("Model Evaluation Started...")
-            model_evaluation = ModelEvaluation(model_evaluation_config = self.model_evaluation_config, data_ingestion_artifact = data_ingestion_artifact, model_trainer_artifact = model_trainer_artifact)
+            model_evaluation = ModelEvaluation(model_evaluation_config = self.model_evaluation_config, data_ingestion_artifact = data_ingestion_artifact, model_trainer_artifact = model_trainer_artifact,
+                                               champion_score_artifact = champion_score_artifact)
             model_evaluation_artifact = model_evaluation.initiate_model_evaluation()
             logging.info("Model Evaluation Completed")
             return model_evaluation_artifact
@@ -93,21 +197,73 @@ class TrainPipeline:
             raise ForestExpection(e, sys) from e
         
 
+    def start_reference_refresh(self, data_ingestion_artifact: DataIngestionArtifact) -> None:
+        logging.info("Entered into the start_reference_refresh method of TrainPipeline class")
+        try:
+            data_validation = DataValidation(data_validation_config = self.data_validation_config, data_ingestion_artifact = data_ingestion_artifact)
+            data_validation.refresh_reference_statistics()
+            logging.info("Refreshed the drift reference statistics")
+
+        except Exception as e:
+            raise ForestExpection(e, sys) from e
+
+    def push_accepted_model(self, model_evaluation_artifact: ModelEvaluationArtifact, model_trainer_artifact: ModelTrainerArtifact,
+                            data_ingestion_artifact: DataIngestionArtifact) -> Optional[ModelPusherArtifact]:
+        """
+        Pushes the accepted model. A deployed full retrain also makes its train set the drift reference,
+        a warm started champion keeps the reference of the full retrain it grew from.
+        """
+        if not model_evaluation_artifact.is_model_accepted:
+            logging.info("Model not accepted")
+            return None
+        model_pusher_artifact = self.start_model_pushing(model_trainer_artifact = model_evaluation_artifact)
+        if model_trainer_artifact.training_mode == "full":
+            self.start_reference_refresh(data_ingestion_artifact = data_ingestion_artifact)
+        return model_pusher_artifact
+
+    def get_stages(self) -> List[Stage]:
+        """
+        Stages of the pipeline with the stages whose artifacts they take. Validation, transformation and the scoring
+        of the deployed model only need the ingestion artifact and run side by side. Training only waits for
+        validation when incremental, for its drift status.
+        Ingestion, validation, transformation and training are memoized by the stage cache: when only model.yaml
+        changed, only training runs. Scoring, evaluation and pushing read or write the live model registry and always run.
+        Pushing a full retrain refreshes the drift reference that validation of the next runs compares with.
+        """
+        model_trainer_inputs = ("data_ingestion", "data_transformation") + (("data_validation",) if self.model_trainer_config.incremental else ())
+        return [
+            Stage("data_ingestion", lambda artifacts: self.run_stage(
+                "data_ingestion", DataIngestionArtifact, self.get_data_ingestion_inputs, self.start_data_ingestion, on_reuse = self.reuse_data_ingestion)),
+            Stage("data_validation", lambda artifacts: self.run_stage(
+                "data_validation", DataValidationArtifact, self.get_data_validation_inputs,
+                lambda: self.start_data_validation(data_ingestion_artifact = artifacts["data_ingestion"])), ("data_ingestion",)),
+            Stage("data_transformation", lambda artifacts: self.run_stage(
+                "data_transformation", DataTransformationArtifact, self.get_data_transformation_inputs,
+                lambda: self.start_data_transformation(data_ingestion_artifact = artifacts["data_ingestion"])), ("data_ingestion",)),
+            Stage("champion_scoring", lambda artifacts: self.start_champion_scoring(data_ingestion_artifact = artifacts["data_ingestion"]), ("data_ingestion",)),
+            Stage("model_trainer", lambda artifacts: self.run_stage(
+                "model_trainer", ModelTrainerArtifact, lambda: self.get_model_training_inputs(artifacts.get("data_validation")),
+                lambda: self.start_model_training(data_transformation_artifact = artifacts["data_transformation"], data_ingestion_artifact = artifacts["data_ingestion"],
+                                                  data_validation_artifact = artifacts.get("data_validation"))), model_trainer_inputs),
+            Stage("model_evaluation", lambda artifacts: self.start_model_evaluation(
+                data_ingestion_artifact = artifacts["data_ingestion"], model_trainer_artifact = artifacts["model_trainer"],
+                champion_score_artifact = artifacts["champion_scoring"]), ("data_ingestion", "model_trainer", "champion_scoring")),
+            Stage("model_pusher", lambda artifacts: self.push_accepted_model(
+                artifacts["model_evaluation"], artifacts["model_trainer"], artifacts["data_ingestion"]), ("data_ingestion", "model_trainer", "model_evaluation")),
+        ]
+
     def run_pipeline(self) -> None:
+        """
+        Method Name: run_pipeline
+        Description: Runs the stages of get_stages, each once the stages it depends on are done, up to max_workers
+                     at a time. The first failing stage stops the ones not started yet. The stage timings and
+                     the critical path of the run are logged.
+        Output: None
+        On Failure: Write an exception log and then raise an exception
+        """
         logging.info("Eneted into the run_pipeline method of TrainPipeline class")
         try:
-            data_ingestion_artifact = self.start_data_ingestion()
-            data_validation_artifact = self.start_data_validation(data_ingestion_artifact = data_ingestion_artifact)
-            data_transformation_artifact = self.start_data_transformation(data_ingestion_artifact = data_ingestion_artifact)
-            model_trainer_artifact = self.start_model_training(data_transformation_artifact = data_transformation_artifact)
-            model_evaluation_artifact = self.start_model_evaluation(data_ingestion_artifact = data_ingestion_artifact, model_trainer_artifact = model_trainer_artifact)
-
-            if not model_evaluation_artifact.is_model_accepted:
-                logging.info("Model not accepted")
-                return None
-            
-            model_pusher_artifact = self.start_model_pushing(model_trainer_artifact = model_evaluation_artifact)
-
+            StageExecutor(self.get_stages(), max_workers = self.training_pipeline_config.max_workers).run()
             logging.info("Exited the run_pipeline method of TrainPipeline class")
 
         except Exception as e:
@@ -0,0 +1,73 @@
+import sys
+import asyncio
+import threading
+from functools import partial
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Optional
+from src.forest.exception import ForestExpection
+from src.forest.logger import logging
+from src.forest.entity.config_entity import InferenceExecutorConfig
+
+
+class InferenceExecutorBusy(ForestExpection):
+    """
+    Raised when every worker is busy and the wait queue of the executor is full
+    """
+
+
+class InferenceExecutor:
+    """
+    Runs blocking model inference and I/O on a dedicated thread pool so the event loop stays responsive.
+    At most `max_workers + max_queue_size` jobs are admitted, each awaited for at most `timeout_seconds`.
+    A timed out job is abandoned by its caller but keeps its worker, and its admission slot, until it returns:
+    slots are released by the worker future once the job is done or cancelled, never by the awaiting caller.
+    """
+    def __init__(self, inference_executor_config: InferenceExecutorConfig = InferenceExecutorConfig()):
+        self.inference_executor_config = inference_executor_config
+        self._pool: Optional[ThreadPoolExecutor] = None
+        self._admitted: int = 0
+        # slots are taken on the event loop and released on worker threads
+        self._admitted_lock = threading.Lock()
+
+    @property
+    def max_workers(self) -> int:
+        return self.inference_executor_config.max_workers
+
+    @property
+    def pending(self) -> int:
+        return self._admitted
+
+    def start(self) -> None:
+        if self._pool is None:
+            self._pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="inference")
+            logging.info(f"Started inference executor with {self.inference_executor_config}")
+
+    def shutdown(self) -> None:
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+    async def run(self, fn: Callable, *args, timeout: Optional[float] = None, **kwargs) -> Any:
+        """
+        Run fn(*args, **kwargs) on the pool and await its result
+        """
+        if self._pool is None:
+            raise ForestExpection("Inference executor is not started", sys)
+
+        capacity = self.inference_executor_config.max_workers + self.inference_executor_config.max_queue_size
+        with self._admitted_lock:
+            if self._admitted >= capacity:
+                raise InferenceExecutorBusy(f"Inference executor is full with {self._admitted} pending jobs", sys)
+            self._admitted += 1
+        try:
+            future = self._pool.submit(partial(fn, *args, **kwargs))
+        except Exception:
+            self._release()
+            raise
+        future.add_done_callback(self._release)
+        # a timeout cancels the job while it waits in the queue, a running one finishes and then releases its slot
+        return await asyncio.wait_for(asyncio.wrap_future(future), timeout or self.inference_executor_config.timeout_seconds)
+
+    def _release(self, future=None) -> None:
+        with self._admitted_lock:
+            self._admitted -= 1
@@ -0,0 +1,167 @@
+import sys
+import time
+import asyncio
+from bisect import bisect_left
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from src.forest.exception import ForestExpection
+from src.forest.logger import logging
+from src.forest.entity.config_entity import MicroBatcherConfig
+from src.forest.entity.feature_vectorizer import InvalidPayload
+from src.forest.serving.inference_executor import InferenceExecutor, InferenceExecutorBusy
+
+
+class MicroBatcherMetrics:
+    """
+    Running counters of the micro batcher, histograms use fixed upper bucket bounds
+    """
+    BATCH_SIZE_BUCKETS: Tuple[int, ...] = (1, 2, 4, 8, 16, 32, 64, 128, 256)
+    QUEUE_WAIT_BUCKETS_MS: Tuple[float, ...] = (0.5, 1, 2, 5, 10, 25, 50, 100, 250, 1000)
+
+    def __init__(self):
+        self.batches: int = 0
+        self.requests: int = 0
+        self.failed_batches: int = 0
+        self.max_batch_size: int = 0
+        self.queue_wait_ms_sum: float = 0.0
+        self.queue_wait_ms_max: float = 0.0
+        self.batch_size_histogram: List[int] = [0] * (len(self.BATCH_SIZE_BUCKETS) + 1)
+        self.queue_wait_histogram: List[int] = [0] * (len(self.QUEUE_WAIT_BUCKETS_MS) + 1)
+
+    def observe_batch(self, batch_size: int, queue_waits_ms: List[float]) -> None:
+        self.batches += 1
+        self.requests += batch_size
+        self.max_batch_size = max(self.max_batch_size, batch_size)
+        self.batch_size_histogram[bisect_left(self.BATCH_SIZE_BUCKETS, batch_size)] += 1
+        for wait_ms in queue_waits_ms:
+            self.queue_wait_ms_sum += wait_ms
+            self.queue_wait_ms_max = max(self.queue_wait_ms_max, wait_ms)
+            self.queue_wait_histogram[bisect_left(self.QUEUE_WAIT_BUCKETS_MS, wait_ms)] += 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        bucket_names = lambda bounds: [f"<={bound}" for bound in bounds] + [f">{bounds[-1]}"]
+        return {
+            "batches": self.batches,
+            "requests": self.requests,
+            "failed_batches": self.failed_batches,
+            "mean_batch_size": self.requests / self.batches if self.batches else 0.0,
+            "max_batch_size": self.max_batch_size,
+            "batch_size_histogram": dict(zip(bucket_names(self.BATCH_SIZE_BUCKETS), self.batch_size_histogram)),
+            "mean_queue_wait_ms": self.queue_wait_ms_sum / self.requests if self.requests else 0.0,
+            "max_queue_wait_ms": self.queue_wait_ms_max,
+            "queue_wait_ms_histogram": dict(zip(bucket_names(self.QUEUE_WAIT_BUCKETS_MS), self.queue_wait_histogram)),
+        }
+
+
+class MicroBatcher:
+    """
+    Collects concurrent single record requests for up to `max_wait_ms` or `max_batch_size` records
+    and scores them with one vectorized call of `predict_fn`.
+    `predict_fn` takes a list of records and returns (predictions, errors) like PredictionPipeline.predict_batch.
+    With an executor, up to one batch per executor worker is scored concurrently off the event loop,
+    while all workers are busy new requests keep queueing and form the next, larger, batch.
+    """
+    def __init__(self, predict_fn: Callable[[List[dict]], Tuple[list, List[dict]]], micro_batcher_config: MicroBatcherConfig = MicroBatcherConfig(), executor: Optional[InferenceExecutor] = None):
+        self.predict_fn = predict_fn
+        self.micro_batcher_config = micro_batcher_config
+        self.executor = executor
+        self.metrics = MicroBatcherMetrics()
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+        self._batch_slots: Optional[asyncio.Semaphore] = None
+        self._scoring_tasks: set = set()
+
+    async def start(self) -> None:
+        if self._worker is None:
+            self._queue = asyncio.Queue(maxsize=self.micro_batcher_config.max_queue_size)
+            self._batch_slots = asyncio.Semaphore(self.executor.max_workers if self.executor is not None else 1)
+            self._worker = asyncio.create_task(self._run())
+            logging.info(f"Started micro batcher with {self.micro_batcher_config}")
+
+    async def stop(self) -> None:
+        if self._worker is not None:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+            self._worker = None
+
+        for task in list(self._scoring_tasks):
+            task.cancel()
+        while not self._queue.empty():
+            _, future, _ = self._queue.get_nowait()
+            if not future.done():
+                future.set_exception(ForestExpection("Micro batcher stopped", sys))
+
+    async def submit(self, record: dict) -> Any:
+        """
+        Queue one record and wait for its prediction
+        """
+        if self._worker is None:
+            raise ForestExpection("Micro batcher is not started", sys)
+        future = asyncio.get_running_loop().create_future()
+        try:
+            self._queue.put_nowait((record, future, time.perf_counter()))
+        except asyncio.QueueFull:
+            raise InferenceExecutorBusy(f"Micro batcher queue is full with {self._queue.qsize()} pending requests", sys)
+        return await future
+
+    async def _collect_batch(self) -> list:
+        batch = [await self._queue.get()]
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.micro_batcher_config.max_wait_ms / 1000
+        while len(batch) < self.micro_batcher_config.max_batch_size:
+            if not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+                continue
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _run(self) -> None:
+        while True:
+            await self._batch_slots.acquire()
+            try:
+                batch = await self._collect_batch()
+            except BaseException:
+                self._batch_slots.release()
+                raise
+            task = asyncio.create_task(self._score_batch(batch))
+            self._scoring_tasks.add(task)
+            task.add_done_callback(self._scoring_tasks.discard)
+
+    async def _score_batch(self, batch: list) -> None:
+        try:
+            started = time.perf_counter()
+            records = [record for record, _, _ in batch]
+            self.metrics.observe_batch(len(batch), [(started - enqueued) * 1000 for _, _, enqueued in batch])
+
+            try:
+                predictions, errors = await self._predict(records)
+                row_errors = {error["index"]: error["error"] for error in errors}
+                for i, (_, future, _) in enumerate(batch):
+                    if future.done():
+                        continue
+                    if i in row_errors:
+                        future.set_exception(InvalidPayload(row_errors[i], sys))
+                    else:
+                        future.set_result(predictions[i])
+
+            except Exception as e:
+                self.metrics.failed_batches += 1
+                logging.error(f"Micro batch of {len(batch)} records failed: {e!r}")
+                for _, future, _ in batch:
+                    if not future.done():
+                        future.set_exception(e)
+        finally:
+            self._batch_slots.release()
+
+    async def _predict(self, records: List[dict]) -> Tuple[list, List[dict]]:
+        if self.executor is None:
+            return self.predict_fn(records)
+        return await self.executor.run(self.predict_fn, records)
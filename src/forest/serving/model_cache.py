@@ -0,0 +1,121 @@
+import sys
+import threading
+from typing import Callable, List, Optional, Tuple
+from src.forest.exception import ForestExpection
+from src.forest.logger import logging
+from src.forest.entity.config_entity import ModelCacheConfig
+from src.forest.entity.estimator import SensorModel
+from src.forest.entity.s3_estimator import SensorEstimator
+
+
+class ModelCache:
+    """
+    Process wide holder of the deployed SensorModel.
+    The model is downloaded and unpickled once, a background thread then polls the
+    object version (ETag / VersionId) and swaps in a new model only when it changed.
+    Load listeners are called with every model swapped in, to follow what ships with it (the drift reference).
+    """
+    def __init__(self, model_cache_config: ModelCacheConfig = ModelCacheConfig()):
+        self.model_cache_config = model_cache_config
+        self.sensor_estimator = SensorEstimator(
+            bucket_name = model_cache_config.model_bucket_name,
+            model_path = model_cache_config.model_file_path
+        )
+        self._model: Optional[SensorModel] = None
+        self._version: Optional[str] = None
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._refresh_thread: Optional[threading.Thread] = None
+        self._load_listeners: List[Callable[[SensorModel, Optional[str]], None]] = []
+
+    @property
+    def version(self) -> Optional[str]:
+        return self._version
+
+    @property
+    def is_loaded(self) -> bool:
+        return self._model is not None
+
+    def get_model(self) -> SensorModel:
+        model = self._model
+        if model is None:
+            raise ForestExpection(f"Model {self.model_cache_config.model_file_path} is not loaded yet", sys)
+        return model
+
+    def get_versioned_model(self) -> Tuple[SensorModel, Optional[str]]:
+        """
+        Returns the served model together with its registry version, read consistently
+        """
+        with self._lock:
+            return self.get_model(), self._version
+
+    def add_load_listener(self, listener: Callable[[SensorModel, Optional[str]], None]) -> None:
+        """
+        Calls listener(model, version) with every loaded model, right away with the one already served
+        """
+        with self._lock:
+            self._load_listeners.append(listener)
+            model, version = self._model, self._version
+        if model is not None:
+            listener(model, version)
+
+    def load(self) -> None:
+        """
+        Download the current model from the registry and make it the served model
+        """
+        logging.info("Entered the load method of ModelCache class")
+        try:
+            version = self.sensor_estimator.get_model_version()
+            model = self.sensor_estimator.load_model()
+            model.compile(release_estimator=self.model_cache_config.release_estimator)
+            if model.get_reference_statistics() is None:
+                logging.warning(f"Model version {version} ships no drift reference, traffic PSI is not computed")
+            with self._lock:
+                self._model, self._version = model, version
+                listeners = list(self._load_listeners)
+            logging.info(f"Loaded model {model} with version {version}")
+            for listener in listeners:
+                listener(model, version)
+        except Exception as e:
+            raise ForestExpection(e, sys) from e
+
+    def refresh(self) -> bool:
+        """
+        Reload the model only when the registry holds a newer version, returns True on reload
+        """
+        try:
+            version = self.sensor_estimator.get_model_version()
+            if version == self._version:
+                return False
+            logging.info(f"Model version changed from {self._version} to {version}, reloading")
+            self.load()
+            return True
+        except Exception as e:
+            raise ForestExpection(e, sys) from e
+
+    def _refresh_loop(self) -> None:
+        while not self._stop_event.wait(self.model_cache_config.refresh_interval_seconds):
+            try:
+                self.refresh()
+            except Exception as e:
+                logging.error(f"Model refresh failed, keeping version {self._version}: {e}")
+
+    def start(self) -> None:
+        """
+        Load the model and start polling the registry for new versions
+        """
+        try:
+            self.load()
+        except Exception as e:
+            logging.error(f"Initial model load failed, will retry in background: {e}")
+
+        if self._refresh_thread is None:
+            self._stop_event.clear()
+            self._refresh_thread = threading.Thread(target=self._refresh_loop, name="model-cache-refresh", daemon=True)
+            self._refresh_thread.start()
+
+    def stop(self) -> None:
+        self._stop_event.set()
+        if self._refresh_thread is not None:
+            self._refresh_thread.join()
+            self._refresh_thread = None
@@ -0,0 +1,99 @@
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+import numpy as np
+from src.forest.logger import logging
+from src.forest.entity.config_entity import PredictionCacheConfig
+
+
+class PredictionCache:
+    """
+    Bounded LRU cache of predictions keyed by a 128 bit hash of the canonical feature vector.
+    Entries optionally expire after `ttl_seconds` and the whole cache is dropped when the model version changes.
+    """
+    def __init__(self, prediction_cache_config: PredictionCacheConfig = PredictionCacheConfig()):
+        self.prediction_cache_config = prediction_cache_config
+        self._entries: "OrderedDict[bytes, tuple]" = OrderedDict()
+        self._model_version: Optional[str] = None
+        self._lock = threading.Lock()
+        self.hits: int = 0
+        self.misses: int = 0
+        self.evictions: int = 0
+        self.expirations: int = 0
+        self.invalidations: int = 0
+
+    @staticmethod
+    def make_keys(features: np.ndarray) -> List[bytes]:
+        """
+        Keys of the rows of a feature array: -0.0 and every NaN payload are canonicalized before hashing
+        """
+        canonical = np.ascontiguousarray(features, dtype=np.float64) + 0.0
+        canonical[np.isnan(canonical)] = np.nan
+        row_bytes = canonical.view(np.uint8).reshape(len(canonical), -1)
+        return [hashlib.blake2b(row, digest_size=16).digest() for row in row_bytes]
+
+    def _sync_model_version(self, model_version: Optional[str]) -> None:
+        if model_version != self._model_version:
+            if self._entries:
+                logging.info(f"Model version changed from {self._model_version} to {model_version}, dropping {len(self._entries)} cached predictions")
+                self.invalidations += 1
+            self._entries.clear()
+            self._model_version = model_version
+
+    def get_many(self, keys: List[bytes], model_version: Optional[str]) -> List[Optional[Any]]:
+        """
+        Cached predictions of the keys for the model version, None for misses
+        """
+        ttl = self.prediction_cache_config.ttl_seconds
+        now = time.monotonic()
+        results: List[Optional[Any]] = []
+        with self._lock:
+            self._sync_model_version(model_version)
+            for key in keys:
+                entry = self._entries.get(key)
+                if entry is not None and ttl and now - entry[1] > ttl:
+                    del self._entries[key]
+                    self.expirations += 1
+                    entry = None
+                if entry is None:
+                    self.misses += 1
+                    results.append(None)
+                else:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    results.append(entry[0])
+        return results
+
+    def put_many(self, keys: List[bytes], predictions: List[Any], model_version: Optional[str]) -> None:
+        max_size = self.prediction_cache_config.max_size
+        now = time.monotonic()
+        with self._lock:
+            # predictions of a model that was replaced meanwhile are not cached
+            if model_version != self._model_version:
+                return
+            for key, prediction in zip(keys, predictions):
+                self._entries[key] = (prediction, now)
+                self._entries.move_to_end(key)
+            while len(self._entries) > max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def snapshot(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "max_size": self.prediction_cache_config.max_size,
+            "model_version": self._model_version,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "invalidations": self.invalidations,
+        }
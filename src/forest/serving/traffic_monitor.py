@@ -0,0 +1,223 @@
+import os
+import queue
+import sys
+import threading
+import time
+from typing import Any, Dict, List, Optional
+import numpy as np
+from src.forest.exception import ForestExpection
+from src.forest.logger import logging
+from src.forest.entity.config_entity import TrafficMonitorConfig
+from src.forest.entity.drift_statistics import HistogramStatistics
+from src.forest.utils.main_utils import read_yaml_file, get_schema_dtype_specs
+
+
+class TrafficMonitor:
+    """
+    Streaming statistics of the scored traffic: per feature histograms on the bins of the training reference,
+    missing and out of schema range counts, and the predicted class distribution.
+    observe() only puts the batch into a bounded queue, a background thread drains it every drain interval
+    and updates the accumulators with a few vectorized operations per drained block. Batches arriving while
+    the queue is full are dropped and counted rather than slowing requests down.
+    The reference is the one shipped with the served model, set by set_reference on every model swap,
+    unless the config names a reference file.
+    """
+    def __init__(self, columns: List[str], schema_config: dict, traffic_monitor_config: TrafficMonitorConfig = TrafficMonitorConfig()):
+        self.columns: List[str] = list(columns)
+        self.traffic_monitor_config = traffic_monitor_config
+        self.reference: Optional[HistogramStatistics] = None
+        # registry version of the served model the reference shipped with
+        self.reference_model_version: Optional[str] = None
+        if traffic_monitor_config.reference_statistics_file_path:
+            self.reference = self.load_reference(traffic_monitor_config.reference_statistics_file_path)
+        self.current: Optional[HistogramStatistics] = None if self.reference is None else self.reference.empty_like()
+
+        low, high, integral = [], [], []
+        for col, (dtype, value_range) in get_schema_dtype_specs(schema_config, self.columns).items():
+            is_integer = dtype.kind in "iu"
+            bounds = value_range or ((np.iinfo(dtype).min, np.iinfo(dtype).max) if is_integer else (-np.inf, np.inf))
+            low.append(bounds[0])
+            high.append(bounds[1])
+            integral.append(is_integer)
+        self._low, self._high = np.array(low, dtype=np.float64), np.array(high, dtype=np.float64)
+        self._integral = np.array(integral, dtype=bool)
+
+        self._queue: "queue.Queue" = queue.Queue(maxsize=traffic_monitor_config.max_queue_size)
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._worker: Optional[threading.Thread] = None
+        self._reset_counters()
+
+    def select_reference(self, reference: Optional[HistogramStatistics]) -> Optional[HistogramStatistics]:
+        """
+        Reference histograms of the monitored columns, None when some of them are missing
+        """
+        if reference is None:
+            return None
+        missing_columns = [col for col in self.columns if col not in reference.columns]
+        if missing_columns:
+            logging.warning(f"Reference statistics lack {missing_columns}, traffic PSI is not computed")
+            return None
+        return reference.select(self.columns)
+
+    def load_reference(self, file_path: str) -> Optional[HistogramStatistics]:
+        """
+        Reference histograms of the monitored columns from a file written by HistogramStatistics.to_dict, None when unavailable
+        """
+        try:
+            if not os.path.exists(file_path):
+                logging.warning(f"No reference statistics at {file_path}, traffic PSI is not computed")
+                return None
+            return self.select_reference(HistogramStatistics.from_dict(read_yaml_file(file_path)))
+        except Exception as e:
+            logging.error(f"Could not load reference statistics from {file_path}: {e}")
+            return None
+
+    def set_reference(self, reference: Optional[HistogramStatistics], model_version: Optional[str] = None) -> None:
+        """
+        Compares the traffic with the reference of a newly served model from now on, the counters of the current
+        window are reset since its rows were scored by the previous one. Ignored when the config names a reference file.
+        """
+        if self.traffic_monitor_config.reference_statistics_file_path:
+            return
+        try:
+            reference = self.select_reference(reference)
+        except Exception as e:
+            logging.error(f"Could not use the reference statistics of the served model: {e}")
+            reference = None
+        with self._lock:
+            self.reference, self.reference_model_version = reference, model_version
+            self.current = None if reference is None else reference.empty_like()
+            self._reset_counters()
+        logging.info(f"Traffic monitor reference set to {None if reference is None else reference.n_rows} rows of model version {model_version}")
+
+    def _reset_counters(self) -> None:
+        self.n_rows: int = 0
+        self.n_batches: int = 0
+        self.n_rejected: int = 0
+        self.n_dropped: int = 0
+        self.missing = np.zeros(len(self.columns), dtype=np.int64)
+        self.out_of_range = np.zeros(len(self.columns), dtype=np.int64)
+        self.class_counts: Dict[Any, int] = {}
+        self.started_at: float = time.time()
+        if self.current is not None:
+            self.current = self.reference.empty_like()
+
+    def observe(self, features: np.ndarray, predictions: np.ndarray, n_rejected: int = 0) -> None:
+        """
+        Queues a scored batch: its (n_rows, n_columns) features in `columns` order, predictions and the
+        count of rows rejected before scoring. The arrays must not be modified afterwards.
+        """
+        try:
+            self._queue.put_nowait((features, predictions, n_rejected))
+        except queue.Full:
+            self.n_dropped += 1
+
+    def update(self, features: np.ndarray, predictions: np.ndarray, n_rejected: int = 0) -> None:
+        """
+        Adds a block of scored rows to the accumulators
+        """
+        features = np.asarray(features, dtype=np.float64)
+        missing = np.isnan(features)
+        with np.errstate(invalid="ignore"):
+            invalid = (features < self._low) | (features > self._high) | (self._integral & (features != np.trunc(features)))
+        classes, counts = np.unique(np.asarray(predictions), return_counts=True)
+        with self._lock:
+            self.n_rows += len(features)
+            self.n_batches += 1
+            self.n_rejected += n_rejected
+            self.missing += missing.sum(axis=0)
+            self.out_of_range += (invalid & ~missing).sum(axis=0)
+            for label, count in zip(classes.tolist(), counts.tolist()):
+                self.class_counts[label] = self.class_counts.get(label, 0) + count
+            if self.current is not None:
+                self.current.update(features)
+
+    def _drain(self) -> None:
+        blocks = []
+        while True:
+            try:
+                blocks.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        try:
+            if blocks:
+                self.update(
+                    np.concatenate([block[0] for block in blocks]) if len(blocks) > 1 else blocks[0][0],
+                    np.concatenate([np.asarray(block[1]) for block in blocks]) if len(blocks) > 1 else blocks[0][1],
+                    sum(block[2] for block in blocks),
+                )
+        except Exception as e:
+            logging.error(f"Traffic monitor could not update its statistics: {e}")
+        finally:
+            for _ in blocks:
+                self._queue.task_done()
+
+    def _drain_loop(self) -> None:
+        # draining every interval instead of every batch amortizes the numpy call overhead over many requests
+        while not self._stop_event.wait(self.traffic_monitor_config.drain_interval_seconds):
+            self._drain()
+        self._drain()
+
+    def start(self) -> None:
+        if self._worker is None:
+            self._stop_event.clear()
+            self._worker = threading.Thread(target=self._drain_loop, name="traffic-monitor", daemon=True)
+            self._worker.start()
+
+    def stop(self) -> None:
+        if self._worker is not None:
+            self._stop_event.set()
+            self._worker.join()
+            self._worker = None
+
+    def flush(self, timeout: float = 5.0) -> None:
+        """
+        Waits until the queued batches are accumulated
+        """
+        deadline = time.monotonic() + timeout
+        while self._queue.unfinished_tasks and time.monotonic() < deadline:
+            time.sleep(0.001)
+
+    def snapshot(self, reset: bool = False) -> Dict[str, Any]:
+        """
+        Counters since the start or the last reset, with the PSI and KS of every feature against the reference
+        """
+        try:
+            with self._lock:
+                n_rows = self.n_rows
+                features = {}
+                comparison = None if self.current is None or n_rows == 0 else self.reference.compare(self.current)
+                for i, col in enumerate(self.columns):
+                    feature = {
+                        "missing": int(self.missing[i]),
+                        "out_of_range": int(self.out_of_range[i]),
+                    }
+                    if comparison is not None:
+                        psi, ks_statistic = float(comparison["psi"][i]), float(comparison["ks_statistic"][i])
+                        feature.update({
+                            "psi": round(psi, 6),
+                            "ks_statistic": round(ks_statistic, 6),
+                            "drift": psi >= self.traffic_monitor_config.psi_threshold or ks_statistic >= self.traffic_monitor_config.ks_threshold,
+                        })
+                    features[col] = feature
+                snapshot = {
+                    "window_seconds": round(time.time() - self.started_at, 3),
+                    "n_rows": n_rows,
+                    "n_batches": self.n_batches,
+                    "n_rejected": self.n_rejected,
+                    "n_dropped_batches": self.n_dropped,
+                    "queued_batches": self._queue.qsize(),
+                    "reference_rows": None if self.reference is None else self.reference.n_rows,
+                    "reference_model_version": self.reference_model_version,
+                    "class_distribution": {str(label): count / max(n_rows, 1) for label, count in sorted(self.class_counts.items())},
+                    "class_counts": {str(label): count for label, count in sorted(self.class_counts.items())},
+                    "drifted_features": [col for col, feature in features.items() if feature.get("drift")],
+                    "features": features,
+                }
+                if reset:
+                    self._reset_counters()
+            return snapshot
+
+        except Exception as e:
+            raise ForestExpection(e, sys) from e
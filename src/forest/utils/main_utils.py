@@ -1,10 +1,121 @@
 import os.path
 import sys
+import hashlib
+from fnmatch import fnmatchcase
 import numpy as np
+import pandas as pd
 import dill
 import yaml
+import pyarrow as pa
+import pyarrow.parquet as pq
+from pyarrow import feather
+from typing import Dict, Iterable, List, Optional, Tuple
 from src.forest.exception import ForestExpection
 from src.forest.logger import logging
+from src.forest.utils.one_hot_utils import ONE_HOT_METADATA_KEY, pack_one_hot_groups, unpack_one_hot_groups, get_packed_columns, encode_layout, decode_layout
+
+
+SCHEMA_DTYPES = {"int": np.int64, "float": np.float64, "category": np.int64}
+# files are hashed in blocks of this many bytes, never held whole in memory
+HASH_BLOCK_SIZE: int = 1 << 20
+# FNV-1a 64 bit prime, mixes each column hash into the row hash
+HASH_ROW_MULTIPLIER: int = 0x100000001b3
+
+
+def get_schema_dtype_specs(schema_config: dict, columns: list) -> Dict[str, Tuple[np.dtype, Optional[Tuple[int, int]]]]:
+    """
+    (dtype, value range) of each column. The compact dtype and range come from the first matching pattern of the
+    schema `column_dtypes` section, otherwise the type comes from the `columns` section, whose names are matched
+    ignoring case and underscores. Undeclared columns are float64. The range is None for the dtype's own range.
+    """
+    normalize = lambda name: name.lower().replace("_", "")
+    declared = {normalize(name): kind for column in schema_config.get("columns", []) for name, kind in column.items()}
+    compact = schema_config.get("column_dtypes", [])
+    specs = {}
+    for col in columns:
+        spec = next((spec for spec in compact if fnmatchcase(col, spec["pattern"])), None)
+        if spec is not None:
+            value_range = spec.get("range")
+            specs[col] = (np.dtype(spec["dtype"]), None if value_range is None else tuple(value_range))
+        else:
+            specs[col] = (np.dtype(SCHEMA_DTYPES.get(declared.get(normalize(col)), np.float64)), None)
+    return specs
+
+
+def get_schema_dtypes(schema_config: dict, columns: list) -> dict:
+    """
+    Declared dtype of each column, see get_schema_dtype_specs
+    """
+    return {col: dtype for col, (dtype, _) in get_schema_dtype_specs(schema_config, columns).items()}
+
+
+def count_invalid_values(values: np.ndarray, dtype: np.dtype, value_range: Optional[Tuple[int, int]] = None) -> int:
+    """
+    Count of the values an integer schema dtype cannot hold: outside value_range (the dtype range by default)
+    or not integral. Missing values are not counted, non integer dtypes have none.
+    """
+    values, dtype = np.asarray(values), np.dtype(dtype)
+    if values.dtype.kind not in "biuf" or dtype.kind not in "iu":
+        return 0
+    low, high = value_range if value_range is not None else (np.iinfo(dtype).min, np.iinfo(dtype).max)
+    if values.dtype.kind == "f":
+        values = values[~np.isnan(values)]
+        return int(np.count_nonzero((values < low) | (values > high) | (values != np.trunc(values))))
+    return int(np.count_nonzero((values < low) | (values > high)))
+
+
+def compact_column(values: np.ndarray, dtype: np.dtype, value_range: Optional[Tuple[int, int]] = None) -> Tuple[np.ndarray, int]:
+    """
+    Casts a column to its integer schema dtype, columns of other dtypes are left as they are. With missing values
+    the column becomes float32 (float64 above int16), which holds its values exactly. Columns with values
+    count_invalid_values reports are not cast either, instead of wrapping around. Returns the column and that count.
+    """
+    values, dtype = np.asarray(values), np.dtype(dtype)
+    if values.dtype.kind not in "biuf" or dtype.kind not in "iu":
+        return values, 0
+
+    n_invalid = count_invalid_values(values, dtype, value_range)
+    if n_invalid:
+        return values, n_invalid
+    if values.dtype.kind == "f" and np.isnan(values).any():
+        return values.astype(np.float32 if dtype.itemsize <= 2 else np.float64, copy=False), 0
+    return values.astype(dtype, copy=False), 0
+
+
+def get_schema_arrow_types(schema_config: dict, columns: list) -> Dict[str, pa.DataType]:
+    """
+    Arrow type of the numeric schema columns among `columns` in an output written chunk by chunk, fixed before
+    the first chunk: float64, which holds exactly every value compact_column may leave in a chunk, missing,
+    out of range or not integral. Columns the schema does not declare are left out.
+    """
+    normalize = lambda name: name.lower().replace("_", "")
+    declared = {normalize(name) for column in schema_config.get("columns", []) for name in column}
+    specs = get_schema_dtype_specs(schema_config, [col for col in columns if normalize(col) in declared])
+    return {col: pa.float64() for col, (dtype, _) in specs.items() if dtype.kind in "biuf"}
+
+
+def enforce_schema_dtypes(dataframe: pd.DataFrame, schema_config: dict) -> pd.DataFrame:
+    """
+    The dataframe with every column cast to its compact schema dtype, out of range values are logged
+    """
+    specs = get_schema_dtype_specs(schema_config, list(dataframe.columns))
+    data, out_of_range = {}, {}
+    for col in dataframe.columns:
+        data[col], n_invalid = compact_column(dataframe[col].to_numpy(), *specs[col])
+        if n_invalid:
+            out_of_range[col] = n_invalid
+    if out_of_range:
+        logging.warning(f"Values out of the schema range, columns kept wide: {out_of_range}")
+    return pd.DataFrame(data, index=dataframe.index, copy=False)
+
+
+def get_out_of_range_counts(dataframe: pd.DataFrame, schema_config: dict) -> Dict[str, int]:
+    """
+    Count of the values of each column outside its schema range or dtype, columns without any are left out
+    """
+    specs = get_schema_dtype_specs(schema_config, list(dataframe.columns))
+    counts = {col: count_invalid_values(dataframe[col].to_numpy(), *specs[col]) for col in dataframe.columns}
+    return {col: count for col, count in counts.items() if count}
 
 
 def read_yaml_file(file_path: str) -> dict:
@@ -29,6 +140,20 @@ def write_yaml_file(file_path: str, content: object, replace: bool = False) -> N
         raise ForestExpection(e, sys)
 
 
+def write_yaml_file_atomic(file_path: str, content: object) -> None:
+    """
+    Writes the yaml file next to file_path and renames it over it, so readers and a writer failing
+    half way never leave or see a half written file
+    """
+    try:
+        temp_file_path = file_path + ".tmp"
+        write_yaml_file(temp_file_path, content, replace=True)
+        os.replace(temp_file_path, file_path)
+
+    except Exception as e:
+        raise ForestExpection(e, sys) from e
+
+
 def load_object(file_path: str) -> object:
     logging.info("Entered the load_object method of main_utils class")
     try:
@@ -66,14 +191,91 @@ def save_numpy_array_data(file_path: str, array: np.array):
         raise ForestExpection(e, sys) from e
     
 
-def load_numpy_array_data(file_path: str) -> np.array:
+def load_numpy_array_data(file_path: str, mmap_mode: Optional[str] = None) -> np.array:
+    """
+    mmap_mode "r" maps the array instead of reading it, pages are only read when touched
+    """
     try:
+        if mmap_mode is not None:
+            return np.load(file_path, mmap_mode=mmap_mode)
         with open(file_path, 'rb') as file_obj:
             return np.load(file_obj, allow_pickle=True)
     except Exception as e:
         raise ForestExpection(e, sys) from e
 
 
+def hash_files(file_paths: Iterable[str]) -> str:
+    """
+    sha256 of the names and contents of the files, in the given order
+    """
+    digest = hashlib.sha256()
+    for file_path in file_paths:
+        digest.update(os.path.basename(file_path).encode())
+        with open(file_path, "rb") as file_obj:
+            for block in iter(lambda: file_obj.read(HASH_BLOCK_SIZE), b""):
+                digest.update(block)
+    return digest.hexdigest()
+
+
+
+def get_row_hashes(dataframe: pd.DataFrame) -> np.ndarray:
+    """
+    64 bit hash of every row from its values read as float64: the same row gets the same hash in every run,
+    whatever its position in the frame and the dtypes its columns were compacted to
+    """
+    row_hashes = np.zeros(len(dataframe), dtype=np.uint64)
+    for col in dataframe.columns:
+        column_hashes = pd.util.hash_array(dataframe[col].to_numpy(dtype=np.float64, na_value=np.nan))
+        row_hashes = (row_hashes * np.uint64(HASH_ROW_MULTIPLIER)) ^ column_hashes
+    return row_hashes
+
+def save_dataframe(file_path: str, dataframe: pd.DataFrame, one_hot_groups: Optional[Dict[str, List[str]]] = None) -> None:
+    """
+    Writes the frame as an uncompressed Feather (Arrow IPC) file, which keeps the dtypes and can be memory mapped
+    by load_dataframe, or as a zstd parquet file for a .parquet path. The index is not saved.
+    Each of the one_hot_groups {name: columns} is stored as a single code column, see pack_one_hot_groups,
+    with the layout in the schema metadata so load_dataframe expands it back.
+    """
+    try:
+        os.makedirs(os.path.dirname(file_path), exist_ok=True)
+        dataframe, layout = dataframe.reset_index(drop=True), {}
+        if one_hot_groups:
+            dataframe, layout = pack_one_hot_groups(dataframe, one_hot_groups)
+        table = pa.Table.from_pandas(dataframe, preserve_index=False)
+        if layout:
+            table = table.replace_schema_metadata({**(table.schema.metadata or {}), ONE_HOT_METADATA_KEY: encode_layout(layout)})
+        if file_path.endswith(".parquet"):
+            pq.write_table(table, file_path, compression="zstd")
+        else:
+            feather.write_feather(table, file_path, compression="uncompressed")
+    except Exception as e:
+        raise ForestExpection(e, sys) from e
+
+
+def load_dataframe(file_path: str, columns: Optional[List[str]] = None) -> pd.DataFrame:
+    """
+    Reads a frame saved by save_dataframe through a memory map, only the listed columns in the listed order when given,
+    with its packed one-hot groups expanded. csv files are still parsed, for artifacts written before the Feather switch.
+    """
+    try:
+        if file_path.endswith(".csv"):
+            dataframe = pd.read_csv(file_path, usecols=columns)
+        else:
+            if file_path.endswith(".parquet"):
+                layout = decode_layout(pq.read_schema(file_path, memory_map=True).metadata)
+                read_table = lambda stored: pq.read_table(file_path, columns=stored, memory_map=True)
+            else:
+                with pa.memory_map(file_path) as mapped:
+                    layout = decode_layout(pa.ipc.open_file(mapped).schema.metadata)
+                read_table = lambda stored: feather.read_table(file_path, columns=stored, memory_map=True)
+            stored = None if columns is None else get_packed_columns(layout, columns)
+            dataframe = unpack_one_hot_groups(read_table(stored).to_pandas(), layout)
+        # readers return file order, the rest of a read one-hot group is left out
+        return dataframe if columns is None else dataframe[list(dict.fromkeys(columns))]
+    except Exception as e:
+        raise ForestExpection(e, sys) from e
+
+
 def create_directories(path_to_directries: list, verbose = True):
     for path in path_to_directries:
         os.makedirs(path, exist_ok=True)
@@ -0,0 +1,134 @@
+import json
+import sys
+from fnmatch import fnmatchcase
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+import pandas as pd
+from src.forest.exception import ForestExpection
+from src.forest.logger import logging
+
+# key of the packed group layout in the Arrow schema metadata of a saved frame
+ONE_HOT_METADATA_KEY = b"forest.one_hot_groups"
+
+
+def get_one_hot_groups(schema_config: dict, columns: List[str]) -> Dict[str, List[str]]:
+    """
+    Columns of each schema `one_hot_groups` entry found in `columns`, in frame order
+    """
+    groups = {}
+    for group in schema_config.get("one_hot_groups", []):
+        group_columns = [col for col in columns if fnmatchcase(col, group["pattern"])]
+        if group_columns:
+            groups[group["name"]] = group_columns
+    return groups
+
+
+def pack_one_hot_group(values: np.ndarray) -> Tuple[Optional[np.ndarray], Optional[str]]:
+    """
+    Codes of a (n_rows, n_columns) block of 0/1 flags: the 1-based index of the set flag (0 when none is set)
+    when no row has more than one, else a bitmask with bit j set for column j.
+    Returns (None, None) for blocks that cannot be packed losslessly: missing values, values other than 0 and 1,
+    or more than 64 columns for a bitmask.
+    """
+    n_columns = values.shape[1]
+    if values.dtype.kind == "f" and np.isnan(values).any():
+        return None, None
+    if ((values != 0) & (values != 1)).any():
+        return None, None
+
+    flags = values.astype(bool)
+    n_set = flags.sum(axis=1)
+    if n_set.size == 0 or n_set.max() <= 1:
+        codes = np.where(n_set == 1, flags.argmax(axis=1) + 1, 0)
+        return codes.astype(np.uint8 if n_columns < 255 else np.uint16), "index"
+    if n_columns > 64:
+        return None, None
+    code_dtype = next(dtype for dtype in (np.uint8, np.uint16, np.uint32, np.uint64) if np.iinfo(dtype).bits >= n_columns)
+    weights = np.left_shift(np.ones(n_columns, dtype=np.uint64), np.arange(n_columns, dtype=np.uint64))
+    return (flags.astype(np.uint64) @ weights).astype(code_dtype), "bitmask"
+
+
+def unpack_one_hot_group(codes: np.ndarray, encoding: str, n_columns: int, dtype: np.dtype) -> List[np.ndarray]:
+    """
+    One-hot columns of the codes of pack_one_hot_group, each a dtype array
+    """
+    if encoding == "index":
+        return [(codes == j + 1).astype(dtype) for j in range(n_columns)]
+    if encoding == "bitmask":
+        codes = codes.astype(np.uint64, copy=False)
+        return [((codes >> np.uint64(j)) & np.uint64(1)).astype(dtype) for j in range(n_columns)]
+    raise ForestExpection(f"Unknown one-hot group encoding {encoding}", sys)
+
+
+def pack_one_hot_groups(dataframe: pd.DataFrame, groups: Dict[str, List[str]]) -> Tuple[pd.DataFrame, dict]:
+    """
+    Replaces each one-hot group of the dataframe by one code column named after the group,
+    placed where the first column of the group was. Groups that cannot be packed losslessly are kept as they are.
+    Returns the packed dataframe and the layout unpack_one_hot_groups needs to restore it.
+    """
+    try:
+        packed, seen = {}, set()
+        layout = {"columns": list(dataframe.columns), "groups": {}}
+        grouped = {col: name for name, columns in groups.items() for col in columns}
+        for col in dataframe.columns:
+            name = grouped.get(col)
+            if name is None:
+                packed[col] = dataframe[col].to_numpy()
+                continue
+            if name in seen:
+                continue
+            seen.add(name)
+            columns = groups[name]
+            codes, encoding = pack_one_hot_group(dataframe[columns].to_numpy())
+            if codes is None or name in dataframe.columns:
+                logging.warning(f"One-hot group {name} cannot be packed losslessly, its columns are kept")
+                packed.update({group_col: dataframe[group_col].to_numpy() for group_col in columns})
+                continue
+            packed[name] = codes
+            layout["groups"][name] = {"columns": columns, "encoding": encoding, "dtype": str(dataframe[columns[0]].dtype)}
+        if not layout["groups"]:
+            return dataframe, {}
+        return pd.DataFrame(packed, index=dataframe.index, copy=False), layout
+
+    except Exception as e:
+        raise ForestExpection(e, sys) from e
+
+
+def unpack_one_hot_groups(dataframe: pd.DataFrame, layout: dict) -> pd.DataFrame:
+    """
+    Expands the code columns of pack_one_hot_groups back to the original one-hot columns and column order.
+    Columns missing from the dataframe are left out.
+    """
+    try:
+        if not layout or not layout.get("groups"):
+            return dataframe
+        data = {col: dataframe[col].to_numpy() for col in dataframe.columns if col not in layout["groups"]}
+        for name, group in layout["groups"].items():
+            if name in dataframe.columns:
+                expanded = unpack_one_hot_group(dataframe[name].to_numpy(), group["encoding"], len(group["columns"]), np.dtype(group["dtype"]))
+                data.update(zip(group["columns"], expanded))
+        return pd.DataFrame({col: data[col] for col in layout["columns"] if col in data}, index=dataframe.index, copy=False)
+
+    except Exception as e:
+        raise ForestExpection(e, sys) from e
+
+
+def get_packed_columns(layout: dict, columns: List[str]) -> List[str]:
+    """
+    Stored columns holding the given original columns, code columns in place of their group columns
+    """
+    stored = {}
+    for col in columns:
+        name = next((name for name, group in layout.get("groups", {}).items() if col in group["columns"]), col)
+        stored[name] = None
+    return list(stored)
+
+
+def encode_layout(layout: dict) -> bytes:
+    return json.dumps(layout).encode()
+
+
+def decode_layout(metadata: Optional[dict]) -> dict:
+    if not metadata or ONE_HOT_METADATA_KEY not in metadata:
+        return {}
+    return json.loads(metadata[ONE_HOT_METADATA_KEY])
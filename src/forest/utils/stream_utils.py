@@ -0,0 +1,114 @@
+import sys
+import queue
+import threading
+from typing import Any, Callable, Iterable, Iterator, Optional
+from src.forest.exception import ForestExpection
+from src.forest.logger import logging
+
+
+_END = object()
+_POLL_SECONDS = 0.1
+
+
+def prefetch(iterable: Iterable, depth: int = 2, name: str = "prefetch") -> Iterator:
+    """
+    Iterates `iterable` on a background thread, staying at most `depth` items ahead of the consumer.
+    An error raised by the iterable is raised again in the consumer. Leaving the loop early stops the producer.
+    """
+    items: queue.Queue = queue.Queue(maxsize=max(1, depth))
+    stopped = threading.Event()
+    error: list = []
+
+    def offer(item: Any) -> bool:
+        while not stopped.is_set():
+            try:
+                items.put(item, timeout=_POLL_SECONDS)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def produce() -> None:
+        try:
+            for item in iterable:
+                if not offer(item):
+                    return
+        except BaseException as e:
+            error.append(e)
+        offer(_END)
+
+    producer = threading.Thread(target=produce, name=name, daemon=True)
+    producer.start()
+    try:
+        while True:
+            item = items.get()
+            if item is _END:
+                break
+            yield item
+        if error:
+            raise ForestExpection(error[0], sys) from error[0]
+    finally:
+        stopped.set()
+        producer.join()
+
+
+class BackgroundWriter:
+    """
+    Hands items to `write_fn` on a background thread through a queue of at most `depth` items,
+    so writing the previous output overlaps with producing the next one.
+    """
+    def __init__(self, write_fn: Callable[[Any], None], depth: int = 2, name: str = "writer"):
+        self.write_fn = write_fn
+        self._items: queue.Queue = queue.Queue(maxsize=max(1, depth))
+        self._error: Optional[BaseException] = None
+        self._thread = threading.Thread(target=self._write_loop, name=name, daemon=True)
+        self._thread.start()
+
+    def _write_loop(self) -> None:
+        while True:
+            item = self._items.get()
+            if item is _END:
+                return
+            if self._error is not None:
+                continue
+            try:
+                self.write_fn(item)
+            except BaseException as e:
+                logging.error(f"Error in background writer: {str(e)}")
+                self._error = e
+
+    def _raise_error(self) -> None:
+        if self._error is not None:
+            raise ForestExpection(self._error, sys) from self._error
+
+    def put(self, item: Any) -> None:
+        """
+        Queues an item, blocks while the queue is full and raises the error of a failed write
+        """
+        while True:
+            self._raise_error()
+            try:
+                self._items.put(item, timeout=_POLL_SECONDS)
+                return
+            except queue.Full:
+                continue
+
+    def close(self) -> None:
+        """
+        Waits for every queued item to be written
+        """
+        self._items.put(_END)
+        self._thread.join()
+        self._raise_error()
+
+    def __enter__(self) -> "BackgroundWriter":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        if exc_type is None:
+            self.close()
+        else:
+            # drop what is queued, the caller is already failing
+            self._error = self._error or exc_value
+            self._items.put(_END)
+            self._thread.join()
@@ -0,0 +1,129 @@
+import os
+import sys
+from typing import BinaryIO, Dict, Iterator, List, Optional
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from src.forest.exception import ForestExpection
+from src.forest.logger import logging
+
+
+TABLE_FORMAT_EXTENSIONS = {
+    ".csv": "csv",
+    ".parquet": "parquet",
+    ".pq": "parquet",
+    ".arrow": "arrow",
+    ".feather": "arrow",
+    ".ipc": "arrow",
+}
+TABLE_FORMATS = ("csv", "parquet", "arrow")
+# Arrow IPC buffers can only be compressed with these codecs
+ARROW_IPC_COMPRESSIONS = ("zstd", "lz4")
+
+
+def get_table_format(file_path: str, table_format: str = "auto") -> str:
+    """
+    Configured table format, or the one of the file extension when it is "auto" (csv for unknown extensions)
+    """
+    if table_format not in (None, "auto"):
+        if table_format not in TABLE_FORMATS:
+            raise ForestExpection(f"Unsupported table format {table_format}, expected one of {TABLE_FORMATS}", sys)
+        return table_format
+    return TABLE_FORMAT_EXTENSIONS.get(os.path.splitext(file_path)[1].lower(), "csv")
+
+
+def read_table_chunks(source: object, table_format: str, columns: Optional[List[str]] = None, chunk_size: Optional[int] = None) -> Iterator[pd.DataFrame]:
+    """
+    Decodes a csv stream, or a parquet / Arrow IPC file path, chunk_size rows at a time (all at once when None).
+    Only the listed columns found in the file are decoded, in file order.
+    """
+    projected = None if columns is None else set(columns)
+    if table_format == "csv":
+        usecols = None if projected is None else (lambda col: col in projected)
+        if chunk_size is None:
+            yield pd.read_csv(source, na_values="na", usecols=usecols)
+            return
+        with pd.read_csv(source, na_values="na", usecols=usecols, chunksize=chunk_size) as reader:
+            yield from reader
+
+    elif table_format == "parquet":
+        parquet_file = pq.ParquetFile(source, memory_map=True)
+        names = parquet_file.schema_arrow.names
+        selected = None if projected is None else [col for col in names if col in projected]
+        if chunk_size is None:
+            yield parquet_file.read(columns=selected).to_pandas()
+            return
+        for batch in parquet_file.iter_batches(batch_size=chunk_size, columns=selected):
+            yield batch.to_pandas()
+
+    elif table_format == "arrow":
+        # record batches are read from the memory map, only the selected columns are touched
+        with pa.memory_map(source) as mapped:
+            reader = pa.ipc.open_file(mapped)
+            names = reader.schema.names
+            selected = names if projected is None else [col for col in names if col in projected]
+            if chunk_size is None:
+                yield reader.read_all().select(selected).to_pandas()
+                return
+            for i in range(reader.num_record_batches):
+                batch = reader.get_batch(i).select(selected)
+                for start in range(0, max(batch.num_rows, 1), chunk_size):
+                    yield batch.slice(start, chunk_size).to_pandas()
+
+    else:
+        raise ForestExpection(f"Unsupported table format {table_format}, expected one of {TABLE_FORMATS}", sys)
+
+
+class TableWriter:
+    """
+    Writes DataFrame chunks to a binary file object as one csv, parquet or Arrow IPC file.
+    Parquet gets one row group per chunk. The file schema is set when the first chunk comes: columns listed
+    in column_types get that type, the others the type of the first chunk. Every chunk is converted to it,
+    column_types should cover the columns whose dtype varies from chunk to chunk.
+    """
+    def __init__(self, output_file: BinaryIO, table_format: str, compression: Optional[str] = "zstd",
+                 column_types: Optional[Dict[str, pa.DataType]] = None):
+        if table_format not in TABLE_FORMATS:
+            raise ForestExpection(f"Unsupported table format {table_format}, expected one of {TABLE_FORMATS}", sys)
+        if table_format == "arrow" and compression not in (None, *ARROW_IPC_COMPRESSIONS):
+            raise ForestExpection(f"Arrow IPC supports {ARROW_IPC_COMPRESSIONS} compression, got {compression}", sys)
+        self.output_file = output_file
+        self.table_format = table_format
+        self.compression = compression
+        self.column_types: Dict[str, pa.DataType] = dict(column_types or {})
+        self.n_rows: int = 0
+        self._schema: Optional[pa.Schema] = None
+        self._writer = None
+        self._header_written: bool = False
+
+    def _open(self, schema: pa.Schema) -> None:
+        self._schema = schema
+        if self.table_format == "parquet":
+            self._writer = pq.ParquetWriter(self.output_file, schema, compression=self.compression or "none")
+        elif self.table_format == "arrow":
+            options = pa.ipc.IpcWriteOptions(compression="lz4_frame" if self.compression == "lz4" else self.compression)
+            self._writer = pa.ipc.new_file(self.output_file, schema, options=options)
+        logging.info(f"Writing {self.table_format} output with {self.compression} compression")
+
+    def write(self, dataframe: pd.DataFrame) -> None:
+        try:
+            if self.table_format == "csv":
+                self.output_file.write(dataframe.to_csv(index=False, header=not self._header_written).encode())
+                self._header_written = True
+            else:
+                if self._writer is None:
+                    inferred = pa.Schema.from_pandas(dataframe, preserve_index=False)
+                    self._open(pa.schema([pa.field(f.name, self.column_types.get(f.name, f.type)) for f in inferred]))
+                table = pa.Table.from_pandas(dataframe, schema=self._schema, preserve_index=False)
+                self._writer.write_table(table)
+            self.n_rows += len(dataframe)
+        except Exception as e:
+            raise ForestExpection(e, sys) from e
+
+    def close(self) -> None:
+        """
+        Writes the file footer, the output file itself stays open
+        """
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
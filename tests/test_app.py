@@ -0,0 +1,87 @@
+import pytest
+from fastapi.testclient import TestClient
+import app as app_module
+from benchmarks.synthetic_data import StaticModelCache, make_covtype_frame, make_sensor_model
+from src.forest.entity.config_entity import PredictionCacheConfig, TrafficMonitorConfig
+
+
+class FakeModelCache(StaticModelCache):
+    def __init__(self, model_cache_config=None):
+        super().__init__(make_sensor_model(n_rows=2000, n_estimators=10))
+
+    def start(self) -> None:
+        pass
+
+    def stop(self) -> None:
+        pass
+
+
+@pytest.fixture(scope="module")
+def client():
+    with pytest.MonkeyPatch.context() as monkeypatch:
+        monkeypatch.setattr(app_module, "ModelCache", FakeModelCache)
+        monkeypatch.setattr(app_module, "PredictionCacheConfig", lambda: PredictionCacheConfig(enabled=False))
+        monkeypatch.setattr(app_module, "TrafficMonitorConfig", lambda: TrafficMonitorConfig(enabled=False))
+        with TestClient(app_module.app) as client:
+            yield client
+
+
+@pytest.fixture(scope="module")
+def record():
+    return {col: int(value) for col, value in make_covtype_frame(1, seed=0).iloc[0].items()}
+
+
+def test_predict(client, record):
+    response = client.post("/predict", json=record)
+    assert response.status_code == 200
+    assert response.json()["prediction"] in range(1, 8)
+
+
+@pytest.mark.parametrize("change", [
+    lambda record: record.pop("Elevation"),
+    lambda record: record.update(Slope="steep"),
+])
+def test_predict_invalid_record_is_a_client_error(client, record, change):
+    record = dict(record)
+    change(record)
+    response = client.post("/predict", json=record)
+    assert response.status_code == 422
+    assert response.json()["detail"].startswith("Invalid request:")
+
+
+def test_predict_body_that_is_not_json(client):
+    response = client.post("/predict", data=b"{not json", headers={"Content-Type": "application/json"})
+    assert response.status_code == 400
+
+
+def test_server_faults_stay_500(client, record, monkeypatch):
+    def fail(records):
+        raise RuntimeError("model failure")
+    monkeypatch.setattr(app_module.prediction_pipeline, "predict_batch", fail)
+    response = client.post("/predict/batch", json=[record])
+    assert response.status_code == 500
+
+
+@pytest.mark.parametrize("wrap", [
+    lambda record: [record],
+    lambda record: {"records": [record]},
+    lambda record: {"columns": {col: [value] for col, value in record.items()}},
+])
+def test_predict_batch_payload_shapes(client, record, wrap):
+    response = client.post("/predict/batch", json=wrap(record))
+    assert response.status_code == 200
+    assert response.json()["errors"] == []
+    assert response.json()["predictions"][0] in range(1, 8)
+
+
+@pytest.mark.parametrize("wrap", [
+    lambda record: record,
+    lambda record: {"records": record},
+    lambda record: {"columns": record},
+    lambda record: {"columns": {"Elevation": [1, 2], "Slope": [3]}},
+    lambda record: "records",
+])
+def test_predict_batch_malformed_payload_is_a_client_error(client, record, wrap):
+    response = client.post("/predict/batch", json=wrap(record))
+    assert response.status_code == 422
+    assert response.json()["detail"].startswith("Invalid request:")
@@ -0,0 +1,98 @@
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.ensemble import ExtraTreesClassifier, RandomForestClassifier
+from benchmarks.synthetic_data import make_covtype_frame
+from src.forest.components.data_transformation import DataTransformation
+from src.forest.constants.training_pipeline import SCHEMA_FILE_PATH, TARGET_COLUMN
+from src.forest.entity.compact_forest import CompactForest
+from src.forest.entity.estimator import SensorModel
+from src.forest.utils.main_utils import enforce_schema_dtypes, read_yaml_file
+
+
+@pytest.fixture(scope="module")
+def schema_config():
+    return read_yaml_file(SCHEMA_FILE_PATH)
+
+
+def make_frame(schema_config: dict, n_rows: int, seed: int, missing_fraction: float = 0.05) -> pd.DataFrame:
+    df = make_covtype_frame(n_rows, seed=seed).drop(columns=schema_config["drop_columns"])
+    df = df.astype({col: np.float64 for col in df.columns if col != TARGET_COLUMN})
+    missing_columns = schema_config["numerical_columns"][::2]
+    mask = np.random.default_rng(seed).random((n_rows, len(missing_columns))) < missing_fraction
+    df[missing_columns] = df[missing_columns].mask(mask)
+    return df
+
+
+def split(df: pd.DataFrame) -> tuple:
+    return df.drop(columns=[TARGET_COLUMN]), df[TARGET_COLUMN].to_numpy()
+
+
+@pytest.fixture(scope="module")
+def train_frame(schema_config):
+    return make_frame(schema_config, 2000, seed=0)
+
+
+@pytest.fixture(scope="module", params=[RandomForestClassifier, ExtraTreesClassifier])
+def forest(request, train_frame):
+    # fitted on the raw features, missing values included: every split also learns where NaN goes
+    x_train, y_train = split(train_frame)
+    return request.param(n_estimators=25, min_samples_leaf=3, random_state=0).fit(x_train.to_numpy(), y_train)
+
+
+@pytest.fixture(scope="module")
+def compact_forest(forest):
+    compact_forest = CompactForest.from_estimator(forest)
+    assert compact_forest is not None
+    return compact_forest
+
+
+def test_matches_sklearn_with_missing_values(schema_config, forest, compact_forest):
+    x_test, _ = split(make_frame(schema_config, 1000, seed=1, missing_fraction=0.2))
+    features = x_test.to_numpy()
+    assert np.isnan(features).any()
+    assert np.array_equal(forest.predict(features), compact_forest.predict(features))
+    assert np.array_equal(forest.predict_proba(features), compact_forest.predict_proba(features))
+
+
+def test_matches_sklearn_one_row_at_a_time(schema_config, forest, compact_forest):
+    x_test, _ = split(make_frame(schema_config, 100, seed=2, missing_fraction=0.3))
+    features = x_test.to_numpy()
+    expected = forest.predict(features)
+    for i in range(len(features)):
+        assert compact_forest.predict(features[i:i + 1]).tolist() == expected[i:i + 1].tolist()
+
+
+def test_matches_sklearn_on_compact_dtypes(schema_config, forest, compact_forest):
+    x_test, _ = split(make_frame(schema_config, 1000, seed=3))
+    compact = enforce_schema_dtypes(x_test.copy(), schema_config)
+    assert not (compact.dtypes == np.float64).any()
+    expected = forest.predict(x_test.to_numpy())
+    for features in (compact.to_numpy(), compact.to_numpy(dtype=np.float32)):
+        assert features.dtype == np.float32
+        assert np.array_equal(expected, compact_forest.predict(features))
+
+
+def test_sensor_model_matches_the_sklearn_pipeline(schema_config, train_frame):
+    x_train, y_train = split(train_frame)
+    preprocessor = DataTransformation(data_ingestion_artifact=None, data_transformation_config=None).get_data_transformer_object().fit(x_train)
+    model = RandomForestClassifier(n_estimators=25, min_samples_leaf=3, random_state=0).fit(preprocessor.transform(x_train), y_train)
+    sensor_model = SensorModel(preprocessing_object=preprocessor, trained_model_object=model)
+    sensor_model.compile()
+    assert sensor_model.fused_preprocessor is not None and sensor_model.compact_forest is not None
+
+    x_test, _ = split(make_frame(schema_config, 300, seed=4, missing_fraction=0.2))
+    expected = model.predict(preprocessor.transform(x_test))
+    compact = enforce_schema_dtypes(x_test.copy(), schema_config)
+    # batches of one row and batches past COMPACT_FOREST_MAX_ROWS take different paths, both give the sklearn labels
+    assert np.array_equal(expected, sensor_model.predict(compact))
+    for i in range(0, len(compact), 37):
+        assert sensor_model.predict(compact.iloc[i:i + 1]).tolist() == expected[i:i + 1].tolist()
+    assert np.array_equal(expected, sensor_model.predict_array(compact.to_numpy(dtype=np.float64), list(compact.columns)))
+
+    # the served model releases the sklearn trees, the compact forest then predicts large batches block by block
+    sensor_model.compile(release_estimator=True)
+    assert sensor_model.trained_model_object is None
+    sensor_model.compact_forest.PREDICT_BLOCK_ROWS = 64
+    assert np.array_equal(expected, sensor_model.predict(compact))
+    assert np.array_equal(model.predict_proba(preprocessor.transform(x_test)), sensor_model.compact_forest.predict_proba(preprocessor.transform(x_test)))
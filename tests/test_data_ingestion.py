@@ -0,0 +1,79 @@
+import dataclasses
+import mongomock
+import numpy as np
+import pandas as pd
+from benchmarks.synthetic_data import make_covtype_frame
+from src.forest.components.data_ingestion import DataIngestion
+from src.forest.configurations.mogo_db_connection import MongoDBClient
+from src.forest.constants.database import DATABASE_NAME
+from src.forest.data_access.forest_data import ForestData
+from src.forest.constants.training_pipeline import SCHEMA_FILE_PATH
+from src.forest.entity.config_entity import DataIngestionConfig
+from src.forest.utils.main_utils import enforce_schema_dtypes, read_yaml_file
+
+
+def make_data_ingestion(tmp_path, **values) -> DataIngestion:
+    data_ingestion_config = DataIngestionConfig()
+    data_ingestion_config = dataclasses.replace(
+        data_ingestion_config,
+        **{f.name: str(tmp_path / f.name) for f in dataclasses.fields(data_ingestion_config) if f.name.endswith(("_file_path", "_dir"))},
+        **values)
+    return DataIngestion(data_ingestion_config)
+
+
+def split(tmp_path, df: pd.DataFrame, n_new_rows=None) -> tuple:
+    data_ingestion = make_data_ingestion(tmp_path)
+    data_ingestion.n_new_rows = n_new_rows
+    return data_ingestion.split_data_as_train_test(df)
+
+
+def as_rows(df: pd.DataFrame) -> set:
+    return set(df.astype(np.float64).itertuples(index=False, name=None))
+
+
+def test_rows_keep_their_side_of_the_split_across_runs(tmp_path):
+    schema_config = read_yaml_file(SCHEMA_FILE_PATH)
+    first = enforce_schema_dtypes(make_covtype_frame(2000, seed=0), schema_config)
+    train_set, test_set, new_train_set = split(tmp_path / "first", first)
+    assert new_train_set is None
+    assert len(train_set) + len(test_set) == len(first)
+    assert 0.15 < len(test_set) / len(first) < 0.25
+
+    # the next run sees the same rows in another order, compacted to other dtypes, and new rows after them
+    new_rows = make_covtype_frame(500, seed=1)
+    second = pd.concat([first.sample(frac=1, random_state=0).astype(np.int64), new_rows], ignore_index=True)
+    next_train_set, next_test_set, next_new_train_set = split(tmp_path / "second", second, n_new_rows=len(new_rows))
+    assert as_rows(train_set) <= as_rows(next_train_set)
+    assert as_rows(test_set) <= as_rows(next_test_set)
+    assert as_rows(next_new_train_set) == as_rows(next_train_set) - as_rows(train_set)
+
+
+def test_delta_export_spreads_the_new_documents_over_the_partitions(tmp_path, monkeypatch):
+    monkeypatch.setattr(MongoDBClient, "client", mongomock.MongoClient())
+    data_ingestion = make_data_ingestion(tmp_path, incremental=True, export_partitions=4, export_workers=2)
+    collection = MongoDBClient.client[DATABASE_NAME][data_ingestion.data_ingestion_config.collection_name]
+    collection.insert_many(make_covtype_frame(1000, seed=0).to_dict("records"))
+    data_ingestion.export_delta_into_feature_store()
+
+    last_id = ForestData.get_last_key(collection)
+    partition_bounds = []
+    get_partition_bounds = ForestData.get_partition_bounds
+
+    def record_partition_bounds(*args, **kwargs):
+        partition_bounds.append(get_partition_bounds(*args, **kwargs))
+        return partition_bounds[-1]
+
+    monkeypatch.setattr(ForestData, "get_partition_bounds", staticmethod(record_partition_bounds))
+    new_documents = make_covtype_frame(400, seed=1)
+    collection.insert_many(new_documents.to_dict("records"))
+    feature_store = data_ingestion.export_delta_into_feature_store()
+    assert data_ingestion.n_new_rows == 400 and len(feature_store) == 1400
+
+    # every partition reads a quarter of the delta, not the last one all of it
+    counts = []
+    for lower, upper in partition_bounds[-1]:
+        key_range = {**({"$gte": lower} if lower is not None else {}), **({"$lt": upper} if upper is not None else {})}
+        counts.append(collection.count_documents({"$and": [{"_id": {"$gt": last_id}}, {"_id": key_range}]}))
+    assert counts == [100, 100, 100, 100]
+    delta = feature_store.iloc[1000:].reset_index(drop=True)
+    pd.testing.assert_frame_equal(delta[new_documents.columns].astype(np.float64), new_documents.astype(np.float64))
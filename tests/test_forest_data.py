@@ -0,0 +1,84 @@
+import mongomock
+import numpy as np
+import pandas as pd
+import pytest
+from benchmarks.mongo_export import export_list_of_dicts
+from benchmarks.synthetic_data import make_covtype_frame
+from src.forest.configurations.mogo_db_connection import MongoDBClient
+from src.forest.constants.database import DATABASE_NAME
+from src.forest.data_access.forest_data import ForestData
+
+COLLECTION = "forest_export_test"
+
+
+@pytest.fixture
+def forest_data(monkeypatch):
+    monkeypatch.setattr(MongoDBClient, "client", mongomock.MongoClient())
+    forest_data = ForestData()
+    documents = make_covtype_frame(1000, seed=0).to_dict("records")
+    rng = np.random.default_rng(0)
+    # what the raw collection holds besides clean numbers: "na" strings, absent fields, values out of the schema range
+    for document in rng.choice(documents, 60, replace=False):
+        document["Slope"] = "na"
+    for document in rng.choice(documents, 40, replace=False):
+        del document["Aspect"]
+    documents[7]["Elevation"] = 100000
+    documents[8]["Hillshade_Noon"] = 12.5
+    forest_data.get_collection(COLLECTION, DATABASE_NAME).insert_many(documents)
+    return forest_data
+
+
+def assert_same_export(expected: pd.DataFrame, actual: pd.DataFrame) -> None:
+    assert set(actual.columns) == set(expected.columns)
+    expected = expected[actual.columns].astype(np.float64)
+    pd.testing.assert_frame_equal(expected, actual.astype(np.float64))
+
+
+def test_columnar_export_matches_find(forest_data):
+    collection = forest_data.get_collection(COLLECTION, DATABASE_NAME)
+    actual = forest_data.export_collection_as_dataframe(COLLECTION, DATABASE_NAME, batch_size=64)
+    assert actual["Elevation"].dtype == np.float64
+    assert actual["Slope"].isna().sum() == 60 and actual["Aspect"].isna().sum() == 40
+    assert_same_export(export_list_of_dicts(collection), actual)
+
+
+@pytest.mark.parametrize("n_partitions, max_workers", [(1, 1), (3, 2), (8, 4), (40, 4)])
+def test_partitioned_export_matches_find(forest_data, n_partitions, max_workers):
+    collection = forest_data.get_collection(COLLECTION, DATABASE_NAME)
+    actual = forest_data.export_collection_partitioned(COLLECTION, DATABASE_NAME, n_partitions=n_partitions, max_workers=max_workers, batch_size=64)
+    assert_same_export(export_list_of_dicts(collection), actual)
+
+
+def test_partitioned_export_with_query_matches_find(forest_data):
+    collection = forest_data.get_collection(COLLECTION, DATABASE_NAME)
+    query = {"Cover_Type": {"$in": [2, 5]}}
+    expected = pd.DataFrame(list(collection.find(query))).drop(columns="_id").replace({"na": np.nan})
+    actual = forest_data.export_collection_partitioned(COLLECTION, DATABASE_NAME, n_partitions=4, max_workers=2, query=query)
+    assert len(actual) == collection.count_documents(query)
+    assert_same_export(expected, actual)
+
+
+def test_partition_bounds_split_the_keys_evenly(forest_data):
+    collection = forest_data.get_collection(COLLECTION, DATABASE_NAME)
+    bounds = ForestData.get_partition_bounds(collection, 4)
+    assert len(bounds) == 4
+    assert bounds[0][0] is None and bounds[-1][1] is None
+    counts = []
+    for lower, upper in bounds:
+        key_range = {**({"$gte": lower} if lower is not None else {}), **({"$lt": upper} if upper is not None else {})}
+        counts.append(collection.count_documents({"_id": key_range} if key_range else {}))
+    assert counts == [250, 250, 250, 250]
+    assert ForestData.get_partition_bounds(collection, 1) == [(None, None)]
+
+
+def test_partition_bounds_split_the_matching_keys_evenly(forest_data):
+    collection = forest_data.get_collection(COLLECTION, DATABASE_NAME)
+    # the newest 200 documents, the ranges of the whole collection would put all of them in the last one
+    ids = [document["_id"] for document in collection.find({}, {"_id": 1}).sort("_id", 1)]
+    query = {"_id": {"$gte": ids[800]}}
+    bounds = ForestData.get_partition_bounds(collection, 4, query=query)
+    counts = []
+    for lower, upper in bounds:
+        key_range = {**({"$gte": lower} if lower is not None else {}), **({"$lt": upper} if upper is not None else {})}
+        counts.append(collection.count_documents({"$and": [query, {"_id": key_range}]} if key_range else query))
+    assert counts == [50, 50, 50, 50]
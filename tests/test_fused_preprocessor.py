@@ -0,0 +1,78 @@
+import numpy as np
+import pandas as pd
+import pytest
+from benchmarks.synthetic_data import make_covtype_frame
+from src.forest.components.data_transformation import DataTransformation
+from src.forest.constants.training_pipeline import SCHEMA_FILE_PATH, TARGET_COLUMN
+from src.forest.entity.fused_preprocessor import FusedPreprocessor
+from src.forest.utils.main_utils import enforce_schema_dtypes, read_yaml_file
+
+
+@pytest.fixture(scope="module")
+def schema_config():
+    return read_yaml_file(SCHEMA_FILE_PATH)
+
+
+def make_features(schema_config: dict, n_rows: int, seed: int, missing_fraction: float = 0.05) -> pd.DataFrame:
+    df = make_covtype_frame(n_rows, seed=seed).drop(columns=schema_config["drop_columns"] + [TARGET_COLUMN])
+    features = df.astype(np.float64)
+    # missing values in every other numerical column, the others keep a compact integer dtype
+    missing_columns = schema_config["numerical_columns"][::2]
+    mask = np.random.default_rng(seed).random((n_rows, len(missing_columns))) < missing_fraction
+    features[missing_columns] = features[missing_columns].mask(mask)
+    return features
+
+
+@pytest.fixture(scope="module")
+def preprocessor(schema_config):
+    features = make_features(schema_config, 2000, seed=0)
+    return DataTransformation(data_ingestion_artifact=None, data_transformation_config=None).get_data_transformer_object().fit(features)
+
+
+@pytest.fixture(scope="module")
+def fused_preprocessor(preprocessor):
+    fused_preprocessor = FusedPreprocessor.from_column_transformer(preprocessor)
+    assert fused_preprocessor is not None
+    return fused_preprocessor
+
+
+@pytest.mark.parametrize("dtype", [np.float64, np.float32])
+def test_matches_sklearn_with_missing_values(schema_config, preprocessor, fused_preprocessor, dtype):
+    features = make_features(schema_config, 500, seed=1)
+    assert features.isna().any().any()
+    array = features.to_numpy(dtype=dtype)
+    expected = preprocessor.transform(pd.DataFrame(array, columns=features.columns))
+    actual = fused_preprocessor.transform(array, list(features.columns))
+    assert actual.dtype == expected.dtype == dtype
+    assert np.array_equal(expected, actual, equal_nan=True)
+
+
+def test_matches_sklearn_one_row_at_a_time(schema_config, preprocessor, fused_preprocessor):
+    features = make_features(schema_config, 50, seed=2, missing_fraction=0.3)
+    expected = preprocessor.transform(features)
+    columns = list(features.columns)
+    for i in range(len(features)):
+        actual = fused_preprocessor.transform(features.to_numpy()[i:i + 1], columns)
+        assert actual.shape == (1, expected.shape[1])
+        assert np.array_equal(expected[i:i + 1], actual)
+
+
+def test_matches_sklearn_on_compact_schema_dtypes(schema_config, preprocessor, fused_preprocessor):
+    features = make_features(schema_config, 500, seed=3)
+    compact = enforce_schema_dtypes(features.copy(), schema_config)
+    assert {dtype.kind for dtype in compact.dtypes} >= {"u", "i", "f"}
+    assert not (compact.dtypes == np.float64).any()
+
+    # as SensorModel.predict feeds it: the compact frame read as float64 gives the float64 sklearn output
+    expected = preprocessor.transform(features)
+    actual = fused_preprocessor.transform(compact.to_numpy(dtype=np.float64), list(compact.columns), copy=False)
+    assert np.array_equal(expected, actual)
+
+    # fed as they are, the compact columns give what sklearn gives for the same frame
+    assert np.array_equal(preprocessor.transform(compact), fused_preprocessor.transform(compact.to_numpy(), list(compact.columns)))
+
+
+def test_shuffled_column_order(schema_config, preprocessor, fused_preprocessor):
+    features = make_features(schema_config, 200, seed=4)
+    columns = list(features.columns)[::-1]
+    assert np.array_equal(preprocessor.transform(features), fused_preprocessor.transform(features[columns].to_numpy(), columns))
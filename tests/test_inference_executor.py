@@ -0,0 +1,59 @@
+import asyncio
+import threading
+import time
+import pytest
+from src.forest.entity.config_entity import InferenceExecutorConfig
+from src.forest.serving.inference_executor import InferenceExecutor, InferenceExecutorBusy
+
+
+def wait_for_pending(executor: InferenceExecutor, pending: int, timeout: float = 5.0) -> None:
+    deadline = time.monotonic() + timeout
+    while executor.pending != pending and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert executor.pending == pending
+
+
+def test_timed_out_job_keeps_its_slot_until_it_returns():
+    executor = InferenceExecutor(InferenceExecutorConfig(max_workers=1, max_queue_size=0, timeout_seconds=5.0))
+    executor.start()
+    release = threading.Event()
+
+    async def scenario():
+        with pytest.raises(asyncio.TimeoutError):
+            await executor.run(release.wait, timeout=0.05)
+        # the worker still runs the abandoned job, no other job is admitted
+        assert executor.pending == 1
+        with pytest.raises(InferenceExecutorBusy):
+            await executor.run(lambda: "late")
+        release.set()
+        await asyncio.to_thread(wait_for_pending, executor, 0)
+        return await executor.run(lambda: "done")
+
+    try:
+        assert asyncio.run(scenario()) == "done"
+        assert executor.pending == 0
+    finally:
+        release.set()
+        executor.shutdown()
+
+
+def test_timed_out_queued_job_is_cancelled_and_releases_its_slot():
+    executor = InferenceExecutor(InferenceExecutorConfig(max_workers=1, max_queue_size=1, timeout_seconds=5.0))
+    executor.start()
+    release = threading.Event()
+
+    async def scenario():
+        running = asyncio.ensure_future(executor.run(release.wait))
+        await asyncio.sleep(0.05)
+        with pytest.raises(asyncio.TimeoutError):
+            await executor.run(lambda: "never", timeout=0.05)
+        assert executor.pending == 1
+        release.set()
+        return await running
+
+    try:
+        assert asyncio.run(scenario()) is True
+        wait_for_pending(executor, 0)
+    finally:
+        release.set()
+        executor.shutdown()
@@ -0,0 +1,81 @@
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pytest
+from benchmarks.synthetic_data import make_covtype_frame
+from src.forest.constants.training_pipeline import SCHEMA_FILE_PATH
+from src.forest.utils.main_utils import enforce_schema_dtypes, load_dataframe, read_yaml_file, save_dataframe, write_yaml_file_atomic
+from src.forest.utils.one_hot_utils import ONE_HOT_METADATA_KEY, decode_layout, get_one_hot_groups
+
+
+@pytest.fixture(scope="module")
+def schema_config():
+    return read_yaml_file(SCHEMA_FILE_PATH)
+
+
+@pytest.fixture
+def frame(schema_config):
+    frame = enforce_schema_dtypes(make_covtype_frame(300, seed=0), schema_config)
+    # a row with two soil flags set makes the soil group a bitmask
+    frame.loc[3, ["Soil_Type1", "Soil_Type2"]] = 1
+    return frame
+
+
+def read_stored_schema(file_path: str) -> pa.Schema:
+    if file_path.endswith(".parquet"):
+        return pq.read_schema(file_path)
+    with pa.memory_map(file_path) as mapped:
+        return pa.ipc.open_file(mapped).schema
+
+
+@pytest.mark.parametrize("file_name", ["frame.feather", "frame.parquet"])
+def test_round_trip_with_packed_one_hot_groups(tmp_path, schema_config, frame, file_name):
+    file_path = str(tmp_path / file_name)
+    one_hot_groups = get_one_hot_groups(schema_config, list(frame.columns))
+    save_dataframe(file_path, frame, one_hot_groups=one_hot_groups)
+
+    stored_schema = read_stored_schema(file_path)
+    layout = decode_layout(stored_schema.metadata)
+    assert ONE_HOT_METADATA_KEY in stored_schema.metadata
+    assert layout["groups"]["Wilderness_Area"]["encoding"] == "index"
+    assert layout["groups"]["Soil_Type"]["encoding"] == "bitmask"
+    assert "Soil_Type" in stored_schema.names and "Soil_Type1" not in stored_schema.names
+    assert len(stored_schema.names) == frame.shape[1] - sum(len(columns) - 1 for columns in one_hot_groups.values())
+
+    pd.testing.assert_frame_equal(load_dataframe(file_path), frame)
+
+
+@pytest.mark.parametrize("file_name", ["frame.feather", "frame.parquet"])
+@pytest.mark.parametrize("packed", [True, False])
+def test_columns_come_back_in_the_requested_order(tmp_path, schema_config, frame, file_name, packed):
+    file_path = str(tmp_path / file_name)
+    save_dataframe(file_path, frame, one_hot_groups=get_one_hot_groups(schema_config, list(frame.columns)) if packed else None)
+    columns = ["Soil_Type2", "Cover_Type", "Wilderness_Area3", "Elevation", "Soil_Type1"]
+    loaded = load_dataframe(file_path, columns=columns)
+    assert list(loaded.columns) == columns
+    pd.testing.assert_frame_equal(loaded, frame[columns])
+
+
+def test_group_that_cannot_be_packed_is_stored_as_it_is(tmp_path, schema_config, frame):
+    frame = frame.astype({"Wilderness_Area2": np.float64})
+    frame.loc[5, "Wilderness_Area2"] = np.nan
+    file_path = str(tmp_path / "frame.feather")
+    save_dataframe(file_path, frame, one_hot_groups=get_one_hot_groups(schema_config, list(frame.columns)))
+    layout = decode_layout(read_stored_schema(file_path).metadata)
+    assert "Wilderness_Area" not in layout["groups"] and "Soil_Type" in layout["groups"]
+    pd.testing.assert_frame_equal(load_dataframe(file_path), frame)
+
+
+def test_csv_columns_come_back_in_the_requested_order(tmp_path, frame):
+    file_path = str(tmp_path / "frame.csv")
+    frame.to_csv(file_path, index=False)
+    assert list(load_dataframe(file_path, columns=["Slope", "Elevation"]).columns) == ["Slope", "Elevation"]
+
+
+def test_atomic_yaml_write_replaces_the_file(tmp_path):
+    file_path = str(tmp_path / "state" / "mark.yaml")
+    write_yaml_file_atomic(file_path, {"last_id": "a", "parts": ["part-a.parquet"]})
+    write_yaml_file_atomic(file_path, {"last_id": "b", "parts": ["part-a.parquet", "part-b.parquet"]})
+    assert read_yaml_file(file_path) == {"last_id": "b", "parts": ["part-a.parquet", "part-b.parquet"]}
+    assert sorted(path.name for path in (tmp_path / "state").iterdir()) == ["mark.yaml"]
@@ -0,0 +1,65 @@
+import numpy as np
+from benchmarks.synthetic_data import make_covtype_frame, make_sensor_model
+from src.forest.constants.training_pipeline import SCHEMA_FILE_PATH
+from src.forest.entity.config_entity import ModelCacheConfig, TrafficMonitorConfig
+from src.forest.entity.drift_statistics import HistogramStatistics
+from src.forest.pipeline.prediction_pipeline import PredictionPipeline
+from src.forest.serving import model_cache as model_cache_module
+from src.forest.serving.model_cache import ModelCache
+from src.forest.serving.traffic_monitor import TrafficMonitor
+from src.forest.utils.main_utils import enforce_schema_dtypes, read_yaml_file
+
+
+def make_registry(models: dict) -> type:
+    class FakeSensorEstimator:
+        """
+        Registry serving models[version] of the current version
+        """
+        version = None
+
+        def __init__(self, bucket_name, model_path):
+            pass
+
+        def get_model_version(self) -> str:
+            return FakeSensorEstimator.version
+
+        def load_model(self):
+            return models[FakeSensorEstimator.version]
+
+    return FakeSensorEstimator
+
+
+def test_traffic_monitor_follows_the_reference_of_the_served_model(monkeypatch):
+    schema_config = read_yaml_file(SCHEMA_FILE_PATH)
+    columns = PredictionPipeline(model_cache=None).feature_vectorizer.columns
+    models = {version: make_sensor_model(n_rows=2000, n_estimators=5) for version in ("1", "2", "3")}
+    for version, n_rows in (("1", 1000), ("2", 3000)):
+        reference_frame = enforce_schema_dtypes(make_covtype_frame(n_rows, seed=0), schema_config)
+        models[version].reference_statistics = HistogramStatistics.from_reference(reference_frame, columns)
+    # pickled before the reference shipped with the model
+    del models["3"].reference_statistics
+    registry = make_registry(models)
+    monkeypatch.setattr(model_cache_module, "SensorEstimator", registry)
+
+    registry.version = "1"
+    model_cache = ModelCache(ModelCacheConfig(release_estimator=False))
+    model_cache.load()
+    traffic_monitor = TrafficMonitor(columns, schema_config, TrafficMonitorConfig())
+    model_cache.add_load_listener(lambda model, version: traffic_monitor.set_reference(model.get_reference_statistics(), version))
+    features = make_covtype_frame(200, seed=1)[columns].to_numpy(dtype=np.float64)
+    traffic_monitor.update(features, np.ones(len(features)))
+    snapshot = traffic_monitor.snapshot()
+    assert (snapshot["reference_rows"], snapshot["reference_model_version"], snapshot["n_rows"]) == (1000, "1", 200)
+    assert all("psi" in feature for feature in snapshot["features"].values())
+
+    # a new model version swaps in its own reference and starts a new window
+    registry.version = "2"
+    assert model_cache.refresh()
+    snapshot = traffic_monitor.snapshot()
+    assert (snapshot["reference_rows"], snapshot["reference_model_version"], snapshot["n_rows"]) == (3000, "2", 0)
+
+    registry.version = "3"
+    assert model_cache.refresh()
+    snapshot = traffic_monitor.snapshot()
+    assert snapshot["reference_rows"] is None and snapshot["reference_model_version"] == "3"
+    assert not any("psi" in feature for feature in snapshot["features"].values())
@@ -0,0 +1,59 @@
+import io
+from types import SimpleNamespace
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pytest
+from src.forest.constants.training_pipeline import SCHEMA_FILE_PATH
+from src.forest.pipeline.prediction_pipeline import PredictionPipeline
+from src.forest.utils.main_utils import read_yaml_file, enforce_schema_dtypes
+from src.forest.utils.table_utils import TableWriter
+
+
+@pytest.fixture(scope="module")
+def schema_config():
+    return read_yaml_file(SCHEMA_FILE_PATH)
+
+
+def read_back(buffer: io.BytesIO, table_format: str) -> pa.Table:
+    buffer.seek(0)
+    if table_format == "parquet":
+        return pq.read_table(buffer)
+    return pa.ipc.open_file(buffer).read_all()
+
+
+@pytest.mark.parametrize("table_format", ["parquet", "arrow"])
+def test_chunks_with_different_value_ranges(schema_config, table_format):
+    # the first chunk compacts Elevation to int16, the second one holds values int16 cannot and a missing value
+    first = pd.DataFrame({"Elevation": [2596, 2590], "Slope": [3, 2], "Cover_Type": [5, 2]})
+    second = pd.DataFrame({"Elevation": [40000, np.nan], "Slope": [1.5, 7], "Cover_Type": [1, 7]})
+    chunks = [enforce_schema_dtypes(chunk, schema_config) for chunk in (first, second)]
+    assert chunks[0]["Elevation"].dtype == np.int16
+    assert chunks[1]["Elevation"].dtype != np.int16
+
+    column_types = PredictionPipeline.get_output_column_types(SimpleNamespace(schema_config=schema_config))
+    buffer = io.BytesIO()
+    writer = TableWriter(buffer, table_format, compression="zstd", column_types=column_types)
+    for chunk in chunks:
+        writer.write(chunk)
+    writer.close()
+
+    table = read_back(buffer, table_format)
+    assert table.schema.field("Elevation").type == pa.float64()
+    assert table.schema.field("Cover_Type").type == pa.int64()
+    assert table.column("Elevation").to_pylist() == [2596, 2590, 40000, None]
+    assert table.column("Slope").to_pylist() == [3, 2, 1.5, 7]
+    assert table.column("Cover_Type").to_pylist() == [5, 2, 1, 7]
+    assert writer.n_rows == 4
+
+
+def test_columns_without_type_keep_the_first_chunk_type():
+    buffer = io.BytesIO()
+    writer = TableWriter(buffer, "parquet", compression=None)
+    writer.write(pd.DataFrame({"id": ["a"], "value": [1.0]}))
+    writer.write(pd.DataFrame({"id": ["b"], "value": [2.0]}))
+    writer.close()
+    table = read_back(buffer, "parquet")
+    assert table.column("id").to_pylist() == ["a", "b"]
+    assert table.schema.field("value").type == pa.float64()
@@ -0,0 +1,157 @@
+import os
+import shutil
+import dataclasses
+import mongomock
+import pytest
+from benchmarks.synthetic_data import make_covtype_frame
+from src.forest.configurations.mogo_db_connection import MongoDBClient
+from src.forest.constants.database import DATABASE_NAME
+from src.forest.entity.config_entity import ROOT_DIR, StageCacheConfig, training_pipeline_config
+from src.forest.entity.artifact_entity import ChampionScoreArtifact, ModelEvaluationArtifact
+from src.forest.components import model_trainer, model_evaluation, model_pusher
+from src.forest.pipeline import train_pipeline
+from src.forest.pipeline.stage_cache import StageCache
+from src.forest.pipeline.train_pipeline import TrainPipeline
+from src.forest.entity.drift_statistics import HistogramStatistics
+from src.forest.utils.main_utils import load_object, load_dataframe, read_yaml_file, write_yaml_file
+
+
+class FakeRegistry:
+    """
+    Model registry standing in for the S3 bucket, every saved model gets the next version
+    """
+    def __init__(self, registry_dir: str):
+        self.registry_dir = registry_dir
+        self.model_file_path = None
+        self.version = 0
+
+    def get_estimator_class(self):
+        registry = self
+
+        class FakeSensorEstimator:
+            def __init__(self, bucket_name, model_path):
+                pass
+
+            def is_model_present(self, model_path):
+                return registry.model_file_path is not None
+
+            def get_model_version(self) -> str:
+                return str(registry.version)
+
+            def load_model(self):
+                return load_object(registry.model_file_path)
+
+            def save_model(self, from_file, remove: bool = False) -> None:
+                registry.version += 1
+                registry.model_file_path = os.path.join(registry.registry_dir, f"model_{registry.version}.pkl")
+                shutil.copyfile(from_file, registry.model_file_path)
+
+        return FakeSensorEstimator
+
+
+def relocate(config, run_dir: str, artifact_root: str):
+    """
+    Copy of a config whose run paths go to run_dir and whose paths shared by the runs go to artifact_root
+    """
+    shared_root = os.path.join(ROOT_DIR, "artifact")
+    values = {}
+    for f in dataclasses.fields(config):
+        value = getattr(config, f.name)
+        if isinstance(value, str) and value.startswith(training_pipeline_config.artifact_dir):
+            values[f.name] = run_dir + value[len(training_pipeline_config.artifact_dir):]
+        elif isinstance(value, str) and value.startswith(shared_root):
+            values[f.name] = artifact_root + value[len(shared_root):]
+    return dataclasses.replace(config, **values)
+
+
+@pytest.fixture
+def collection(monkeypatch):
+    monkeypatch.setattr(MongoDBClient, "client", mongomock.MongoClient())
+    return MongoDBClient.client[DATABASE_NAME]
+
+
+@pytest.fixture
+def registry(monkeypatch, tmp_path):
+    registry = FakeRegistry(str(tmp_path / "registry"))
+    os.makedirs(registry.registry_dir)
+    for module in (model_trainer, model_evaluation, model_pusher, train_pipeline):
+        monkeypatch.setattr(module, "SensorEstimator", registry.get_estimator_class())
+    return registry
+
+
+@pytest.fixture
+def model_config_file_path(tmp_path) -> str:
+    model_config = read_yaml_file(os.path.join(ROOT_DIR, "config", "model.yaml"))
+    model_config["search"]["mode"] = "exhaustive"
+    model_config["model_selection"]["module_0"]["params"]["n_estimators"] = 20
+    file_path = str(tmp_path / "model.yaml")
+    write_yaml_file(file_path, model_config)
+    return file_path
+
+
+def get_reference_rows(pipeline: TrainPipeline) -> int:
+    return HistogramStatistics.from_dict(read_yaml_file(pipeline.data_validation_config.reference_statistics_file_path)).n_rows
+
+
+def make_pipeline(tmp_path, run: int, model_config_file_path: str, incremental: bool = True):
+    pipeline = TrainPipeline()
+    artifact_root = str(tmp_path / "artifact")
+    run_dir = os.path.join(artifact_root, f"run_{run}")
+    for name in ("data_ingestion_config", "data_validation_config", "data_transformation_config", "model_trainer_config", "model_evaluation_config"):
+        setattr(pipeline, name, relocate(getattr(pipeline, name), run_dir, artifact_root))
+    pipeline.data_ingestion_config = dataclasses.replace(pipeline.data_ingestion_config, incremental = incremental)
+    pipeline.data_validation_config = dataclasses.replace(pipeline.data_validation_config, drift_psi_threshold = 10.0, drift_ks_threshold = 1.0)
+    pipeline.model_trainer_config = dataclasses.replace(pipeline.model_trainer_config, incremental = incremental, base_accuracy = 0.0,
+                                                        incremental_class_psi_threshold = 10.0, model_config_file_path = model_config_file_path)
+    pipeline.stage_cache = StageCache(relocate(StageCacheConfig(), run_dir, artifact_root))
+    # every trained model is accepted, the scores of the synthetic rows do not decide what is tested here
+    pipeline.start_champion_scoring = lambda data_ingestion_artifact: ChampionScoreArtifact(best_model_f1_score = None)
+    pipeline.start_model_evaluation = lambda data_ingestion_artifact, model_trainer_artifact, champion_score_artifact: ModelEvaluationArtifact(
+        is_model_accepted = True, best_model_path = model_trainer_artifact.trained_model_file_path,
+        trained_model_file_path = model_trainer_artifact.trained_model_file_path, changed_accuracy = 0.0)
+    trainer_artifacts = []
+    start_model_training = pipeline.start_model_training
+    pipeline.start_model_training = lambda **kwargs: trainer_artifacts.append(start_model_training(**kwargs)) or trainer_artifacts[-1]
+    return pipeline, trainer_artifacts
+
+
+def test_incremental_runs_never_train_twice_on_the_same_rows(tmp_path, collection, registry, model_config_file_path):
+    pipeline, trainer_artifacts = make_pipeline(tmp_path, 1, model_config_file_path)
+    source = collection[pipeline.data_ingestion_config.collection_name]
+    source.insert_many(make_covtype_frame(1500, seed = 0).to_dict("records"))
+    pipeline.run_pipeline()
+    assert [artifact.training_mode for artifact in trainer_artifacts] == ["full"]
+    n_trees = len(load_object(registry.model_file_path).trained_model_object.estimators_)
+    reference_rows = get_reference_rows(pipeline)
+    # the deployed model ships the reference the traffic monitor compares the served traffic with
+    assert load_object(registry.model_file_path).get_reference_statistics().n_rows == reference_rows
+
+    source.insert_many(make_covtype_frame(150, seed = 1).to_dict("records"))
+    pipeline, trainer_artifacts = make_pipeline(tmp_path, 2, model_config_file_path)
+    pipeline.run_pipeline()
+    assert [artifact.training_mode for artifact in trainer_artifacts] == ["warm_start"]
+    n_trees_grown = len(load_object(registry.model_file_path).trained_model_object.estimators_)
+    assert n_trees_grown == n_trees + pipeline.model_trainer_config.incremental_n_estimators
+    # the warm started champion keeps the drift reference of the full retrain it grew from
+    assert get_reference_rows(pipeline) == reference_rows
+    assert load_object(registry.model_file_path).get_reference_statistics().n_rows == reference_rows
+
+    # no new documents: ingestion is reused, training reruns for the new champion version and must not grow it again
+    pipeline, trainer_artifacts = make_pipeline(tmp_path, 3, model_config_file_path)
+    pipeline.run_pipeline()
+    assert [artifact.training_mode for artifact in trainer_artifacts] == ["unchanged"]
+    assert len(load_object(registry.model_file_path).trained_model_object.estimators_) == n_trees_grown
+
+
+def test_deployed_full_retrain_refreshes_the_drift_reference(tmp_path, collection, registry, model_config_file_path):
+    pipeline, _ = make_pipeline(tmp_path, 1, model_config_file_path, incremental = False)
+    source = collection[pipeline.data_ingestion_config.collection_name]
+    source.insert_many(make_covtype_frame(1000, seed = 0).to_dict("records"))
+    pipeline.run_pipeline()
+
+    source.insert_many(make_covtype_frame(500, seed = 1).to_dict("records"))
+    pipeline, trainer_artifacts = make_pipeline(tmp_path, 2, model_config_file_path, incremental = False)
+    pipeline.run_pipeline()
+    assert [artifact.training_mode for artifact in trainer_artifacts] == ["full"]
+    assert get_reference_rows(pipeline) == len(load_dataframe(pipeline.data_ingestion_config.training_file_path))
+    assert load_object(registry.model_file_path).get_reference_statistics().n_rows == get_reference_rows(pipeline)